@@ -151,6 +151,12 @@ STATIC_ROOT = env.path("STATIC_ROOT", default=BASE_DIR / "staticfiles")
 MEDIA_URL = "media/"
 MEDIA_ROOT = env.path("MEDIA_ROOT", default=BASE_DIR / "media")
 
+# Toplu faaliyet raporu işlerini kim çalıştırır: "komut" — `manage.py faaliyet_raporu_isleri --surekli` işçisi;
+# "thread" — web worker içinde arka plan thread'i (yalnızca tek süreçli geliştirme; worker yeniden başlarsa iş ölür)
+FAALIYET_RAPORU_CALISTIRICI = env.str("FAALIYET_RAPORU_CALISTIRICI", default="komut")
+# Toplu faaliyet raporu PDF üretiminde süreç sayısı (0: CPU sayısı; 1: süreç havuzu kullanılmaz)
+FAALIYET_RAPORU_SURECLERI = env.int("FAALIYET_RAPORU_SURECLERI", default=0)
+
 # Auth (frontend login; kullanıcılar admin'den tanımlanır)
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
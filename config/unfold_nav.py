@@ -8,6 +8,7 @@ CORE_NAV_GROUPS = {
     "Müşteri Yönetimi": [
         "core.customer",
         "core.facility",
+        "core.tesismesafesi",
         "core.zone",
         "core.station",
         "core.periyod",
@@ -32,6 +33,7 @@ CORE_NAV_GROUPS = {
 CORE_NAV_ICONS = {
     "core.customer": "people",
     "core.facility": "business",
+    "core.tesismesafesi": "route",
     "core.zone": "map",
     "core.station": "qr_code_2",
     "core.periyod": "event_repeat",
@@ -134,6 +136,11 @@ def get_sidebar_navigation(request):
                 "link": reverse("admin:rapor_istasyon"),
                 "icon": "table_chart",
             },
+            {
+                "title": "Vadesi Gelen Ziyaretler",
+                "link": reverse("admin:core_periyod_vadesi_gelenler"),
+                "icon": "event_upcoming",
+            },
         ],
     })
 
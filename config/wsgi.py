@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# PDF fontlarını önceden kaydet: gunicorn --preload ile ana süreçte bir kez yapılır, işçiler fork ile devralır
+from core.pdf_fonts import warm_fonts  # noqa: E402
+
+warm_fonts()
@@ -1,28 +1,34 @@
+import json
+import tempfile
+
 from django import forms
 from django.contrib import admin, messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as AuthUserAdmin
-from django.db import models
-from django.db.models import Q
-from django.http import HttpResponse, JsonResponse
+from django.db import models, transaction
+from django.db.models import Case, OuterRef, Q, Subquery, Value, When
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import path, reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
+from django.views.decorators.gzip import gzip_page
 from unfold.admin import ModelAdmin, TabularInline
 
-from .forms import StationForm, ZoneForm, TalepAdminForm
-from django.core.files.base import ContentFile
+from .forms import EkipRotaForm, StationForm, ZoneForm, TalepAdminForm, VadeListesiForm
 
 from .models import (
     BagimsizTespit,
     Customer,
     Facility,
+    TesisMesafesi,
     Zone,
     Station,
     UserProfile,
     Ekip,
     Periyod,
+    PeriyodTarihi,
     UygulamaTanim,
     FaaliyetTanim,
     IlacTanim,
@@ -36,10 +42,24 @@ from .models import (
     TalepTipi,
     Talep,
     FaaliyetRaporu,
+    FaaliyetRaporuIsi,
+)
+from .faaliyet_raporu_pdf import faaliyet_raporu_verileri, generate_faaliyet_raporu_pdf, rapor_parmak_izi
+from .istasyon_sayim import (
+    istasyon_satirlari,
+    sayim_ozeti,
+    sayimlari_kaydet,
+    taramalari_kaydet,
+    taramalari_senkronla,
+    tesis_istasyon_listesi,
+    tesis_istasyon_listesi_etag,
 )
-from .faaliyet_raporu_pdf import generate_faaliyet_raporu_pdf
+from .faaliyet_raporu_toplu import mevcut_raporlar, rapor_alanlari, rapor_guncel_mi, raporlari_kaydet
 from .bagimsiz_tespit_raporu_pdf import generate_bagimsiz_tespit_raporu_pdf
-from .label_pdf import generate_station_labels_pdf
+from .label_pdf import write_station_label_sheets_pdf, write_station_labels_pdf
+from .durum_gecisleri import durum_gecisi
+from .planlama import PLANLAMA_GUN_SAYISI, talepleri_planla
+from .rota import gunluk_rota
 from .widgets import ImageCropInput
 from addressbook.models import Contact
 
@@ -49,7 +69,7 @@ User = get_user_model()
 class FacilityInline(TabularInline):
     model = Facility
     extra = 0
-    fields = ("kod", "ad", "adres")
+    fields = ("kod", "ad", "adres", "enlem", "boylam")
 
 
 class CustomerContactInline(TabularInline):
@@ -199,9 +219,36 @@ class FacilityAdmin(ModelAdmin):
                 self.admin_site.admin_view(self.stations_view),
                 name="core_facility_stations",
             ),
+            path(
+                "<path:object_id>/istasyon-listesi/",
+                self.admin_site.admin_view(gzip_page(self.istasyon_listesi_view), cacheable=True),
+                name="core_facility_istasyon_listesi",
+            ),
         ]
         return custom + urls
 
+    def istasyon_listesi_view(self, request, object_id):
+        """
+        Tesisin istasyon listesi (JSON); cihaz QR kodlarını yerelde çözmek için ziyaret başına bir kez indirir.
+        ETag + If-None-Match ile değişmediyse 304 döner; yanıt gzip ile sıkıştırılır (get_urls).
+        """
+        from django.core.exceptions import PermissionDenied
+
+        facility = get_object_or_404(Facility, pk=object_id)
+        if not self.has_view_permission(request, facility):
+            raise PermissionDenied
+        etag = tesis_istasyon_listesi_etag(facility)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = JsonResponse(
+                {"facility": facility.pk, **tesis_istasyon_listesi(facility)},
+                json_dumps_params={"separators": (",", ":"), "ensure_ascii": False},
+            )
+        response.headers["ETag"] = etag
+        # Tarayıcı her ziyarette doğrulasın (304 ucuz); paylaşılan önbelleklere girmesin
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
     def stations_view(self, request, object_id):
         facility = get_object_or_404(Facility, pk=object_id)
         if not self.has_change_permission(request, facility):
@@ -277,6 +324,10 @@ class TesisListFilter(admin.SimpleListFilter):
         return queryset
 
 
+# Etiket PDF'i için istasyonlar veritabanından bu büyüklükte parçalarla okunur
+ETIKET_CHUNK_SIZE = 500
+
+
 @admin.register(Station)
 class StationAdmin(ModelAdmin):
     list_display = ("benzersiz_kod", "kod", "ad", "zone", "created_at")
@@ -284,31 +335,116 @@ class StationAdmin(ModelAdmin):
     search_fields = ("benzersiz_kod", "kod", "ad")
     readonly_fields = ("benzersiz_kod",)
     autocomplete_fields = ["zone"]
-    actions = ["etiket_pdf_indir"]
-
-    @admin.action(description="Seçili istasyonlar için etiket PDF indir (80x25mm)")
-    def etiket_pdf_indir(self, request, queryset):
-        stations = queryset.select_related("zone").order_by("zone__facility", "zone", "kod")
-        if not stations:
+    actions = ["etiket_pdf_indir", "etiket_a4_2x10_indir", "etiket_a4_3x8_indir"]
+
+    def _etiket_pdf_response(self, request, queryset, writer, filename):
+        """
+        Etiket PDF'ini writer(stations, fileobj) ile diskteki geçici dosyaya yazar, ardından dosyayı FileResponse ile
+        gönderir. İndirme artımlı değildir: ilk bayt PDF tamamlanınca gider ve ReportLab sayfaları save()'e kadar
+        bellekte tuttuğundan bellek ile süre etiket sayısıyla artar. Yalnızca istasyon listesi ve yanıt gövdesi
+        bellekte tutulmaz.
+        """
+        if not queryset.exists():
             self.message_user(request, "En az bir istasyon seçin.", level=messages.WARNING)
             return
+        stations = (
+            queryset.select_related("zone")
+            .only("pk", "kod", "ad", "benzersiz_kod", "zone__kod", "zone__ad")
+            .order_by("zone__facility", "zone", "kod")
+        )
+        # PDF önce tamamen geçici dosyada tamponlanır; istasyonlar iterator ile okunur
+        tmp = tempfile.TemporaryFile()
         try:
-            pdf_bytes = generate_station_labels_pdf(stations)
+            writer(stations.iterator(chunk_size=ETIKET_CHUNK_SIZE), tmp)
         except Exception as e:
+            tmp.close()
             self.message_user(request, f"PDF oluşturulamadı: {e}", level=messages.ERROR)
             return
-        response = HttpResponse(pdf_bytes, content_type="application/pdf")
-        response["Content-Disposition"] = 'attachment; filename="istasyon-etiketleri.pdf"'
-        return response
+        tmp.seek(0)
+        return FileResponse(tmp, as_attachment=True, filename=filename, content_type="application/pdf")
+
+    @admin.action(description="Seçili istasyonlar için etiket PDF indir (80x25mm)")
+    def etiket_pdf_indir(self, request, queryset):
+        return self._etiket_pdf_response(
+            request, queryset, write_station_labels_pdf, "istasyon-etiketleri.pdf",
+        )
+
+    @admin.action(description="Seçili istasyonlar için A4 etiket sayfası indir (2x10)")
+    def etiket_a4_2x10_indir(self, request, queryset):
+        return self._etiket_pdf_response(
+            request, queryset,
+            lambda stations, fileobj: write_station_label_sheets_pdf(stations, fileobj, layout="2x10"),
+            "istasyon-etiketleri-a4-2x10.pdf",
+        )
+
+    @admin.action(description="Seçili istasyonlar için A4 etiket sayfası indir (3x8)")
+    def etiket_a4_3x8_indir(self, request, queryset):
+        return self._etiket_pdf_response(
+            request, queryset,
+            lambda stations, fileobj: write_station_label_sheets_pdf(stations, fileobj, layout="3x8"),
+            "istasyon-etiketleri-a4-3x8.pdf",
+        )
 
 
 @admin.register(Ekip)
 class EkipAdmin(ModelAdmin):
-    list_display = ("kod", "ekip_lideri", "kisi_sayisi", "created_at")
+    list_display = ("kod", "ekip_lideri", "kisi_sayisi", "rota_link", "created_at")
     list_filter = ("ekip_lideri",)
     search_fields = ("kod", "uyeler")
     autocomplete_fields = ["ekip_lideri"]
 
+    def rota_link(self, obj):
+        if obj.pk:
+            url = reverse("admin:core_ekip_rota", args=[obj.pk])
+            return format_html(
+                '<a href="{}" class="inline-flex items-center px-3 py-1.5 text-sm font-medium rounded-md'
+                ' bg-primary-600 text-white hover:bg-primary-700 focus:outline-none focus:ring-2'
+                ' focus:ring-offset-2 focus:ring-primary-500 no-underline">Günlük rota</a>',
+                url,
+            )
+        return "-"
+
+    rota_link.short_description = "Rota"
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom = [
+            path(
+                "<path:object_id>/rota/",
+                self.admin_site.admin_view(self.rota_view),
+                name="core_ekip_rota",
+            ),
+        ]
+        return custom + urls
+
+    def rota_view(self, request, object_id):
+        """Ekibin seçilen güne planlanmış taleplerinin mesafe matrisine göre sıralanmış ziyaret rotası."""
+        from django.core.exceptions import PermissionDenied
+
+        ekip = get_object_or_404(Ekip, pk=object_id)
+        if not self.has_view_permission(request, ekip):
+            raise PermissionDenied
+        form = EkipRotaForm(request.GET)
+        rota = gunluk_rota(ekip, form.cleaned_data["tarih"]) if form.is_valid() else None
+        context = {
+            **self.admin_site.each_context(request),
+            "title": f"Günlük Rota: {ekip.kod}",
+            "opts": self.model._meta,
+            "original": ekip,
+            "form": form,
+            "rota": rota,
+        }
+        return render(request, "admin/core/ekip/rota.html", context)
+
+
+@admin.register(TesisMesafesi)
+class TesisMesafesiAdmin(ModelAdmin):
+    list_display = ("kaynak", "hedef", "mesafe_km", "updated_at")
+    list_filter = ("kaynak__customer",)
+    search_fields = ("kaynak__kod", "kaynak__ad", "hedef__kod", "hedef__ad")
+    autocomplete_fields = ["kaynak", "hedef"]
+    list_select_related = ("kaynak__customer", "hedef__customer")
+
 
 @admin.register(Periyod)
 class PeriyodAdmin(ModelAdmin):
@@ -318,6 +454,49 @@ class PeriyodAdmin(ModelAdmin):
     autocomplete_fields = ["customer", "facility", "talep_tipi"]
     date_hierarchy = "baslangic_tarihi"
 
+    def get_urls(self):
+        urls = super().get_urls()
+        custom = [
+            path(
+                "vadesi-gelenler/",
+                self.admin_site.admin_view(self.vadesi_gelenler_view),
+                name="core_periyod_vadesi_gelenler",
+            ),
+        ]
+        return custom + urls
+
+    def vadesi_gelenler_view(self, request):
+        """Tarih aralığında vadesi gelen periyodik ziyaretler (PeriyodTarihi aralık taraması) ve oluşturulmuş talepleri."""
+        from django.core.exceptions import PermissionDenied
+
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        form = VadeListesiForm(request.GET)
+        satirlar = None
+        if form.is_valid():
+            satirlar = (
+                PeriyodTarihi.objects.filter(
+                    tarih__gte=form.cleaned_data["baslangic"], tarih__lte=form.cleaned_data["bitis"],
+                )
+                .select_related("periyod__talep_tipi", "customer", "facility__customer")
+                .annotate(
+                    talep_id=Subquery(
+                        Talep.objects.filter(periyod_id=OuterRef("periyod_id"), tarih=OuterRef("tarih")).values("pk")[:1]
+                    ),
+                )
+                .order_by("tarih", "customer__kod", "facility__kod")
+            )
+            if form.cleaned_data["tesis"]:
+                satirlar = satirlar.filter(facility=form.cleaned_data["tesis"])
+        context = {
+            **self.admin_site.each_context(request),
+            "title": "Vadesi Gelen Ziyaretler",
+            "opts": self.model._meta,
+            "form": form,
+            "satirlar": satirlar,
+        }
+        return render(request, "admin/core/periyod/vadesi_gelenler.html", context)
+
 
 @admin.register(UygulamaTanim)
 class UygulamaTanimAdmin(ModelAdmin):
@@ -357,6 +536,15 @@ class TespitTanimAdmin(ModelAdmin):
     search_fields = ("ad",)
 
 
+# İş kaydı listesindeki rapor durumu (WorkRecordAdmin.get_queryset anotasyonu)
+RAPOR_YOK = "yok"
+RAPOR_BEKLIYOR = "bekliyor"
+RAPOR_HAZIR = "hazir"
+
+# İstasyon sayım API'sinde tek istekte kabul edilen en fazla tarama
+SAYIM_API_MAX_TARAMA = 2000
+
+
 @admin.register(WorkRecord)
 class WorkRecordAdmin(ModelAdmin):
     formfield_overrides = {
@@ -466,15 +654,7 @@ class WorkRecordAdmin(ModelAdmin):
 
     @admin.action(description="Seçilenleri başlat")
     def baslat_action(self, request, queryset):
-        from django.utils import timezone
-        now = timezone.now().time()
-        count = 0
-        for wr in queryset.filter(durum=WorkRecord.DURUM_BASLANMADI):
-            wr.durum = WorkRecord.DURUM_DEVAM_EDIYOR
-            if not wr.baslama_saati:
-                wr.baslama_saati = now
-            wr.save(update_fields=["durum", "baslama_saati"])
-            count += 1
+        count = len(durum_gecisi(queryset, "baslat"))
         if count:
             self.message_user(request, f"{count} iş kaydı başlatıldı.", level=messages.SUCCESS)
         else:
@@ -482,15 +662,7 @@ class WorkRecordAdmin(ModelAdmin):
 
     @admin.action(description="Seçilenleri tamamla")
     def bitir_action(self, request, queryset):
-        from django.utils import timezone
-        now = timezone.now().time()
-        count = 0
-        for wr in queryset.filter(durum=WorkRecord.DURUM_DEVAM_EDIYOR):
-            wr.durum = WorkRecord.DURUM_TAMAMLANDI
-            if not wr.bitis_saati:
-                wr.bitis_saati = now
-            wr.save(update_fields=["durum", "bitis_saati"])
-            count += 1
+        count = len(durum_gecisi(queryset, "bitir"))
         if count:
             self.message_user(request, f"{count} iş kaydı tamamlandı.", level=messages.SUCCESS)
         else:
@@ -498,51 +670,78 @@ class WorkRecordAdmin(ModelAdmin):
 
     @admin.action(description="Seçilen iş kayıtları için faaliyet raporu oluştur")
     def faaliyet_raporu_olustur(self, request, queryset):
-        from .faaliyet_raporu_pdf import generate_faaliyet_raporu_pdf
-
-        olusturulan = 0
-        for wr in queryset.select_related(
-            "customer", "facility", "ekip", "ekip__ekip_lideri",
-            "kapatilan_talep", "kapatilan_talep__customer",
-            "kapatilan_talep__facility", "kapatilan_talep__tip",
-        ):
-            try:
-                pdf_bytes = generate_faaliyet_raporu_pdf(wr)
-                musteri_kod = (wr.customer.kod if wr.customer_id else "") or (
-                    wr.kapatilan_talep.customer.kod if wr.kapatilan_talep_id and wr.kapatilan_talep.customer_id else ""
-                )
-                is_kaydi_kod = wr.form_numarasi or f"WR-{wr.pk}"
-                rapor, created = FaaliyetRaporu.objects.get_or_create(
-                    work_record=wr,
-                    defaults={
-                        "musteri_kod": musteri_kod,
-                        "is_kaydi_kod": is_kaydi_kod,
-                        "rapor_tarihi": wr.tarih,
-                    },
-                )
-                rapor.musteri_kod = musteri_kod
-                rapor.is_kaydi_kod = is_kaydi_kod
-                rapor.rapor_tarihi = wr.tarih
-                rapor.rapor_olusturuldu = True
-                dosya_adi = f"{is_kaydi_kod}_faaliyet.pdf"
-                rapor.pdf.save(dosya_adi, ContentFile(pdf_bytes), save=True)
-                rapor.save()
-                olusturulan += 1
-            except Exception as e:
-                self.message_user(request, f"İş kaydı {wr.pk} için rapor oluşturulamadı: {e}", level=messages.ERROR)
-        if olusturulan:
-            self.message_user(request, f"{olusturulan} faaliyet raporu oluşturuldu.", level=messages.SUCCESS)
+        from .faaliyet_raporu_toplu import toplu_rapor_isi_baslat
+
+        ids = list(queryset.values_list("pk", flat=True))
+        if not ids:
+            return
+        rapor_isi = toplu_rapor_isi_baslat(ids, user=request.user)
+        durum_url = reverse("admin:core_workrecord_faaliyet_raporu_isi", args=[rapor_isi.pk])
+        self.message_user(
+            request,
+            format_html(
+                '{} iş kaydı için faaliyet raporu üretimi sıraya alındı (arka plan işçisi). '
+                '<a href="{}" target="_blank">İlerlemeyi görüntüle</a>',
+                len(ids), durum_url,
+            ),
+            level=messages.SUCCESS,
+        )
+
+    def faaliyet_raporu_isi_view(self, request, is_id):
+        """Toplu rapor işinin ilerlemesi (JSON; admin aksiyonundan sonra yoklanır)."""
+        from django.core.exceptions import PermissionDenied
+
+        from .faaliyet_raporu_toplu import takilan_isleri_kapat
+
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        takilan_isleri_kapat()
+        rapor_isi = get_object_or_404(FaaliyetRaporuIsi, pk=is_id)
+        return JsonResponse({
+            "id": rapor_isi.pk,
+            "durum": rapor_isi.durum,
+            "toplam": rapor_isi.toplam,
+            "tamamlanan": rapor_isi.tamamlanan,
+            "hatali": rapor_isi.hatali,
+            "bitti": rapor_isi.durum in (FaaliyetRaporuIsi.DURUM_TAMAMLANDI, FaaliyetRaporuIsi.DURUM_HATA),
+            "mesaj": rapor_isi.mesaj,
+            "created_at": rapor_isi.created_at.isoformat(),
+            "bitis": rapor_isi.bitis.isoformat() if rapor_isi.bitis else None,
+        })
+
+    def get_queryset(self, request):
+        # Liste sütunları (müşteri, tesis, personel, ekip, talep, rapor) satır başına sorgu atmasın
+        qs = super().get_queryset(request).select_related(
+            "customer", "facility__customer", "personel", "ekip",
+            "kapatilan_talep__tip", "kapatilan_talep__customer", "faaliyet_raporu",
+        )
+        return qs.annotate(
+            rapor_durumu=Case(
+                When(faaliyet_raporu__isnull=True, then=Value(RAPOR_YOK)),
+                When(
+                    Q(faaliyet_raporu__rapor_olusturuldu=False) | Q(faaliyet_raporu__pdf="") | Q(faaliyet_raporu__pdf__isnull=True),
+                    then=Value(RAPOR_BEKLIYOR),
+                ),
+                default=Value(RAPOR_HAZIR),
+                output_field=models.CharField(),
+            ),
+        )
 
     def faaliyet_raporu_durum(self, obj):
-        # Rapor silinmiş olabilir; her seferinde sorgu ile kontrol et
-        rapor = FaaliyetRaporu.objects.filter(work_record=obj).first()
-        if rapor is None:
+        # Durum get_queryset'teki rapor_durumu anotasyonundan; rapor select_related ile geldiği için ek sorgu yok
+        durum = getattr(obj, "rapor_durumu", None)
+        if durum is None:
+            rapor = FaaliyetRaporu.objects.filter(work_record=obj).first()
+            durum = RAPOR_YOK if rapor is None else (RAPOR_HAZIR if rapor.rapor_olusturuldu and rapor.pdf else RAPOR_BEKLIYOR)
+        else:
+            rapor = obj.faaliyet_raporu if durum != RAPOR_YOK else None
+        if durum == RAPOR_YOK:
             url = reverse("admin:core_workrecord_faaliyet_raporu_pdf", args=[obj.pk])
             return format_html(
                 '<a href="{}" class="inline-flex items-center px-2 py-1 text-xs rounded bg-gray-200 hover:bg-gray-300" title="Rapor oluştur veya tekrar oluştur">Tekrar oluşturulacak</a>',
                 url,
             )
-        if not rapor.rapor_olusturuldu or not rapor.pdf:
+        if durum == RAPOR_BEKLIYOR:
             url = reverse("admin:core_workrecord_faaliyet_raporu_pdf", args=[obj.pk])
             return format_html('<a href="{}">Oluştur</a>', url)
         pdf_url = rapor.pdf.url if hasattr(rapor.pdf, "url") else ""
@@ -592,42 +791,60 @@ class WorkRecordAdmin(ModelAdmin):
                 self.admin_site.admin_view(self.istasyon_sayim_toplu_view),
                 name="core_workrecord_istasyon_sayim_toplu",
             ),
+            path(
+                "<path:object_id>/istasyon-sayim-ozet/",
+                self.admin_site.admin_view(self.istasyon_sayim_ozet_view),
+                name="core_workrecord_istasyon_sayim_ozet",
+            ),
+            path(
+                "<path:object_id>/istasyon-sayim-api/",
+                self.admin_site.admin_view(self.istasyon_sayim_api_view),
+                name="core_workrecord_istasyon_sayim_api",
+            ),
+            path(
+                "<path:object_id>/istasyon-sayim-api-toplu/",
+                self.admin_site.admin_view(self.istasyon_sayim_api_toplu_view),
+                name="core_workrecord_istasyon_sayim_api_toplu",
+            ),
+            path(
+                "<path:object_id>/istasyon-sayim-senkron/",
+                self.admin_site.admin_view(self.istasyon_sayim_senkron_view),
+                name="core_workrecord_istasyon_sayim_senkron",
+            ),
             path(
                 "<path:object_id>/faaliyet-raporu-pdf/",
                 self.admin_site.admin_view(self.faaliyet_raporu_pdf_view),
                 name="core_workrecord_faaliyet_raporu_pdf",
             ),
+            path(
+                "faaliyet-raporu-isi/<int:is_id>/",
+                self.admin_site.admin_view(self.faaliyet_raporu_isi_view),
+                name="core_workrecord_faaliyet_raporu_isi",
+            ),
         ]
         return custom + urls
 
     def _baslat_or_bitir(self, request, object_id, action):
-        """Başlat veya Bitir işlemi."""
+        """Başlat veya Bitir işlemi (durum_gecisi ile; kayıt uygun durumda değilse False)."""
         from django.core.exceptions import PermissionDenied
-        from django.utils import timezone
 
         work_record = get_object_or_404(WorkRecord, pk=object_id)
         if not self.has_change_permission(request, work_record):
             raise PermissionDenied
-        now = timezone.now().time()
-        if action == "baslat":
-            work_record.durum = WorkRecord.DURUM_DEVAM_EDIYOR
-            if not work_record.baslama_saati:
-                work_record.baslama_saati = now
-        else:  # bitir
-            work_record.durum = WorkRecord.DURUM_TAMAMLANDI
-            if not work_record.bitis_saati:
-                work_record.bitis_saati = now
-        work_record.save(update_fields=["durum", "baslama_saati", "bitis_saati"])
-        return work_record
+        return bool(durum_gecisi(WorkRecord.objects.filter(pk=work_record.pk), action))
 
     def baslat_view(self, request, object_id):
-        self._baslat_or_bitir(request, object_id, "baslat")
-        messages.success(request, "İş kaydı başlatıldı.")
+        if self._baslat_or_bitir(request, object_id, "baslat"):
+            messages.success(request, "İş kaydı başlatıldı.")
+        else:
+            messages.warning(request, "İş kaydı başlatılamadı (zaten devam ediyor veya tamamlanmış).")
         return redirect("admin:core_workrecord_changelist")
 
     def bitir_view(self, request, object_id):
-        self._baslat_or_bitir(request, object_id, "bitir")
-        messages.success(request, "İş kaydı tamamlandı.")
+        if self._baslat_or_bitir(request, object_id, "bitir"):
+            messages.success(request, "İş kaydı tamamlandı.")
+        else:
+            messages.warning(request, "İş kaydı tamamlanamadı (başlanmamış veya zaten tamamlanmış).")
         return redirect("admin:core_workrecord_changelist")
 
     def baslat_bitir_links(self, obj):
@@ -653,51 +870,146 @@ class WorkRecordAdmin(ModelAdmin):
     def faaliyet_raporu_pdf_view(self, request, object_id):
         from django.core.exceptions import PermissionDenied
 
-        work_record = get_object_or_404(
-            WorkRecord.objects.select_related(
-                "customer", "facility", "ekip", "ekip__ekip_lideri",
-                "kapatilan_talep", "kapatilan_talep__customer",
-                "kapatilan_talep__facility", "kapatilan_talep__tip",
-            ),
-            pk=object_id,
-        )
+        kayitlar = faaliyet_raporu_verileri(WorkRecord.objects.filter(pk=object_id))
+        if not kayitlar:
+            raise Http404
+        work_record, veri = kayitlar[0]
         if not self.has_view_permission(request, work_record):
             raise PermissionDenied
-        pdf_bytes = generate_faaliyet_raporu_pdf(work_record)
-        musteri_kod = (work_record.customer.kod if work_record.customer_id else "") or (
-            work_record.kapatilan_talep.customer.kod if work_record.kapatilan_talep_id and work_record.kapatilan_talep.customer_id else ""
-        )
-        is_kaydi_kod = work_record.form_numarasi or f"WR-{work_record.pk}"
-        rapor, created = FaaliyetRaporu.objects.get_or_create(
-            work_record=work_record,
-            defaults={
-                "musteri_kod": musteri_kod,
-                "is_kaydi_kod": is_kaydi_kod,
-                "rapor_tarihi": work_record.tarih,
-            },
-        )
-        rapor.musteri_kod = musteri_kod
-        rapor.is_kaydi_kod = is_kaydi_kod
-        rapor.rapor_tarihi = work_record.tarih
-        rapor.rapor_olusturuldu = True
-        dosya_adi = f"{is_kaydi_kod}_faaliyet.pdf"
-        rapor.pdf.save(dosya_adi, ContentFile(pdf_bytes), save=True)
-        rapor.save()
+        parmak_izi = rapor_parmak_izi(veri)
+        _, _, dosya_adi = rapor_alanlari(work_record)
+        mevcut = mevcut_raporlar([work_record.pk])
+        if rapor_guncel_mi(mevcut.get(work_record.pk), parmak_izi):
+            # Veri ve şablon değişmedi: kayıtlı PDF olduğu gibi gönderilir
+            storage = FaaliyetRaporu._meta.get_field("pdf").storage
+            return FileResponse(
+                storage.open(mevcut[work_record.pk][1], "rb"),
+                as_attachment=True,
+                filename=dosya_adi,
+                content_type="application/pdf",
+            )
+        pdf_bytes = generate_faaliyet_raporu_pdf(veri)
+        with transaction.atomic():
+            raporlari_kaydet([work_record], [(work_record.pk, pdf_bytes, None)], {work_record.pk: parmak_izi}, mevcut)
         response = HttpResponse(pdf_bytes, content_type="application/pdf")
         response["Content-Disposition"] = f'attachment; filename="{dosya_adi}"'
         return response
 
+    def _secili_tesis(self, request, default_facility):
+        """?facility= (veya POST facility) ile seçilen tesis; yoksa veya bulunamazsa iş kaydının tesisi."""
+        facility_id = request.GET.get("facility") or request.POST.get("facility")
+        if facility_id and facility_id.isdigit():
+            facility = Facility.objects.filter(pk=facility_id).first()
+            if facility:
+                return facility
+        return default_facility
+
+    def istasyon_sayim_ozet_view(self, request, object_id):
+        """Sayım özeti (JSON): ?facility=&zone= için tesis ve bölge bazında toplam / girilen / kalan."""
+        from django.core.exceptions import PermissionDenied
+
+        work_record = get_object_or_404(
+            WorkRecord.objects.select_related("etkin_tesis"),
+            pk=object_id,
+        )
+        if not self.has_view_permission(request, work_record):
+            raise PermissionDenied
+        default_facility = work_record.etkin_tesis
+        selected_facility = self._secili_tesis(request, default_facility)
+        if not selected_facility:
+            return JsonResponse({"facility": None, "tesis": None, "bolge": None, "bolgeler": []})
+        ozet = sayim_ozeti(work_record, selected_facility, request.GET.get("zone"))
+        return JsonResponse({"facility": selected_facility.pk, **ozet})
+
+    def _sayim_api_is_kaydi(self, request, object_id):
+        """Sayım API'si için iş kaydı; (work_record, hata JsonResponse veya None)."""
+        from django.core.exceptions import PermissionDenied
+
+        if request.method != "POST":
+            return None, JsonResponse({"hata": "Yalnızca POST desteklenir."}, status=405)
+        work_record = get_object_or_404(WorkRecord.objects.select_related("etkin_tesis"), pk=object_id)
+        if not self.has_change_permission(request, work_record):
+            raise PermissionDenied
+        if work_record.bitis_saati is not None:
+            return None, JsonResponse({"hata": "Bitiş saati girildiği için sayım kilitli."}, status=409)
+        return work_record, None
+
+    def _istek_verisi(self, request):
+        """JSON gövde (application/json) veya form verisi."""
+        if request.content_type == "application/json":
+            try:
+                return json.loads(request.body or b"{}")
+            except ValueError:
+                return None
+        return request.POST
+
+    def istasyon_sayim_api_view(self, request, object_id):
+        """
+        Tek istasyon sayımı (POST: station_id veya benzersiz_kod, tuketim_var, not_alani).
+        JSON: güncellenen satır + özet; HX-Request başlığı varsa HTMX parçası döner.
+        """
+        work_record, hata = self._sayim_api_is_kaydi(request, object_id)
+        if hata:
+            return hata
+        veri = self._istek_verisi(request)
+        if not hasattr(veri, "get"):
+            return JsonResponse({"hata": "Geçersiz istek gövdesi."}, status=400)
+        tarama = {alan: veri.get(alan) for alan in ("station_id", "benzersiz_kod", "tuketim_var", "not_alani")}
+        if not (tarama["station_id"] or tarama["benzersiz_kod"]):
+            return JsonResponse({"hata": "station_id veya benzersiz_kod gerekli."}, status=400)
+        sonuc = taramalari_kaydet(work_record, [tarama])
+        satir = sonuc["satirlar"][0]
+        if satir["durum"] == "bulunamadi":
+            return JsonResponse({"found": False, "satir": satir}, status=404)
+        if satir["durum"] == "gecersiz":
+            return JsonResponse(
+                {"found": True, "satir": satir, "hata": "İstasyon bu iş kaydının tesisine ait değil."}, status=400,
+            )
+        ozet = sonuc["ozetler"][0]
+        if request.headers.get("HX-Request"):
+            return render(request, "admin/core/workrecord/istasyon_sayim_sonuc.html", {"satir": satir, "ozet": ozet})
+        return JsonResponse({"found": True, "satir": satir, "ozet": ozet})
+
+    def istasyon_sayim_api_toplu_view(self, request, object_id):
+        """Toplu tarama (POST, JSON): {"taramalar": [{station_id | benzersiz_kod, tuketim_var, not_alani}, ...]}."""
+        work_record, hata = self._sayim_api_is_kaydi(request, object_id)
+        if hata:
+            return hata
+        veri = self._istek_verisi(request)
+        taramalar = veri.get("taramalar") if isinstance(veri, dict) else veri
+        if not isinstance(taramalar, list) or not all(isinstance(t, dict) for t in taramalar):
+            return JsonResponse({"hata": "taramalar listesi gerekli."}, status=400)
+        if len(taramalar) > SAYIM_API_MAX_TARAMA:
+            return JsonResponse({"hata": f"Tek istekte en fazla {SAYIM_API_MAX_TARAMA} tarama gönderilebilir."}, status=400)
+        return JsonResponse(taramalari_kaydet(work_record, taramalar))
+
+    def istasyon_sayim_senkron_view(self, request, object_id):
+        """
+        Çevrimdışı kuyruk senkronu (POST, JSON): {"taramalar": [{id, station_id | benzersiz_kod, tuketim_var, not_alani, zaman}]}.
+        İdempotent; çakışmada istemci zamanı yeni olan kazanır. Yanıttaki satır durumlarıyla cihaz kuyruğunu temizler.
+        """
+        work_record, hata = self._sayim_api_is_kaydi(request, object_id)
+        if hata:
+            return hata
+        veri = self._istek_verisi(request)
+        taramalar = veri.get("taramalar") if isinstance(veri, dict) else veri
+        if not isinstance(taramalar, list) or not all(isinstance(t, dict) for t in taramalar):
+            return JsonResponse({"hata": "taramalar listesi gerekli."}, status=400)
+        if len(taramalar) > SAYIM_API_MAX_TARAMA:
+            return JsonResponse({"hata": f"Tek istekte en fazla {SAYIM_API_MAX_TARAMA} tarama gönderilebilir."}, status=400)
+        return JsonResponse(taramalari_senkronla(work_record, taramalar))
+
     def istasyon_sayim_view(self, request, object_id):
         from django.core.exceptions import PermissionDenied
 
         work_record = get_object_or_404(
-            WorkRecord.objects.select_related("facility", "kapatilan_talep"),
+            WorkRecord.objects.select_related("etkin_tesis", "kapatilan_talep"),
             pk=object_id,
         )
         if not self.has_view_permission(request, work_record):
             raise PermissionDenied
         locked = work_record.bitis_saati is not None
-        default_facility = work_record.facility or (work_record.kapatilan_talep.facility if work_record.kapatilan_talep_id else None)
+        default_facility = work_record.etkin_tesis
 
         # Lookup by benzersiz_kod (GET API for HTMX/JS)
         benzersiz_kod = request.GET.get("benzersiz_kod", "").strip()
@@ -753,54 +1065,17 @@ class WorkRecordAdmin(ModelAdmin):
             return redirect(redirect_url)
 
         # Selected facility/zone for summary and bulk list
-        facility_id = request.GET.get("facility") or (str(default_facility.pk) if default_facility else None)
         zone_id = request.GET.get("zone")
-        selected_facility = None
-        if facility_id:
-            try:
-                selected_facility = Facility.objects.get(pk=facility_id)
-            except Facility.DoesNotExist:
-                pass
-        if not selected_facility and default_facility:
-            selected_facility = default_facility
+        selected_facility = self._secili_tesis(request, default_facility)
 
-        # Summary counts
+        # Özet (tek gruplu sorgu) ve bakılmış / bakılmamış istasyonlar (tek sorgu; sayım sayfasında sadece listeleme)
         summary_facility = summary_zone = None
-        if selected_facility:
-            total_f = Station.objects.filter(zone__facility=selected_facility).count()
-            entered_f = WorkRecordStationCount.objects.filter(
-                work_record=work_record,
-                station__zone__facility=selected_facility,
-            ).count()
-            summary_facility = {"toplam": total_f, "girilen": entered_f, "kalan": total_f - entered_f}
-            if zone_id and selected_facility.bolgeler.filter(pk=zone_id).exists():
-                total_z = Station.objects.filter(zone_id=zone_id).count()
-                entered_z = WorkRecordStationCount.objects.filter(
-                    work_record=work_record,
-                    station__zone_id=zone_id,
-                ).count()
-                summary_zone = {"toplam": total_z, "girilen": entered_z, "kalan": total_z - entered_z}
-
-        # Bakılmış ve bakılmamış istasyonlar (sayım sayfasında sadece listeleme)
         bakilmis_stations = []
         bakilmamis_stations = []
         if selected_facility:
-            stations_qs = (
-                Station.objects.filter(zone__facility=selected_facility)
-                .select_related("zone")
-                .order_by("zone__kod", "kod")
-            )
-            if zone_id:
-                stations_qs = stations_qs.filter(zone_id=zone_id)
-            existing = {
-                sc.station_id: sc
-                for sc in WorkRecordStationCount.objects.filter(
-                    work_record=work_record,
-                    station__in=stations_qs,
-                )
-            }
-            for st in stations_qs:
-                row = {"station": st, "count_obj": existing.get(st.pk)}
+            ozet = sayim_ozeti(work_record, selected_facility, zone_id)
+            summary_facility, summary_zone = ozet["tesis"], ozet["bolge"]
+            for row in istasyon_satirlari(work_record, selected_facility, zone_id):
                 if row["count_obj"]:
                     bakilmis_stations.append(row)
                 else:
@@ -826,6 +1101,11 @@ class WorkRecordAdmin(ModelAdmin):
             "zones": zones,
             "istasyon_sayim_url": reverse("admin:core_workrecord_istasyon_sayim", args=[work_record.pk]),
             "istasyon_sayim_toplu_url": reverse("admin:core_workrecord_istasyon_sayim_toplu", args=[work_record.pk]),
+            "istasyon_sayim_api_url": reverse("admin:core_workrecord_istasyon_sayim_api", args=[work_record.pk]),
+            "istasyon_sayim_senkron_url": reverse("admin:core_workrecord_istasyon_sayim_senkron", args=[work_record.pk]),
+            "istasyon_listesi_url": (
+                reverse("admin:core_facility_istasyon_listesi", args=[selected_facility.pk]) if selected_facility else ""
+            ),
         }
         return render(request, "admin/core/workrecord/istasyon_sayim.html", context)
 
@@ -834,20 +1114,20 @@ class WorkRecordAdmin(ModelAdmin):
         from django.core.exceptions import PermissionDenied
 
         work_record = get_object_or_404(
-            WorkRecord.objects.select_related("facility", "kapatilan_talep"),
+            WorkRecord.objects.select_related("etkin_tesis", "kapatilan_talep"),
             pk=object_id,
         )
         if not self.has_view_permission(request, work_record):
             raise PermissionDenied
         locked = work_record.bitis_saati is not None
-        default_facility = work_record.facility or (work_record.kapatilan_talep.facility if work_record.kapatilan_talep_id else None)
+        default_facility = work_record.etkin_tesis
 
         # POST: save_bulk
         if request.method == "POST" and not locked:
             if not self.has_change_permission(request, work_record):
                 raise PermissionDenied
             if request.POST.get("action") == "save_bulk":
-                saved = 0
+                sayimlar = {}
                 ids_str = request.POST.get("bulk_station_ids", "")
                 for sid_str in ids_str.split(",") if ids_str else []:
                     try:
@@ -856,22 +1136,24 @@ class WorkRecordAdmin(ModelAdmin):
                         continue
                     tuketim_var = request.POST.get(f"tuketim_{sid}") in ("1", "true", "on", "yes")
                     not_alani = request.POST.get(f"not_{sid}", "").strip()
-                    try:
-                        station = Station.objects.get(pk=sid)
-                        obj, _ = WorkRecordStationCount.objects.get_or_create(
-                            work_record=work_record,
-                            station=station,
-                            defaults={"tuketim_var": tuketim_var, "not_alani": not_alani},
-                        )
-                        if not _:
-                            obj.tuketim_var = tuketim_var
-                            obj.not_alani = not_alani
-                            obj.save()
-                        saved += 1
-                    except Station.DoesNotExist:
-                        pass
-                if saved:
-                    messages.success(request, f"{saved} tüketim kaydı güncellendi.")
+                    sayimlar[sid] = (tuketim_var, not_alani)
+                # Yalnızca seçili (yoksa iş kaydının) tesisindeki istasyonlar kabul edilir; tesis yoksa kayıt yapılmaz
+                facility = self._secili_tesis(request, default_facility)
+                if facility is None:
+                    messages.warning(request, "Tesis seçilmediği için tüketim kayıtları kaydedilmedi.")
+                    sonuc = {"olusturulan": 0, "guncellenen": 0, "degismeyen": 0, "gecersiz": 0}
+                else:
+                    sonuc = sayimlari_kaydet(work_record, sayimlar, facility=facility)
+                if sonuc["olusturulan"] or sonuc["guncellenen"]:
+                    messages.success(
+                        request,
+                        f"{sonuc['olusturulan']} yeni, {sonuc['guncellenen']} güncellenen tüketim kaydı "
+                        f"({sonuc['degismeyen']} kayıt değişmedi).",
+                    )
+                elif sonuc["degismeyen"]:
+                    messages.info(request, "Değişiklik yok; tüketim kayıtları aynı.")
+                if sonuc["gecersiz"]:
+                    messages.warning(request, f"{sonuc['gecersiz']} istasyon seçili tesise ait olmadığı için atlandı.")
             redirect_url = reverse("admin:core_workrecord_istasyon_sayim_toplu", args=[object_id])
             fid = request.GET.get("facility") or request.POST.get("facility")
             zid = request.GET.get("zone") or request.POST.get("zone")
@@ -881,50 +1163,15 @@ class WorkRecordAdmin(ModelAdmin):
                     redirect_url += f"&zone={zid}"
             return redirect(redirect_url)
 
-        facility_id = request.GET.get("facility") or (str(default_facility.pk) if default_facility else None)
         zone_id = request.GET.get("zone")
-        selected_facility = None
-        if facility_id:
-            try:
-                selected_facility = Facility.objects.get(pk=facility_id)
-            except Facility.DoesNotExist:
-                pass
-        if not selected_facility and default_facility:
-            selected_facility = default_facility
+        selected_facility = self._secili_tesis(request, default_facility)
 
         bulk_stations = []
         summary_facility = summary_zone = None
         if selected_facility:
-            stations_qs = (
-                Station.objects.filter(zone__facility=selected_facility)
-                .select_related("zone")
-                .order_by("zone__kod", "kod")
-            )
-            if zone_id:
-                stations_qs = stations_qs.filter(zone_id=zone_id)
-            existing = {
-                sc.station_id: sc
-                for sc in WorkRecordStationCount.objects.filter(
-                    work_record=work_record,
-                    station__in=stations_qs,
-                )
-            }
-            for st in stations_qs:
-                bulk_stations.append({"station": st, "count_obj": existing.get(st.pk)})
-
-            total_f = Station.objects.filter(zone__facility=selected_facility).count()
-            entered_f = WorkRecordStationCount.objects.filter(
-                work_record=work_record,
-                station__zone__facility=selected_facility,
-            ).count()
-            summary_facility = {"toplam": total_f, "girilen": entered_f, "kalan": total_f - entered_f}
-            if zone_id and selected_facility.bolgeler.filter(pk=zone_id).exists():
-                total_z = Station.objects.filter(zone_id=zone_id).count()
-                entered_z = WorkRecordStationCount.objects.filter(
-                    work_record=work_record,
-                    station__zone_id=zone_id,
-                ).count()
-                summary_zone = {"toplam": total_z, "girilen": entered_z, "kalan": total_z - entered_z}
+            bulk_stations = istasyon_satirlari(work_record, selected_facility, zone_id)
+            ozet = sayim_ozeti(work_record, selected_facility, zone_id)
+            summary_facility, summary_zone = ozet["tesis"], ozet["bolge"]
 
         facilities = Facility.objects.select_related("customer").order_by("customer__kod", "kod")[:500]
         zones = list(selected_facility.bolgeler.order_by("kod")) if selected_facility else []
@@ -983,6 +1230,9 @@ class TalepAdmin(ModelAdmin):
     search_fields = ("aciklama", "customer__kod", "customer__firma_ismi")
     autocomplete_fields = ["customer", "facility", "tip", "planlanan_ekip", "iliski_talep"]
     date_hierarchy = "tarih"
+    actions = ["planla_action"]
+    # "Planla" aksiyonunun planlama dönemi (gün)
+    planlama_gun_sayisi = PLANLAMA_GUN_SAYISI
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
@@ -990,6 +1240,24 @@ class TalepAdmin(ModelAdmin):
             qs = qs.exclude(durum="yapildi")
         return qs
 
+    @admin.action(description="Seçili bekleyen talepleri ekiplere planla")
+    def planla_action(self, request, queryset):
+        sonuc = talepleri_planla(queryset, gun_sayisi=self.planlama_gun_sayisi)
+        if not sonuc["ekip"]:
+            self.message_user(request, "Kişi sayısı tanımlı ekip yok; planlama yapılamadı.", level=messages.WARNING)
+            return
+        if sonuc["planlanan"]:
+            self.message_user(request, f"{sonuc['planlanan']} talep planlandı.", level=messages.SUCCESS)
+        if sonuc["planlanamayan"]:
+            self.message_user(
+                request,
+                f"{sonuc['planlanamayan']} talep {self.planlama_gun_sayisi} gün içinde ekip kapasitesine "
+                "sığmadığı için planlanamadı.",
+                level=messages.WARNING,
+            )
+        elif not sonuc["planlanan"]:
+            self.message_user(request, "Planlanacak bekleyen talep yok.", level=messages.WARNING)
+
     def kapandi_mi(self, obj):
         from django.core.exceptions import ObjectDoesNotExist
         try:
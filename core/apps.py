@@ -7,9 +7,10 @@ class CoreConfig(AppConfig):
 
     def ready(self):
         from django.contrib.auth import get_user_model
-        from django.db.models.signals import post_save
+        from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 
-        from .models import UserProfile
+        from . import signals
+        from .models import Periyod, Station, Talep, UserProfile, WorkRecord, WorkRecordStationCount, Zone
 
         User = get_user_model()
 
@@ -18,3 +19,17 @@ class CoreConfig(AppConfig):
                 UserProfile.objects.get_or_create(user=instance)
 
         post_save.connect(create_user_profile, sender=User)
+
+        # Tüketim özeti (IstasyonTuketimOzeti) bakımı
+        post_save.connect(signals.sayim_kaydedildi, sender=WorkRecordStationCount, dispatch_uid="core_sayim_ozeti_kayit")
+        post_delete.connect(signals.sayim_silindi, sender=WorkRecordStationCount, dispatch_uid="core_sayim_ozeti_silme")
+        post_save.connect(signals.is_kaydi_kaydedildi, sender=WorkRecord, dispatch_uid="core_sayim_ozeti_tarih")
+        pre_save.connect(signals.istasyon_kaydedilecek, sender=Station, dispatch_uid="core_sayim_ozeti_istasyon_once")
+        post_save.connect(signals.istasyon_kaydedildi, sender=Station, dispatch_uid="core_sayim_ozeti_istasyon")
+        post_save.connect(signals.bolge_kaydedildi, sender=Zone, dispatch_uid="core_sayim_ozeti_bolge")
+
+        # Periyod tarihleri (PeriyodTarihi) bakımı
+        post_save.connect(signals.periyod_kaydedildi, sender=Periyod, dispatch_uid="core_periyod_tarihleri")
+
+        # İş kaydı etkin müşteri / tesis bakımı
+        pre_delete.connect(signals.talep_silinecek, sender=Talep, dispatch_uid="core_etkin_musteri_tesis_talep_silme")
@@ -11,10 +11,7 @@ from reportlab.lib.units import mm
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
 
-from . import label_pdf as _label_pdf
-
-_FONT = _label_pdf._FONT_NAME
-_FONT_BOLD = _label_pdf._FONT_BOLD_NAME
+from .pdf_fonts import font_names, string_width
 
 PAGE_WIDTH, PAGE_HEIGHT = A4
 MARGIN = 14 * mm
@@ -74,6 +71,7 @@ def _get_image_path(image_field):
 
 def _draw_header(c, y):
     """Sol: logo + KALE İLAÇLAMA. Sağ üst: Bağımsız Tespitler Raporu."""
+    _, font_bold = font_names()
     logo_path = _get_logo_path()
     if logo_path:
         try:
@@ -86,11 +84,11 @@ def _draw_header(c, y):
             )
         except Exception:
             pass
-    c.setFont(_FONT_BOLD, FONT_SIZE_HEADER)
+    c.setFont(font_bold, FONT_SIZE_HEADER)
     c.drawString(MARGIN + LOGO_SIZE + 2 * mm, y - LOGO_SIZE / 2 - 2 * mm, "KALE İLAÇLAMA")
-    c.setFont(_FONT_BOLD, FONT_SIZE_TITLE)
+    c.setFont(font_bold, FONT_SIZE_TITLE)
     title = "Bağımsız Tespitler Raporu"
-    tw = c.stringWidth(title, _FONT_BOLD, FONT_SIZE_TITLE)
+    tw = string_width(title, font_bold, FONT_SIZE_TITLE)
     c.drawString(PAGE_WIDTH - MARGIN - tw, y - LOGO_SIZE / 2 - 2 * mm, title)
     y -= LOGO_SIZE + 3 * mm
     return y
@@ -112,16 +110,22 @@ def _wrap_text(c, text, max_width, font, size):
         if not para:
             lines.append("")
             continue
-        words = para.split()
+        # Genişlik kelime kelime ölçülüp toplanır (reportlab genişliği toplamsaldır); büyüyen satır önekleri
+        # önbelleğe girmez, önbellekte tekrar eden kısa kelimeler kalır
+        bosluk = string_width(" ", font, size)
         current = ""
-        for w in words:
-            test = current + " " + w if current else w
-            if c.stringWidth(test, font, size) <= max_width:
-                current = test
+        current_width = 0
+        for w in para.split():
+            w_width = string_width(w, font, size)
+            test_width = current_width + bosluk + w_width if current else w_width
+            if test_width <= max_width:
+                current = current + " " + w if current else w
+                current_width = test_width
             else:
                 if current:
                     lines.append(current)
                 current = w
+                current_width = w_width
         if current:
             lines.append(current)
     return lines if lines else [""]
@@ -132,17 +136,18 @@ def _draw_record(c, y, record, record_num, min_y=MARGIN):
     Tek bir Bağımsız Tespit kaydını çizer: bilgiler + 3 görsel yan yana.
     Gerekirse yeni sayfa açar.
     """
+    font, font_bold = font_names()
     x = MARGIN
     max_text_width = PAGE_WIDTH - 2 * MARGIN
 
     # Kayıt başlığı
-    c.setFont(_FONT_BOLD, FONT_SIZE)
+    c.setFont(font_bold, FONT_SIZE)
     baslik = f"Tespit #{record_num}"
     c.drawString(x, y, baslik)
     y -= LINE_HEIGHT
 
     # Tarih, Firma, Tesis
-    c.setFont(_FONT, FONT_SIZE_SMALL)
+    c.setFont(font, FONT_SIZE_SMALL)
     firma_str = str(record.firma) if record.firma_id else "—"
     tesis_str = str(record.tesis) if record.tesis_id else "—"
     raporlandi_str = "Evet" if record.raporlandi else "Hayır"
@@ -157,51 +162,51 @@ def _draw_record(c, y, record, record_num, min_y=MARGIN):
         if y < min_y + LINE_HEIGHT:
             c.showPage()
             y = PAGE_HEIGHT - MARGIN
-            c.setFont(_FONT, FONT_SIZE_SMALL)
+            c.setFont(font, FONT_SIZE_SMALL)
         c.drawString(x, y, (line or "—")[:95])
         y -= LINE_HEIGHT * 0.85
 
     # Yer açıklaması
     if record.yer_aciklamasi and record.yer_aciklamasi.strip():
-        c.setFont(_FONT_BOLD, FONT_SIZE_SMALL)
+        c.setFont(font_bold, FONT_SIZE_SMALL)
         c.drawString(x, y, "Yer açıklaması:")
         y -= LINE_HEIGHT * 0.7
-        c.setFont(_FONT, FONT_SIZE_SMALL)
-        for line in _wrap_text(c, record.yer_aciklamasi, max_text_width, _FONT, FONT_SIZE_SMALL):
+        c.setFont(font, FONT_SIZE_SMALL)
+        for line in _wrap_text(c, record.yer_aciklamasi, max_text_width, font, FONT_SIZE_SMALL):
             if y < min_y + LINE_HEIGHT:
                 c.showPage()
                 y = PAGE_HEIGHT - MARGIN
-                c.setFont(_FONT, FONT_SIZE_SMALL)
+                c.setFont(font, FONT_SIZE_SMALL)
             c.drawString(x, y, (line or "")[:120])
             y -= LINE_HEIGHT * 0.8
         y -= LINE_HEIGHT * 0.3
 
     # Gözlem açıklaması
     if record.gozlem_aciklamasi and record.gozlem_aciklamasi.strip():
-        c.setFont(_FONT_BOLD, FONT_SIZE_SMALL)
+        c.setFont(font_bold, FONT_SIZE_SMALL)
         c.drawString(x, y, "Gözlem açıklaması:")
         y -= LINE_HEIGHT * 0.7
-        c.setFont(_FONT, FONT_SIZE_SMALL)
-        for line in _wrap_text(c, record.gozlem_aciklamasi, max_text_width, _FONT, FONT_SIZE_SMALL):
+        c.setFont(font, FONT_SIZE_SMALL)
+        for line in _wrap_text(c, record.gozlem_aciklamasi, max_text_width, font, FONT_SIZE_SMALL):
             if y < min_y + LINE_HEIGHT:
                 c.showPage()
                 y = PAGE_HEIGHT - MARGIN
-                c.setFont(_FONT, FONT_SIZE_SMALL)
+                c.setFont(font, FONT_SIZE_SMALL)
             c.drawString(x, y, (line or "")[:120])
             y -= LINE_HEIGHT * 0.8
         y -= LINE_HEIGHT * 0.3
 
     # Öneriler
     if record.oneriler and record.oneriler.strip():
-        c.setFont(_FONT_BOLD, FONT_SIZE_SMALL)
+        c.setFont(font_bold, FONT_SIZE_SMALL)
         c.drawString(x, y, "Öneriler:")
         y -= LINE_HEIGHT * 0.7
-        c.setFont(_FONT, FONT_SIZE_SMALL)
-        for line in _wrap_text(c, record.oneriler, max_text_width, _FONT, FONT_SIZE_SMALL):
+        c.setFont(font, FONT_SIZE_SMALL)
+        for line in _wrap_text(c, record.oneriler, max_text_width, font, FONT_SIZE_SMALL):
             if y < min_y + LINE_HEIGHT:
                 c.showPage()
                 y = PAGE_HEIGHT - MARGIN
-                c.setFont(_FONT, FONT_SIZE_SMALL)
+                c.setFont(font, FONT_SIZE_SMALL)
             c.drawString(x, y, (line or "")[:120])
             y -= LINE_HEIGHT * 0.8
         y -= LINE_HEIGHT * 0.3
@@ -221,7 +226,7 @@ def _draw_record(c, y, record, record_num, min_y=MARGIN):
             c.showPage()
             y = PAGE_HEIGHT - MARGIN
 
-        c.setFont(_FONT_BOLD, FONT_SIZE_SMALL)
+        c.setFont(font_bold, FONT_SIZE_SMALL)
         c.drawString(x, y, "Görseller:")
         y -= LINE_HEIGHT
 
@@ -248,9 +253,9 @@ def _draw_record(c, y, record, record_num, min_y=MARGIN):
                             height=dh,
                         )
                 except Exception:
-                    c.setFont(_FONT, FONT_SIZE_SMALL)
+                    c.setFont(font, FONT_SIZE_SMALL)
                     c.drawString(col_x, img_y_start + IMG_MAX_HEIGHT / 2 - 2 * mm, "(yüklenemedi)")
-                    c.setFont(_FONT_BOLD, FONT_SIZE_SMALL)
+                    c.setFont(font_bold, FONT_SIZE_SMALL)
 
         y = img_y_start - SECTION_GAP
     else:
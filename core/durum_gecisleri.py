@@ -0,0 +1,40 @@
+"""
+İş kaydı durum geçişleri (başlat / tamamla) küme bazında. Seçili kayıtlar tek UPDATE ile yeni duruma geçer;
+saat alanı Coalesce ile yalnızca boşsa doldurulur. Kapatılan talepler tek UPDATE ile Yapıldı yapılır.
+WorkRecord.save() çağrılmaz: durum değişikliği form numarasını ve etkin müşteri / tesisi etkilemez, post_save
+gönderilmez. Bunun yerine değişen id'lerle is_kaydi_durumu_degisti sinyali gönderilir.
+"""
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Talep, WorkRecord
+from .signals import is_kaydi_durumu_degisti
+
+# Geçiş adı → (geçilebilen durum, yeni durum, doldurulacak saat alanı)
+GECISLER = {
+    "baslat": (WorkRecord.DURUM_BASLANMADI, WorkRecord.DURUM_DEVAM_EDIYOR, "baslama_saati"),
+    "bitir": (WorkRecord.DURUM_DEVAM_EDIYOR, WorkRecord.DURUM_TAMAMLANDI, "bitis_saati"),
+}
+
+
+def durum_gecisi(queryset, gecis):
+    """
+    queryset içindeki uygun durumdaki iş kayıtlarını gecis ("baslat" / "bitir") ile yeni duruma geçirir.
+    Kayıt sayısından bağımsız sabit sayıda sorgu. Değişen iş kaydı id'lerini döndürür.
+    """
+    kaynak, hedef, saat_alani = GECISLER[gecis]
+    simdi = timezone.now().time()
+    with transaction.atomic():
+        ids = list(
+            queryset.filter(durum=kaynak).select_for_update().order_by().values_list("pk", flat=True)
+        )
+        if not ids:
+            return []
+        WorkRecord.objects.filter(pk__in=ids).update(
+            durum=hedef, **{saat_alani: Coalesce(saat_alani, Value(simdi))},
+        )
+        Talep.objects.filter(kapatilan_is_kaydi__in=ids).exclude(durum="yapildi").update(durum="yapildi")
+    is_kaydi_durumu_degisti.send(sender=WorkRecord, ids=ids, durum=hedef)
+    return ids
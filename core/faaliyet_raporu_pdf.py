@@ -1,9 +1,11 @@
 """
-İş kaydı faaliyet raporu PDF üretimi. Türkçe font için core.label_pdf fontları kullanılır.
+İş kaydı faaliyet raporu PDF üretimi. Türkçe font için core.pdf_fonts kullanılır.
 Tasarım: Logo sol üst, Faaliyet Raporu sağ üst; ilk satır iki sütun (müşteri/tesis | iş bilgileri);
 bölümler tablo formatında; istasyon sayımı 3 sütun (bölge başlık, altında istasyon no + sayı).
 """
+import hashlib
 import io
+import json
 import os
 from collections import OrderedDict
 
@@ -12,10 +14,7 @@ from reportlab.lib.units import mm
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
 
-from . import label_pdf as _label_pdf
-
-_FONT = _label_pdf._FONT_NAME
-_FONT_BOLD = _label_pdf._FONT_BOLD_NAME
+from .pdf_fonts import font_names, string_width
 
 PAGE_WIDTH, PAGE_HEIGHT = A4
 MARGIN = 14 * mm
@@ -33,6 +32,8 @@ COL_WIDTH = (PAGE_WIDTH - 2 * MARGIN) / 3
 ISTASYON_HEADER_H = 4 * mm
 ISTASYON_ROW_H = 3.5 * mm
 ISTASYON_FONT = 6
+# Rapor tasarımı (yerleşim, metinler, logo) değiştiğinde artırılır; kayıtlı PDF'lerin parmak izi geçersiz olur
+SABLON_SURUMU = 1
 
 
 def _get_logo_path():
@@ -56,18 +57,19 @@ def _get_logo_path():
 
 def _draw_header(c, y):
     """Sol: logo + KALE İLAÇLAMA. Sağ üst: Faaliyet Raporu."""
+    _, font_bold = font_names()
     logo_path = _get_logo_path()
     if logo_path:
         try:
             c.drawImage(ImageReader(logo_path), MARGIN, y - LOGO_SIZE, width=LOGO_SIZE, height=LOGO_SIZE)
         except Exception:
             pass
-    c.setFont(_FONT_BOLD, FONT_SIZE_HEADER)
+    c.setFont(font_bold, FONT_SIZE_HEADER)
     c.drawString(MARGIN + LOGO_SIZE + 2 * mm, y - LOGO_SIZE / 2 - 2 * mm, "KALE İLAÇLAMA")
     # Sağ üst: Faaliyet Raporu
-    c.setFont(_FONT_BOLD, FONT_SIZE_TITLE)
+    c.setFont(font_bold, FONT_SIZE_TITLE)
     title = "Faaliyet Raporu"
-    tw = c.stringWidth(title, _FONT_BOLD, FONT_SIZE_TITLE)
+    tw = string_width(title, font_bold, FONT_SIZE_TITLE)
     c.drawString(PAGE_WIDTH - MARGIN - tw, y - LOGO_SIZE / 2 - 2 * mm, title)
     y -= LOGO_SIZE + 3 * mm
     return y
@@ -75,20 +77,21 @@ def _draw_header(c, y):
 
 def _draw_first_row(c, y, left_lines, right_lines):
     """İlk satır: sol sütun (müşteri, adres, tesis), sağ sütun (tarih, form no, başlama/bitiş...)."""
+    font, font_bold = font_names()
     col_width = (PAGE_WIDTH - 2 * MARGIN - 8 * mm) / 2
     x_left = MARGIN
     x_right = MARGIN + col_width + 8 * mm
-    c.setFont(_FONT_BOLD, FONT_SIZE)
+    c.setFont(font_bold, FONT_SIZE)
     c.drawString(x_left, y, "Müşteri / Tesis")
     c.drawString(x_right, y, "İş kaydı bilgileri")
     y -= LINE_HEIGHT * 0.8
-    c.setFont(_FONT, FONT_SIZE)
+    c.setFont(font, FONT_SIZE)
     max_rows = max(len(left_lines), len(right_lines))
     for i in range(max_rows):
         if y < MARGIN + LINE_HEIGHT:
             c.showPage()
             y = PAGE_HEIGHT - MARGIN
-            c.setFont(_FONT, FONT_SIZE)
+            c.setFont(font, FONT_SIZE)
         left = (left_lines[i] if i < len(left_lines) else "")[:55]
         right = (right_lines[i] if i < len(right_lines) else "")[:55]
         c.drawString(x_left, y, left)
@@ -99,26 +102,27 @@ def _draw_first_row(c, y, left_lines, right_lines):
 
 def _section_table(c, y, title, headers, rows, min_y=MARGIN):
     """Başlık + tablo (header row + data rows)."""
+    font, font_bold = font_names()
     if y < min_y + TABLE_HEADER_HEIGHT + 2 * TABLE_ROW_HEIGHT:
         c.showPage()
         y = PAGE_HEIGHT - MARGIN
     ncols = max(len(headers), 1)
     col_w = (PAGE_WIDTH - 2 * MARGIN - 4 * mm) / ncols
-    c.setFont(_FONT_BOLD, FONT_SIZE)
+    c.setFont(font_bold, FONT_SIZE)
     c.drawString(MARGIN, y, title)
     y -= LINE_HEIGHT * 0.7
     x_start = MARGIN
-    c.setFont(_FONT_BOLD, FONT_SIZE_SMALL)
+    c.setFont(font_bold, FONT_SIZE_SMALL)
     for i in range(ncols):
         h = (headers[i] if i < len(headers) else "") or ""
         c.drawString(x_start + i * col_w, y, h[:25])
     y -= TABLE_ROW_HEIGHT * 0.9
-    c.setFont(_FONT, FONT_SIZE_SMALL)
+    c.setFont(font, FONT_SIZE_SMALL)
     for row in rows:
         if y < min_y:
             c.showPage()
             y = PAGE_HEIGHT - MARGIN
-            c.setFont(_FONT, FONT_SIZE_SMALL)
+            c.setFont(font, FONT_SIZE_SMALL)
         row_padded = list(row) + [""] * (ncols - len(row))
         for i in range(ncols):
             cell = row_padded[i] if i < len(row_padded) else ""
@@ -141,14 +145,15 @@ def _format_date(d):
 
 def _draw_istasyon_3_columns(c, y, sayimlar_by_zone, min_y=MARGIN):
     """İstasyon tüketim: 3 sütun yan yana. Her sütunda bölge başlığı, altında İstasyon No | Tüketim (Var/Yok) listesi."""
+    font, font_bold = font_names()
     if not sayimlar_by_zone:
-        c.setFont(_FONT_BOLD, FONT_SIZE)
+        c.setFont(font_bold, FONT_SIZE)
         c.drawString(MARGIN, y, "Bölge ve istasyon tüketim sonuçları")
         y -= LINE_HEIGHT
-        c.setFont(_FONT, FONT_SIZE_SMALL)
+        c.setFont(font, FONT_SIZE_SMALL)
         c.drawString(MARGIN, y, "—")
         return y - SECTION_GAP
-    c.setFont(_FONT_BOLD, FONT_SIZE)
+    c.setFont(font_bold, FONT_SIZE)
     c.drawString(MARGIN, y, "Bölge ve istasyon tüketim sonuçları")
     y -= ISTASYON_HEADER_H
     col_w = COL_WIDTH
@@ -164,10 +169,10 @@ def _draw_istasyon_3_columns(c, y, sayimlar_by_zone, min_y=MARGIN):
             y = PAGE_HEIGHT - MARGIN
         for col_i, zone_name in enumerate(zone_group):
             x = MARGIN + col_i * (col_w + pad)
-            c.setFont(_FONT_BOLD, ISTASYON_FONT)
+            c.setFont(font_bold, ISTASYON_FONT)
             c.drawString(x, y, (zone_name or "—")[:22])
             yy = y - ISTASYON_ROW_H
-            c.setFont(_FONT, ISTASYON_FONT)
+            c.setFont(font, ISTASYON_FONT)
             for st_kod, tuketim_str in sayimlar_by_zone[zone_name]:
                 if yy < min_y:
                     break
@@ -179,22 +184,174 @@ def _draw_istasyon_3_columns(c, y, sayimlar_by_zone, min_y=MARGIN):
     return y - SECTION_GAP
 
 
-def generate_faaliyet_raporu_pdf(work_record):
+def _iliskili_kayitlar(wr, attr, *select_related, order_by=None):
+    """
+    İş kaydının alt kayıtlarını döndürür. prefetch_related ile önceden yüklendiyse önbellekten
+    (sorgusuz; sıralama Prefetch sorgusundan gelir), değilse select_related ile tek sorgu.
+    """
+    if not hasattr(wr, attr):
+        return []
+    if attr in getattr(wr, "_prefetched_objects_cache", {}):
+        return list(getattr(wr, attr).all())
+    qs = getattr(wr, attr).select_related(*select_related)
+    if order_by:
+        qs = qs.order_by(*order_by)
+    return list(qs)
+
+
+def faaliyet_raporu_queryset(queryset):
+    """
+    Rapor için gereken tüm ilişkileri yükleyen WorkRecord queryset'i: FK'ler select_related,
+    alt kayıtlar sıralı Prefetch ile. Kayıt sayısından bağımsız olarak sabit sayıda sorgu (1 + 5).
+    """
+    from django.db.models import Prefetch
+
+    from .models import (
+        WorkRecordFaaliyet,
+        WorkRecordIlac,
+        WorkRecordStationCount,
+        WorkRecordTespit,
+        WorkRecordUygulama,
+    )
+
+    return queryset.select_related(
+        "etkin_musteri", "etkin_tesis", "ekip", "ekip__ekip_lideri",
+        "kapatilan_talep", "kapatilan_talep__tip",
+    ).prefetch_related(
+        Prefetch(
+            "tespitler",
+            queryset=WorkRecordTespit.objects.select_related("tespit_tanim").order_by("tespit_tanim", "pk"),
+        ),
+        Prefetch(
+            "yapilan_uygulamalar",
+            queryset=WorkRecordUygulama.objects.select_related("uygulama_tanim").order_by("pk"),
+        ),
+        Prefetch(
+            "faaliyetler",
+            queryset=WorkRecordFaaliyet.objects.select_related("faaliyet_tanim").order_by("faaliyet_tanim", "pk"),
+        ),
+        Prefetch(
+            "kullanilan_ilaclar",
+            queryset=WorkRecordIlac.objects.select_related("ilac_tanim").order_by("ilac_tanim", "pk"),
+        ),
+        Prefetch(
+            "station_counts",
+            queryset=WorkRecordStationCount.objects.select_related(
+                "station__zone__facility__customer",
+            ).order_by("station__zone__kod", "station__kod"),
+        ),
+    )
+
+
+_MAKINE_ALANLARI = [
+    ("skb", "SKB"),
+    ("atomizor", "Atomizör"),
+    ("pulverizator", "Pülverizatör"),
+    ("termal_sis", "Termal Sis"),
+    ("ar_uz_ulv", "Ar.Üz. ULV"),
+    ("elk_ulv", "Elk. ULV"),
+    ("civi_tabancasi", "Çivi Tabancası"),
+]
+
+_FAALIYET_BAYRAKLARI = [
+    ("kontrol", "Kontrol"),
+    ("kuruldu", "Kuruldu"),
+    ("eklendi", "Eklendi"),
+    ("sabitlendi", "Sabitlendi"),
+    ("yeri_degistirildi", "Yeri Değiştirildi"),
+    ("yenilendi", "Yenilendi"),
+]
+
+
+def faaliyet_raporu_verisi(work_record):
     """
-    Tek bir WorkRecord için Faaliyet Raporu PDF'i üretir.
-    Müşteri ve tesis bilgisi iş kaydından; yoksa kapatılan talepten alınır.
+    WorkRecord'dan rapor veri modeli (yalnızca str/bool/list içeren dict) üretir. Alt kayıtlar
+    faaliyet_raporu_queryset ile yüklendiyse sorgu atılmaz. Dict süreç havuzuna ucuz aktarılır.
+    Müşteri ve tesis bilgisi etkin müşteri / tesisten (iş kaydındaki, yoksa kapatılan talepteki) alınır.
     """
     wr = work_record
     talep = getattr(wr, "kapatilan_talep", None)
-    # Önce iş kaydındaki müşteri/tesis, yoksa talepten
-    customer = getattr(wr, "customer", None)
-    facility = getattr(wr, "facility", None)
-    if not customer and talep:
-        customer = getattr(talep, "customer", None)
-    if not facility and talep:
-        facility = getattr(talep, "facility", None)
+    customer = wr.etkin_musteri
+    facility = wr.etkin_tesis
     ekip = getattr(wr, "ekip", None)
 
+    ekip_verisi = None
+    if ekip:
+        lider = getattr(ekip, "ekip_lideri", None)
+        lider_adi = (lider.get_full_name() or getattr(lider, "username", str(lider))) if lider else "—"
+        ekip_verisi = {"kod": ekip.kod, "kisi_sayisi": ekip.kisi_sayisi, "lider": lider_adi}
+
+    tespitler = []
+    for t in _iliskili_kayitlar(wr, "tespitler", "tespit_tanim"):
+        tt = getattr(t, "tespit_tanim", None)
+        yog = getattr(t, "get_yogunluk_display", lambda: "")() or getattr(t, "yogunluk", "")
+        tespit_eden = getattr(t, "get_tespit_eden_display", lambda: "")() or getattr(t, "tespit_eden", "")
+        tespitler.append([str(tt) if tt else "—", yog, tespit_eden])
+
+    faaliyetler = []
+    for f in _iliskili_kayitlar(wr, "faaliyetler", "faaliyet_tanim"):
+        ft = getattr(f, "faaliyet_tanim", None)
+        flags = [ad for alan, ad in _FAALIYET_BAYRAKLARI if getattr(f, alan, False)]
+        faaliyetler.append([str(ft) if ft else "—", ", ".join(flags) if flags else "—"])
+
+    istasyonlar = []
+    sayimlar = _iliskili_kayitlar(
+        wr, "station_counts", "station__zone__facility__customer",
+        order_by=("station__zone__kod", "station__kod"),
+    )
+    for sc in sayimlar:
+        st = getattr(sc, "station", None)
+        zone = getattr(st, "zone", None) if st else None
+        st_kod = (getattr(st, "kod", None) or getattr(st, "benzersiz_kod", "")) if st else "—"
+        istasyonlar.append([str(zone) if zone else "—", st_kod, bool(getattr(sc, "tuketim_var", False))])
+
+    return {
+        "pk": wr.pk,
+        "musteri": {
+            "kod": customer.kod, "firma_ismi": customer.firma_ismi, "adres": customer.adres or "",
+        } if customer else None,
+        "tesis": {"kod": facility.kod, "ad": facility.ad, "adres": facility.adres or ""} if facility else None,
+        "tarih": _format_date(wr.tarih),
+        "form_numarasi": wr.form_numarasi or "",
+        "baslama_saati": _format_time(wr.baslama_saati),
+        "bitis_saati": _format_time(wr.bitis_saati),
+        "ekip": ekip_verisi,
+        "ziyaret_tipi": str(talep.tip) if (talep and getattr(talep, "tip", None)) else "—",
+        "tespitler": tespitler,
+        "uygulamalar": [
+            str(getattr(u, "uygulama_tanim", u)) for u in _iliskili_kayitlar(wr, "yapilan_uygulamalar", "uygulama_tanim")
+        ],
+        "makine": [ad for alan, ad in _MAKINE_ALANLARI if getattr(wr, alan, False)],
+        "sozlesme_disi_islem_var": bool(getattr(wr, "sozlesme_disi_islem_var", False)),
+        "gozlem_ziyareti_yapilmali": bool(getattr(wr, "gozlem_ziyareti_yapilmali", False)),
+        "faaliyetler": faaliyetler,
+        "ilaclar": [
+            [str(getattr(i, "ilac_tanim", i)), str(getattr(i, "miktar", ""))]
+            for i in _iliskili_kayitlar(wr, "kullanilan_ilaclar", "ilac_tanim")
+        ],
+        "istasyonlar": istasyonlar,
+    }
+
+
+def faaliyet_raporu_verileri(queryset):
+    """WorkRecord queryset'i için rapor veri modelleri (sabit sayıda sorgu). [(work_record, veri), ...]"""
+    return [(wr, faaliyet_raporu_verisi(wr)) for wr in faaliyet_raporu_queryset(queryset)]
+
+
+def rapor_parmak_izi(veri):
+    """Rapor veri modeli + şablon sürümünün SHA-256 özeti (FaaliyetRaporu.parmak_izi)."""
+    icerik = json.dumps({"sablon": SABLON_SURUMU, "veri": veri}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(icerik.encode("utf-8")).hexdigest()
+
+
+def generate_faaliyet_raporu_pdf(veri):
+    """
+    Faaliyet Raporu PDF'i üretir. veri: faaliyet_raporu_verisi() dict'i (sorgusuz çizim);
+    WorkRecord verilirse veri modeli ondan oluşturulur.
+    """
+    if not isinstance(veri, dict):
+        veri = faaliyet_raporu_verisi(veri)
+
     buf = io.BytesIO()
     c = canvas.Canvas(buf, pagesize=A4)
     y = PAGE_HEIGHT - MARGIN
@@ -204,82 +361,56 @@ def generate_faaliyet_raporu_pdf(work_record):
 
     # İlk satır: sol = müşteri/tesis, sağ = iş kaydı bilgileri
     left_lines = []
+    customer = veri["musteri"]
+    facility = veri["tesis"]
     if customer:
-        left_lines.append(f"{customer.kod} - {customer.firma_ismi}")
-        if customer.adres:
-            addr = (customer.adres[:100] or "").replace("\n", " ").strip()
+        left_lines.append(f"{customer['kod']} - {customer['firma_ismi']}")
+        if customer["adres"]:
+            addr = (customer["adres"][:100] or "").replace("\n", " ").strip()
             if addr:
                 left_lines.append(addr)
     if facility:
-        left_lines.append(f"Tesis: {facility.kod} - {facility.ad}")
-        if facility.adres:
-            left_lines.append(facility.adres[:60].replace("\n", " "))
+        left_lines.append(f"Tesis: {facility['kod']} - {facility['ad']}")
+        if facility["adres"]:
+            left_lines.append(facility["adres"][:60].replace("\n", " "))
     if not left_lines:
         left_lines.append("—")
 
+    ekip = veri["ekip"]
     right_lines = [
-        f"Tarih: {_format_date(wr.tarih)}",
-        f"Form no: {wr.form_numarasi or '—'}",
-        f"Başlama: {_format_time(wr.baslama_saati)}  Bitiş: {_format_time(wr.bitis_saati)}",
-        f"Ekip: {ekip.kod if ekip else '—'}",
+        f"Tarih: {veri['tarih']}",
+        f"Form no: {veri['form_numarasi'] or '—'}",
+        f"Başlama: {veri['baslama_saati']}  Bitiş: {veri['bitis_saati']}",
+        f"Ekip: {ekip['kod'] if ekip else '—'}",
     ]
     y = _draw_first_row(c, y, left_lines, right_lines)
 
     # Ekip detay (tablo)
-    ekip_rows = []
     if ekip:
-        lider = getattr(ekip, "ekip_lideri", None)
-        lider_adi = (lider.get_full_name() or getattr(lider, "username", str(lider))) if lider else "—"
-        ekip_rows = [[f"Çalışan sayısı: {ekip.kisi_sayisi}", f"Sorumlu: {lider_adi}"]]
+        ekip_rows = [[f"Çalışan sayısı: {ekip['kisi_sayisi']}", f"Sorumlu: {ekip['lider']}"]]
     else:
         ekip_rows = [["—", "—"]]
-    y = _section_table(c, y, "Ekip", ["", ""], ekip_rows if ekip_rows else [["—", "—"]])
+    y = _section_table(c, y, "Ekip", ["", ""], ekip_rows)
 
     # Ziyaret şekli
-    tip_ad = str(talep.tip) if (talep and getattr(talep, "tip", None)) else "—"
-    y = _section_table(c, y, "Ziyaret şekli (Talep tipi)", ["Tip"], [[tip_ad]])
+    y = _section_table(c, y, "Ziyaret şekli (Talep tipi)", ["Tip"], [[veri["ziyaret_tipi"]]])
 
     # Tespitler (tablo)
-    tespitler = list(wr.tespitler.select_related("tespit_tanim").all()) if hasattr(wr, "tespitler") else []
-    tespit_rows = []
-    for t in tespitler:
-        tt = getattr(t, "tespit_tanim", None)
-        yog = getattr(t, "get_yogunluk_display", lambda: "")() or getattr(t, "yogunluk", "")
-        tespit_eden = getattr(t, "get_tespit_eden_display", lambda: "")() or getattr(t, "tespit_eden", "")
-        tespit_rows.append([str(tt) if tt else "—", yog, tespit_eden])
-    if not tespit_rows:
-        tespit_rows = [["—", "—", "—"]]
+    tespit_rows = veri["tespitler"] or [["—", "—", "—"]]
     y = _section_table(c, y, "Tespitler", ["Tespit", "Yoğunluk", "Tespit eden"], tespit_rows)
 
     # Yapılan çalışmalar
-    uygulamalar = list(wr.yapilan_uygulamalar.select_related("uygulama_tanim").all()) if hasattr(wr, "yapilan_uygulamalar") else []
-    uyg_rows = [[str(getattr(u, "uygulama_tanim", u))] for u in uygulamalar]
-    if not uyg_rows:
-        uyg_rows = [["—"]]
+    uyg_rows = [[u] for u in veri["uygulamalar"]] or [["—"]]
     y = _section_table(c, y, "Yapılan çalışmalar (Faaliyetler)", ["Uygulama"], uyg_rows)
 
     # Makine ve ekipmanlar
-    makine = []
-    if getattr(wr, "skb", False):
-        makine.append("SKB")
-    if getattr(wr, "atomizor", False):
-        makine.append("Atomizör")
-    if getattr(wr, "pulverizator", False):
-        makine.append("Pülverizatör")
-    if getattr(wr, "termal_sis", False):
-        makine.append("Termal Sis")
-    if getattr(wr, "ar_uz_ulv", False):
-        makine.append("Ar.Üz. ULV")
-    if getattr(wr, "elk_ulv", False):
-        makine.append("Elk. ULV")
-    if getattr(wr, "civi_tabancasi", False):
-        makine.append("Çivi Tabancası")
+    makine = veri["makine"]
     makine_rows = [[", ".join(makine)] if makine else ["—"]]
     y = _section_table(c, y, "Makine ve ekipmanlar", ["Ekipman"], makine_rows)
 
     # Kutucuklar
-    k1 = "Evet" if getattr(wr, "sozlesme_disi_islem_var", False) else "Hayır"
-    k2 = "Evet" if getattr(wr, "gozlem_ziyareti_yapilmali", False) else "Hayır"
+    k1 = "Evet" if veri["sozlesme_disi_islem_var"] else "Hayır"
+    k2 = "Evet" if veri["gozlem_ziyareti_yapilmali"] else "Hayır"
     y = _section_table(
         c, y, "Kutucuklar",
         ["Sözleşme dışı işlem", "Gözlem ziyareti yapılmalı"],
@@ -287,50 +418,17 @@ def generate_faaliyet_raporu_pdf(work_record):
     )
 
     # Düzeltici önleyici faaliyetler
-    faaliyetler = list(wr.faaliyetler.select_related("faaliyet_tanim").all()) if hasattr(wr, "faaliyetler") else []
-    df_rows = []
-    for f in faaliyetler:
-        ft = getattr(f, "faaliyet_tanim", None)
-        flags = []
-        if getattr(f, "kontrol", False):
-            flags.append("Kontrol")
-        if getattr(f, "kuruldu", False):
-            flags.append("Kuruldu")
-        if getattr(f, "eklendi", False):
-            flags.append("Eklendi")
-        if getattr(f, "sabitlendi", False):
-            flags.append("Sabitlendi")
-        if getattr(f, "yeri_degistirildi", False):
-            flags.append("Yeri Değiştirildi")
-        if getattr(f, "yenilendi", False):
-            flags.append("Yenilendi")
-        df_rows.append([str(ft) if ft else "—", ", ".join(flags) if flags else "—"])
-    if not df_rows:
-        df_rows = [["—", "—"]]
+    df_rows = veri["faaliyetler"] or [["—", "—"]]
     y = _section_table(c, y, "Düzeltici önleyici faaliyetler", ["Faaliyet", "Durum"], df_rows)
 
     # Kullanılan ilaç ve fare yemi
-    ilaclar = list(wr.kullanilan_ilaclar.select_related("ilac_tanim").all()) if hasattr(wr, "kullanilan_ilaclar") else []
-    ilac_rows = [[str(getattr(i, "ilac_tanim", i)), str(getattr(i, "miktar", ""))] for i in ilaclar]
-    if not ilac_rows:
-        ilac_rows = [["—", "—"]]
+    ilac_rows = veri["ilaclar"] or [["—", "—"]]
     y = _section_table(c, y, "Kullanılan ilaç ve fare yemi", ["İlaç / Ürün", "Miktar"], ilac_rows)
 
     # İstasyon sayımı: bölgelere göre grupla, 3 sütun
-    sayimlar = (
-        wr.station_counts.select_related("station", "station__zone")
-        .order_by("station__zone__kod", "station__kod")
-    ) if hasattr(wr, "station_counts") else []
     sayimlar_by_zone = OrderedDict()
-    for sc in sayimlar:
-        st = getattr(sc, "station", None)
-        zone = getattr(st, "zone", None) if st else None
-        zone_name = str(zone) if zone else "—"
-        st_kod = (getattr(st, "kod", None) or getattr(st, "benzersiz_kod", "")) if st else "—"
-        if zone_name not in sayimlar_by_zone:
-            sayimlar_by_zone[zone_name] = []
-        tuketim = getattr(sc, "tuketim_var", False)
-        sayimlar_by_zone[zone_name].append((st_kod, "Var" if tuketim else "Yok"))
+    for zone_name, st_kod, tuketim in veri["istasyonlar"]:
+        sayimlar_by_zone.setdefault(zone_name, []).append((st_kod, "Var" if tuketim else "Yok"))
     y = _draw_istasyon_3_columns(c, y, sayimlar_by_zone)
 
     c.save()
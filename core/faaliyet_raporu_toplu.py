@@ -0,0 +1,258 @@
+"""
+Toplu faaliyet raporu üretimi. Seçili iş kayıtları tüm alt kayıtlarıyla birlikte sabit sayıda sorguda yüklenip
+rapor veri modellerine (dict) çevrilir, PDF'ler süreç havuzunda üretilir, dosyalar yazılıp FaaliyetRaporu satırları toplu upsert edilir.
+İlerleme FaaliyetRaporuIsi kaydında tutulur; admin aksiyonu işi sıraya alıp hemen döner.
+İşler web isteği dışında, `manage.py faaliyet_raporu_isleri --surekli` işçi sürecinde çalışır
+(FAALIYET_RAPORU_CALISTIRICI="thread": işçi yoksa web worker içindeki arka plan thread'i; worker yeniden başlarsa iş ölür).
+Süreç sayısı FAALIYET_RAPORU_SURECLERI ayarından alınır (0: CPU sayısı, 1: havuz yok); havuz "spawn" ile kurulur.
+İşçi yeniden başlatılırsa yarıda kalan iş ZAMAN_ASIMI_DAKIKA sonra Hata olarak kapatılır (takilan_isleri_kapat).
+Parmak izi (veri + şablon sürümü) kayıtlı raporla aynıysa PDF yeniden üretilmez; yenilenen raporun eski dosyası silinir.
+"""
+import datetime
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connections, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from .faaliyet_raporu_pdf import faaliyet_raporu_verileri, generate_faaliyet_raporu_pdf, rapor_parmak_izi
+from .models import FaaliyetRaporu, FaaliyetRaporuIsi, WorkRecord
+
+logger = logging.getLogger(__name__)
+
+# Her turda yüklenip işlenen iş kaydı sayısı (ilerleme bu aralıklarla güncellenir)
+PARCA_BOYUTU = 25
+# Bu kadar dakika ilerleme yazmayan bekleyen / çalışan iş yarıda kalmış sayılır
+ZAMAN_ASIMI_DAKIKA = 15
+CALISTIRICI_KOMUT = "komut"
+CALISTIRICI_THREAD = "thread"
+
+
+def surec_sayisi():
+    """PDF üretimi için süreç sayısı: FAALIYET_RAPORU_SURECLERI (0 veya ayarsız: CPU sayısı)."""
+    return getattr(settings, "FAALIYET_RAPORU_SURECLERI", 0) or os.cpu_count() or 1
+
+
+def rapor_alanlari(wr):
+    """FaaliyetRaporu için müşteri kodu, iş kaydı kodu ve dosya adı."""
+    musteri_kod = wr.etkin_musteri.kod if wr.etkin_musteri_id else ""
+    is_kaydi_kod = wr.form_numarasi or f"WR-{wr.pk}"
+    return musteri_kod, is_kaydi_kod, f"{is_kaydi_kod}_faaliyet.pdf"
+
+
+def _render(veri):
+    """İşçide tek raporu üretir: (pk, pdf_bytes, hata_mesajı). Veritabanına erişmez."""
+    try:
+        return veri["pk"], generate_faaliyet_raporu_pdf(veri), None
+    except Exception as e:
+        return veri["pk"], None, str(e)
+
+
+def mevcut_raporlar(work_record_ids):
+    """{work_record_id: (parmak_izi, pdf dosya adı)}: yalnızca PDF'i oluşturulmuş raporlar (tek sorgu)."""
+    return {
+        wr_id: (parmak_izi, pdf)
+        for wr_id, parmak_izi, pdf in FaaliyetRaporu.objects.filter(
+            work_record_id__in=work_record_ids, rapor_olusturuldu=True,
+        ).exclude(pdf="").exclude(pdf__isnull=True).values_list("work_record_id", "parmak_izi", "pdf")
+    }
+
+
+def rapor_guncel_mi(mevcut, parmak_izi):
+    """mevcut_raporlar() kaydı verilen parmak iziyle üretilmiş ve dosyası duruyorsa True."""
+    if not mevcut or not mevcut[0] or mevcut[0] != parmak_izi:
+        return False
+    return FaaliyetRaporu._meta.get_field("pdf").storage.exists(mevcut[1])
+
+
+def raporlari_kaydet(work_records, sonuclar, parmak_izleri, mevcut):
+    """
+    Üretilen PDF'leri dosyaya yazar ve FaaliyetRaporu satırlarını tek sorguda upsert eder.
+    sonuclar: [(pk, pdf_bytes, hata)], parmak_izleri: {pk: parmak_izi}, mevcut: mevcut_raporlar() çıktısı.
+    Yerine yenisi yazılan eski PDF dosyaları commit sonrası silinir. Kaydedilen rapor sayısını döndürür.
+    """
+    pdf_field = FaaliyetRaporu._meta.get_field("pdf")
+    storage = pdf_field.storage
+    by_pk = {wr.pk: wr for wr in work_records}
+    raporlar = []
+    eski_dosyalar = []
+    for pk, pdf_bytes, hata in sonuclar:
+        if hata is not None:
+            continue
+        wr = by_pk[pk]
+        musteri_kod, is_kaydi_kod, dosya_adi = rapor_alanlari(wr)
+        rapor = FaaliyetRaporu(
+            work_record=wr,
+            musteri_kod=musteri_kod,
+            is_kaydi_kod=is_kaydi_kod,
+            rapor_tarihi=wr.tarih,
+            rapor_olusturuldu=True,
+            parmak_izi=parmak_izleri.get(pk, ""),
+        )
+        name = pdf_field.generate_filename(rapor, dosya_adi)
+        rapor.pdf.name = storage.save(name, ContentFile(pdf_bytes), max_length=pdf_field.max_length)
+        raporlar.append(rapor)
+        if pk in mevcut and mevcut[pk][1]:
+            eski_dosyalar.append(mevcut[pk][1])
+    if raporlar:
+        FaaliyetRaporu.objects.bulk_create(
+            raporlar,
+            update_conflicts=True,
+            unique_fields=["work_record"],
+            update_fields=["musteri_kod", "is_kaydi_kod", "rapor_tarihi", "rapor_olusturuldu", "pdf", "parmak_izi"],
+        )
+
+    def _eski_dosyalari_sil():
+        for name in eski_dosyalar:
+            storage.delete(name)
+
+    if eski_dosyalar:
+        transaction.on_commit(_eski_dosyalari_sil)
+    return len(raporlar)
+
+
+def takilan_isleri_kapat():
+    """
+    İlerleme yazmadan ZAMAN_ASIMI_DAKIKA geçmiş çalışan işleri Hata olarak kapatır (işçi yeniden başlatılınca iş
+    "çalışıyor"da kalır). Bekleyen işler yalnızca sıra ilerlemiyorsa (ilerleyen çalışan iş yoksa) kapatılır:
+    uzun bir işin arkasında sırada bekleyen iş zaman aşımına uğramaz. Kapatılan iş sayısını döndürür.
+    """
+    sinir = timezone.now() - datetime.timedelta(minutes=ZAMAN_ASIMI_DAKIKA)
+    isler = FaaliyetRaporuIsi.objects.filter(Q(guncellendi__lt=sinir) | Q(guncellendi__isnull=True, created_at__lt=sinir))
+    kapatilan = isler.filter(durum=FaaliyetRaporuIsi.DURUM_CALISIYOR).update(
+        durum=FaaliyetRaporuIsi.DURUM_HATA,
+        mesaj=Concat(
+            F("mesaj"),
+            Value(f"\nİş yarıda kaldı: {ZAMAN_ASIMI_DAKIKA} dakikadır ilerleme yok (işçi yeniden başlatılmış olabilir)."),
+        ),
+        bitis=timezone.now(),
+    )
+    if not FaaliyetRaporuIsi.objects.filter(durum=FaaliyetRaporuIsi.DURUM_CALISIYOR, guncellendi__gte=sinir).exists():
+        kapatilan += isler.filter(durum=FaaliyetRaporuIsi.DURUM_BEKLIYOR).update(
+            durum=FaaliyetRaporuIsi.DURUM_HATA,
+            mesaj=Concat(
+                F("mesaj"),
+                Value(
+                    f"\nİş başlatılamadı: {ZAMAN_ASIMI_DAKIKA} dakikadır sırada "
+                    "(faaliyet_raporu_isleri işçisi çalışmıyor olabilir)."
+                ),
+            ),
+            bitis=timezone.now(),
+        )
+    return kapatilan
+
+
+def isi_al(is_id=None):
+    """
+    Bekleyen işi (is_id verilmezse en eskisini) Çalışıyor yaparak sahiplenir; tek koşullu UPDATE ile aynı işi iki
+    işçi alamaz. Alınan FaaliyetRaporuIsi'ni, alınacak iş yoksa None döndürür.
+    """
+    bekleyenler = FaaliyetRaporuIsi.objects.filter(durum=FaaliyetRaporuIsi.DURUM_BEKLIYOR)
+    adaylar = [is_id] if is_id is not None else bekleyenler.order_by("created_at", "pk").values_list("pk", flat=True)[:5]
+    for pk in adaylar:
+        if bekleyenler.filter(pk=pk).update(durum=FaaliyetRaporuIsi.DURUM_CALISIYOR, guncellendi=timezone.now()):
+            return FaaliyetRaporuIsi.objects.get(pk=pk)
+    return None
+
+
+def isi_calistir(rapor_isi):
+    """isi_al() ile alınmış işin raporlarını üretir; hata işe yazılır ve loglanır (yükseltilmez)."""
+    try:
+        toplu_rapor_olustur(rapor_isi.pk, rapor_isi.is_kayitlari)
+    except Exception:
+        # Hata FaaliyetRaporuIsi kaydına da yazıldı
+        logger.exception("Faaliyet raporu işi #%s başarısız oldu", rapor_isi.pk)
+
+
+def toplu_rapor_olustur(is_id, work_record_ids, processes=None):
+    """
+    FaaliyetRaporuIsi için raporları üretir (parmak izi değişmeyenler atlanır).
+    processes=None: surec_sayisi(); 1: havuz kullanılmaz. İş kayıtları PARCA_BOYUTU'luk
+    parçalar halinde yüklenir; her parça sonrası ilerleme (tamamlanan/hatali/guncellendi) veritabanına yazılır.
+    """
+    work_record_ids = sorted(work_record_ids)
+    FaaliyetRaporuIsi.objects.filter(pk=is_id).update(
+        durum=FaaliyetRaporuIsi.DURUM_CALISIYOR, toplam=len(work_record_ids), guncellendi=timezone.now(),
+    )
+    if processes is None:
+        processes = surec_sayisi()
+    hatalar = []
+    # spawn: çağıran süreçten (thread modunda web worker) fork edilmez; işçi Django'yu django.setup ile kendisi kurar
+    pool = ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=django.setup,
+    ) if processes > 1 else None
+    try:
+        for i in range(0, len(work_record_ids), PARCA_BOYUTU):
+            parca_ids = work_record_ids[i:i + PARCA_BOYUTU]
+            parca = faaliyet_raporu_verileri(WorkRecord.objects.filter(pk__in=parca_ids).order_by("pk"))
+            mevcut = mevcut_raporlar(parca_ids)
+            parmak_izleri = {wr.pk: rapor_parmak_izi(veri) for wr, veri in parca}
+            # Verisi değişmemiş raporlar atlanır (tamamlanmış sayılır)
+            veriler = [veri for wr, veri in parca if not rapor_guncel_mi(mevcut.get(wr.pk), parmak_izleri[wr.pk])]
+            atlanan = len(parca) - len(veriler)
+            sonuclar = list(pool.map(_render, veriler)) if pool else [_render(veri) for veri in veriler]
+            with transaction.atomic():
+                kaydedilen = raporlari_kaydet([wr for wr, _ in parca], sonuclar, parmak_izleri, mevcut) + atlanan
+            parca_hatalari = [f"İş kaydı {pk}: {hata}" for pk, _, hata in sonuclar if hata is not None]
+            hatalar.extend(parca_hatalari)
+            FaaliyetRaporuIsi.objects.filter(pk=is_id).update(
+                tamamlanan=F("tamamlanan") + kaydedilen,
+                hatali=F("hatali") + len(parca_hatalari),
+                guncellendi=timezone.now(),
+            )
+    except Exception as e:
+        hatalar.append(str(e))
+        FaaliyetRaporuIsi.objects.filter(pk=is_id).update(
+            durum=FaaliyetRaporuIsi.DURUM_HATA, mesaj="\n".join(hatalar), bitis=timezone.now(),
+        )
+        raise
+    finally:
+        if pool:
+            pool.shutdown()
+    FaaliyetRaporuIsi.objects.filter(pk=is_id).update(
+        durum=FaaliyetRaporuIsi.DURUM_TAMAMLANDI, mesaj="\n".join(hatalar), bitis=timezone.now(),
+    )
+
+
+def _arka_planda_calistir(is_id):
+    try:
+        rapor_isi = isi_al(is_id)
+        if rapor_isi is not None:
+            isi_calistir(rapor_isi)
+    finally:
+        close_old_connections()
+        connections.close_all()
+
+
+def toplu_rapor_isi_baslat(work_record_ids, user=None):
+    """
+    İşi iş kayıtlarıyla birlikte sıraya alır ve FaaliyetRaporuIsi döndürür. Varsayılan olarak işi
+    faaliyet_raporu_isleri işçisi alır; FAALIYET_RAPORU_CALISTIRICI="thread" ise iş bu süreçteki arka plan
+    thread'inde çalışır (tek süreçli kurulumlar için; worker yeniden başlarsa iş yarıda kalır).
+    """
+    work_record_ids = list(work_record_ids)
+    rapor_isi = FaaliyetRaporuIsi.objects.create(
+        toplam=len(work_record_ids),
+        is_kayitlari=work_record_ids,
+        olusturan=user if getattr(user, "pk", None) else None,
+    )
+    if getattr(settings, "FAALIYET_RAPORU_CALISTIRICI", CALISTIRICI_KOMUT) == CALISTIRICI_THREAD:
+        thread = threading.Thread(
+            target=_arka_planda_calistir,
+            args=(rapor_isi.pk,),
+            name=f"faaliyet-raporu-isi-{rapor_isi.pk}",
+            daemon=True,
+        )
+        # İş kaydı commit edildikten sonra başlat (thread kendi bağlantısıyla okur)
+        transaction.on_commit(thread.start)
+    return rapor_isi
@@ -1,3 +1,5 @@
+import datetime
+
 from django import forms
 from django.forms import inlineformset_factory
 from django.utils import timezone
@@ -90,3 +92,47 @@ class TalepAdminForm(forms.ModelForm):
             if "tarih" not in kwargs["initial"]:
                 kwargs["initial"]["tarih"] = timezone.localdate()
         super().__init__(*args, **kwargs)
+
+
+class VadeListesiForm(forms.Form):
+    """Vadesi gelen periyodik ziyaretler: tarih aralığı (varsayılan önümüzdeki 7 gün) ve isteğe bağlı tesis."""
+    baslangic = forms.DateField(
+        label="Başlangıç",
+        widget=forms.DateInput(attrs={"type": "date", "class": "w-full rounded border border-base-300 dark:border-base-600 bg-white dark:bg-base-800 px-3 py-2"}),
+    )
+    bitis = forms.DateField(
+        label="Bitiş",
+        widget=forms.DateInput(attrs={"type": "date", "class": "w-full rounded border border-base-300 dark:border-base-600 bg-white dark:bg-base-800 px-3 py-2"}),
+    )
+    tesis = forms.ModelChoiceField(
+        label="Tesis",
+        queryset=Facility.objects.none(),
+        required=False,
+    )
+
+    def __init__(self, data=None, *args, **kwargs):
+        if not data:
+            bugun = timezone.localdate()
+            data = {"baslangic": bugun, "bitis": bugun + datetime.timedelta(days=6)}
+        super().__init__(data, *args, **kwargs)
+        self.fields["tesis"].queryset = Facility.objects.select_related("customer").order_by("customer__kod", "kod")
+        self.fields["tesis"].widget.attrs["class"] = "w-full rounded border border-base-300 dark:border-base-600 bg-white dark:bg-base-800 px-3 py-2"
+
+    def clean(self):
+        data = super().clean()
+        if data.get("baslangic") and data.get("bitis") and data["baslangic"] > data["bitis"]:
+            raise forms.ValidationError("Bitiş tarihi başlangıçtan önce olamaz.")
+        return data
+
+
+class EkipRotaForm(forms.Form):
+    """Ekip günlük rotası: tarih (varsayılan bugün)."""
+    tarih = forms.DateField(
+        label="Tarih",
+        widget=forms.DateInput(attrs={"type": "date", "class": "w-full rounded border border-base-300 dark:border-base-600 bg-white dark:bg-base-800 px-3 py-2"}),
+    )
+
+    def __init__(self, data=None, *args, **kwargs):
+        if not data:
+            data = {"tarih": timezone.localdate()}
+        super().__init__(data, *args, **kwargs)
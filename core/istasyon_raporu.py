@@ -2,24 +2,28 @@
 İstasyon raporu: Tesis + tarih aralığı seçilir, Excel indirilir.
 Bölüm (zone) bazında istasyonlar; her iş kaydı tarihi bir sütun, hücrede tüketim (Var/Yok).
 """
-from collections import defaultdict
-from datetime import date
+import csv
+import json
+from array import array
 from io import BytesIO
 
 from django import forms
-from django.http import HttpResponse
 
-from django.db.models import Q
-
-from .models import Facility, WorkRecord, WorkRecordStationCount, Station
+from .models import Customer, Facility, IstasyonTuketimOzeti, WorkRecord, WorkRecordStationCount, Station
 
 
 class IstasyonRaporuForm(forms.Form):
-    """Tesis ve tarih aralığı seçimi."""
+    """Tesis (veya müşterinin tüm tesisleri) ve tarih aralığı seçimi."""
     tesis = forms.ModelChoiceField(
         label="Tesis",
         queryset=Facility.objects.none(),
-        required=True,
+        required=False,
+    )
+    musteri = forms.ModelChoiceField(
+        label="Müşteri (tüm tesisler)",
+        queryset=Customer.objects.none(),
+        required=False,
+        help_text="Tesis yerine müşteri seçilirse her tesis ayrı sayfada, özet sayfasıyla tek Excel dosyası üretilir.",
     )
     baslangic_tarihi = forms.DateField(
         label="Başlangıç tarihi",
@@ -36,91 +40,126 @@ class IstasyonRaporuForm(forms.Form):
         super().__init__(*args, **kwargs)
         self.fields["tesis"].queryset = Facility.objects.select_related("customer").order_by("customer__kod", "kod")
         self.fields["tesis"].widget.attrs["class"] = "w-full rounded border border-base-300 dark:border-base-600 bg-white dark:bg-base-800 px-3 py-2"
+        self.fields["musteri"].queryset = Customer.objects.order_by("kod")
+        self.fields["musteri"].widget.attrs["class"] = "w-full rounded border border-base-300 dark:border-base-600 bg-white dark:bg-base-800 px-3 py-2"
 
     def clean(self):
         data = super().clean()
         if data.get("baslangic_tarihi") and data.get("bitis_tarihi"):
             if data["baslangic_tarihi"] > data["bitis_tarihi"]:
                 raise forms.ValidationError("Bitiş tarihi başlangıçtan önce olamaz.")
+        if "tesis" in data and "musteri" in data:
+            if not data["tesis"] and not data["musteri"]:
+                raise forms.ValidationError("Tesis veya müşteri seçin.")
+            if data["tesis"] and data["musteri"]:
+                raise forms.ValidationError("Tesis ve müşteri birlikte seçilemez.")
         return data
 
 
-def get_istasyon_raporu_data(facility_id, start_date, end_date):
+# Matris hücre değerleri: sayım yok / tüketim yok / tüketim var
+EKSIK, YOK, VAR = -1, 0, 1
+_HUCRE_DEGERI = {EKSIK: None, YOK: False, VAR: True}
+
+
+def _rapor_verisi_olustur(facility, work_records, stations, counts, ozetler=None, hucreler=True):
     """
-    Tesis ve tarih aralığına göre rapor verisini döndürür.
-    Dönüş: musteri_tesis, adres, date_headers, rows, ratio_genel, ratio_by_zone, zone_stats.
+    Sorgu sonuçlarından rapor verisini üretir (veritabanına erişmez).
+    work_records: [(id, tarih)] tarih sırasıyla; stations: bölge/kod sırasıyla (zone__facility__customer yüklü);
+    counts: [(work_record_id, station_id, tuketim_var)].
+    ozetler: [(work_record_id, zone_id, var_sayisi)] (IstasyonTuketimOzeti); verilirse oran satırları ve bölge
+    istatistiklerinin Var sayıları buradan okunur, verilmezse sayımlardan toplanır.
+    Sayımlar istasyon × tarih yoğun int8 matrisine (array("b"), satır sıralı; -1 eksik, 0 yok, 1 var) yazılır;
+    ilk-son istasyon değişimi aynı geçişte bit kümeleriyle bulunur.
+    hucreler=False: rows[].counts (hücre başına Python nesnesi) oluşturulmaz; Excel / CSV / JSON hücreleri matristen okur.
     """
-    facility = Facility.objects.select_related("customer").get(pk=facility_id)
     customer = facility.customer
     musteri_tesis = f"{customer.firma_ismi} - {facility.ad}"
     adres = (facility.adres or "").strip() or (customer.adres or "").strip() or "—"
 
-    work_records = list(
-        WorkRecord.objects.filter(
-            Q(kapatilan_talep__facility_id=facility_id) | Q(facility_id=facility_id),
-            tarih__gte=start_date,
-            tarih__lte=end_date,
-        )
-        .order_by("tarih")
-        .values_list("id", "tarih")
-    )
-    wr_ids = [wr[0] for wr in work_records]
-    stations = list(
-        Station.objects.filter(zone__facility_id=facility_id)
-        .select_related("zone")
-        .order_by("zone__kod", "kod")
-    )
-    counts_qs = WorkRecordStationCount.objects.filter(
-        work_record_id__in=wr_ids,
-        station_id__in=[s.id for s in stations],
-    ).values_list("work_record_id", "station_id", "tuketim_var")
-    count_map = {(wr_id, st_id): val for wr_id, st_id, val in counts_qs}
+    n_st = len(stations)
+    n_wr = len(work_records)
+    wr_index = {wr_id: j for j, (wr_id, _) in enumerate(work_records)}
+    st_index = {st.id: i for i, st in enumerate(stations)}
+
+    # Bölge adları zone başına bir kez; satır → bölge indeksi (bölgeler ilk görülme sırasıyla)
+    zone_names = []
+    zone_index = {}
+    zone_id_index = {}
+    row_zone = []
+    zone_totals = []
+    for st in stations:
+        zone_name = str(st.zone) if st.zone else "—"
+        z = zone_index.get(zone_name)
+        if z is None:
+            z = zone_index[zone_name] = len(zone_names)
+            zone_names.append(zone_name)
+            zone_totals.append(0)
+        zone_totals[z] += 1
+        zone_id_index[st.zone_id] = z
+        row_zone.append(z)
+
+    matris = array("b", [EKSIK]) * (n_st * n_wr)
+    var_genel = [0] * n_wr
+    var_zone = [[0] * n_wr for _ in zone_names]
+    # İlk / son tarihte tüketim olan istasyonlar bit kümesi olarak (bit i = satır i)
+    ilk_bits = son_bits = 0
+    ilk_j, son_j = 0, n_wr - 1
+    sayimdan_topla = ozetler is None
+    for wr_id, st_id, tuketim_var in counts:
+        i = st_index.get(st_id)
+        j = wr_index.get(wr_id)
+        if i is None or j is None:
+            continue
+        if tuketim_var:
+            matris[i * n_wr + j] = VAR
+            if sayimdan_topla:
+                var_genel[j] += 1
+                var_zone[row_zone[i]][j] += 1
+            if j == ilk_j:
+                ilk_bits |= 1 << i
+            if j == son_j:
+                son_bits |= 1 << i
+        else:
+            matris[i * n_wr + j] = YOK
+    if not sayimdan_topla:
+        for wr_id, zone_id, var_sayisi in ozetler:
+            j = wr_index.get(wr_id)
+            z = zone_id_index.get(zone_id)
+            if j is None or z is None:
+                continue
+            var_genel[j] += var_sayisi
+            var_zone[z][j] += var_sayisi
 
-    date_headers = [wr[1].strftime("%d.%m.%Y") for wr in work_records]
+    date_headers = [tarih.strftime("%d.%m.%Y") for _, tarih in work_records]
     rows = []
-    for station in stations:
-        zone_name = str(station.zone) if station.zone else "—"
-        counts = [count_map.get((wr[0], station.id)) for wr in work_records]
-        rows.append({
-            "zone": zone_name,
-            "kod": station.kod,
-            "ad": station.ad or "",
-            "counts": counts,
-        })
-
-    total_stations = len(stations)
-    # Tüketim oranı (genel): her tarih için Var/toplam
-    ratio_genel = []
-    for wr in work_records:
-        var_count = sum(1 for i, r in enumerate(rows) if count_map.get((wr[0], stations[i].id)) is True)
-        ratio_genel.append(var_count / total_stations if total_stations else 0)
-
-    # Bölge bazlı istasyon grupları
-    zone_stations = defaultdict(list)
-    for station in stations:
-        zone_name = str(station.zone) if station.zone else "—"
-        zone_stations[zone_name].append(station)
+    for i, st in enumerate(stations):
+        row = {"zone": zone_names[row_zone[i]], "kod": st.kod, "ad": st.ad or ""}
+        if hucreler:
+            row["counts"] = [_HUCRE_DEGERI[v] for v in matris[i * n_wr:(i + 1) * n_wr]]
+        rows.append(row)
 
+    # Tüketim oranı (genel): her tarih için Var/toplam
+    ratio_genel = [v / n_st if n_st else 0 for v in var_genel]
     # Tüketim oranı (bölge): her bölge için her tarihteki Var/toplam(bölge)
-    ratio_by_zone = {}
-    for zone_name, st_list in zone_stations.items():
-        zone_total = len(st_list)
-        ratios = []
-        for wr in work_records:
-            var_count = sum(1 for st in st_list if count_map.get((wr[0], st.id)) is True)
-            ratios.append(var_count / zone_total if zone_total else 0)
-        ratio_by_zone[zone_name] = ratios
+    ratio_by_zone = {
+        zone_name: [v / zone_totals[z] if zone_totals[z] else 0 for v in var_zone[z]]
+        for z, zone_name in enumerate(zone_names)
+    }
 
     # Bölge istatistikleri: tüketim değişim oranı, istasyon değişimi oranı
     zone_stats = []
-    if len(wr_ids) >= 2:
-        for zone_name in sorted(zone_stations.keys()):
-            st_list = zone_stations[zone_name]
-            zone_total = len(st_list)
+    if n_wr >= 2:
+        degisen_bits = ilk_bits ^ son_bits
+        zone_masks = [0] * len(zone_names)
+        for i, z in enumerate(row_zone):
+            zone_masks[z] |= 1 << i
+        for zone_name in sorted(zone_names):
+            z = zone_index[zone_name]
+            zone_total = zone_totals[z]
             if zone_total == 0:
                 continue
-            var_ilk = sum(1 for st in st_list if count_map.get((wr_ids[0], st.id)) is True)
-            var_son = sum(1 for st in st_list if count_map.get((wr_ids[-1], st.id)) is True)
+            var_ilk = var_zone[z][ilk_j]
+            var_son = var_zone[z][son_j]
 
             # Tüketim değişim oranı: (Var_son - Var_ilk) / Var_ilk * 100 (Var_ilk > 0 ise)
             if var_ilk > 0:
@@ -128,13 +167,8 @@ def get_istasyon_raporu_data(facility_id, start_date, end_date):
             else:
                 tuketim_degisim = (var_son * 100) if var_son > 0 else 0  # 0'dan artış
 
-            # İstasyon değişimi: değişen istasyon sayısı (tarihler arası Var<->Yok değişen) / zone_total * 100
-            degisen = 0
-            for st in st_list:
-                val_ilk = count_map.get((wr_ids[0], st.id)) is True
-                val_son = count_map.get((wr_ids[-1], st.id)) is True
-                if val_ilk != val_son:
-                    degisen += 1
+            # İstasyon değişimi: ilk ve son tarih arasında Var<->Yok değişen istasyon sayısı / zone_total * 100
+            degisen = (degisen_bits & zone_masks[z]).bit_count()
             istasyon_degisim = (degisen / zone_total * 100) if zone_total else 0
 
             zone_stats.append({
@@ -150,13 +184,82 @@ def get_istasyon_raporu_data(facility_id, start_date, end_date):
         "musteri_tesis": musteri_tesis,
         "adres": adres,
         "date_headers": date_headers,
+        "tarihler": [tarih for _, tarih in work_records],
         "rows": rows,
         "ratio_genel": ratio_genel,
         "ratio_by_zone": ratio_by_zone,
         "zone_stats": zone_stats,
+        "matris": matris,
     }
 
 
+def get_istasyon_raporu_data(facility_id, start_date, end_date, hucreler=True):
+    """
+    Tesis ve tarih aralığına göre rapor verisini döndürür.
+    Dönüş: musteri_tesis, adres, date_headers, tarihler (date), rows, ratio_genel, ratio_by_zone, zone_stats,
+    matris (istasyon × tarih, array("b"): -1 eksik, 0 yok, 1 var; satır i, sütun j → matris[i * len(date_headers) + j]).
+    hucreler=False: rows[].counts oluşturulmaz (dosya çıktıları için; hücreler matristen okunur).
+    """
+    raporlar = get_istasyon_raporu_verileri([facility_id], start_date, end_date, hucreler=hucreler)
+    if not raporlar:
+        raise Facility.DoesNotExist("Facility matching query does not exist.")
+    return raporlar[0][1]
+
+
+def get_istasyon_raporu_verileri(facility_ids, start_date, end_date, hucreler=True):
+    """
+    Birden çok tesisin rapor verisi: [(facility, data)] (müşteri / tesis kodu sırasıyla).
+    Tesis sayısından bağımsız 5 sorgu; iş kayıtları, istasyonlar, sayımlar ve tüketim özetleri bellekte tesislere bölünür.
+    Hücreler ve ilk-son istasyon değişimi ham sayımlardan (istasyon bazında veri gerekir); oran satırları ve bölge
+    istatistiklerinin Var sayıları (tesis, tarih) indeksli IstasyonTuketimOzeti'nden gelir.
+    İş kayıtları etkin tesise (iş kaydındaki, yoksa kapatılan talepteki tesis) göre seçilir (etkin_tesis, tarih indeksi).
+    """
+    facility_ids = list(facility_ids)
+    facilities = list(
+        Facility.objects.filter(pk__in=facility_ids).select_related("customer").order_by("customer__kod", "kod")
+    )
+    if not facilities:
+        return []
+
+    wr_by_facility = {f.pk: [] for f in facilities}
+    for wr_id, tarih, fid in (
+        WorkRecord.objects.filter(etkin_tesis_id__in=facility_ids, tarih__gte=start_date, tarih__lte=end_date)
+        .order_by("tarih")
+        .values_list("id", "tarih", "etkin_tesis_id")
+    ):
+        wr_by_facility[fid].append((wr_id, tarih))
+
+    stations_by_facility = {f.pk: [] for f in facilities}
+    for st in (
+        Station.objects.filter(zone__facility_id__in=facility_ids)
+        .select_related("zone__facility__customer")
+        .order_by("zone__kod", "kod")
+    ):
+        stations_by_facility[st.zone.facility_id].append(st)
+
+    counts_by_facility = {f.pk: [] for f in facilities}
+    for wr_id, st_id, tuketim_var, fid in WorkRecordStationCount.objects.filter(
+        work_record_id__in=[wr_id for wrs in wr_by_facility.values() for wr_id, _ in wrs],
+        station__zone__facility_id__in=facility_ids,
+    ).values_list("work_record_id", "station_id", "tuketim_var", "station__zone__facility_id"):
+        counts_by_facility[fid].append((wr_id, st_id, tuketim_var))
+
+    ozetler_by_facility = {f.pk: [] for f in facilities}
+    for wr_id, zone_id, var_sayisi, fid in IstasyonTuketimOzeti.objects.filter(
+        facility_id__in=facility_ids, tarih__gte=start_date, tarih__lte=end_date,
+    ).values_list("work_record_id", "zone_id", "var_sayisi", "facility_id"):
+        ozetler_by_facility[fid].append((wr_id, zone_id, var_sayisi))
+
+    # Ham sayım listeleri tesis matrise yazıldıkça bırakılır
+    return [
+        (f, _rapor_verisi_olustur(
+            f, wr_by_facility[f.pk], stations_by_facility[f.pk], counts_by_facility.pop(f.pk), ozetler_by_facility[f.pk],
+            hucreler=hucreler,
+        ))
+        for f in facilities
+    ]
+
+
 def _format_percent(val):
     """Oranı % formatında yaz. val 0-1 aralığında veya zaten yüzde (örn. 40) olabilir."""
     if val is None:
@@ -167,132 +270,285 @@ def _format_percent(val):
     return str(val)
 
 
-def build_istasyon_raporu_excel(facility_id, start_date, end_date):
+# Excel sütun genişlikleri: Bölge, İstasyon Kodu, Açıklama; tarih sütunları
+_SUTUN_GENISLIKLERI = {"A": 28, "B": 14, "C": 22}
+_TARIH_SUTUN_GENISLIGI = 12
+
+
+def _excel_stilleri_ekle(wb):
+    """Rapor hücre stillerini çalışma kitabına bir kez adlandırılmış stil olarak ekler (hücre başına nesne yok)."""
+    from openpyxl.styles import Alignment, Border, Font, NamedStyle, Side
+
+    thin = Side(style="thin")
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    stiller = [
+        NamedStyle(name="rapor_kalin", font=Font(bold=True)),
+        NamedStyle(
+            name="rapor_baslik", font=Font(bold=True), border=border,
+            alignment=Alignment(horizontal="center", vertical="center", wrap_text=True),
+        ),
+        NamedStyle(
+            name="rapor_istatistik_baslik", font=Font(bold=True), border=border,
+            alignment=Alignment(horizontal="center", vertical="center"),
+        ),
+        NamedStyle(name="rapor_oran_etiket", font=Font(size=9)),
+        NamedStyle(
+            name="rapor_oran", font=Font(size=9), border=border,
+            alignment=Alignment(horizontal="center", vertical="center"),
+        ),
+        NamedStyle(name="rapor_hucre", border=border, alignment=Alignment(horizontal="center", vertical="center")),
+        NamedStyle(name="rapor_hucre_bos", border=border, alignment=Alignment(horizontal="left", vertical="center")),
+        NamedStyle(name="rapor_kenarlik", border=border),
+    ]
+    for stil in stiller:
+        wb.add_named_style(stil)
+
+
+def _hucre(ws, value, style=None):
+    from openpyxl.cell import WriteOnlyCell
+
+    cell = WriteOnlyCell(ws, value=value)
+    if style:
+        cell.style = style
+    return cell
+
+
+def _istasyon_sayfasi_yaz(wb, data, title="İstasyon Raporu"):
     """
-    Tesis ve tarih aralığına göre Excel dosyası üretir.
+    write_only çalışma kitabına bir rapor sayfası ekler. İstasyon satırları int8 matristen (hücre başına 1 bayt)
+    sırayla üretilip yazılır; çalışma sayfasında ve Python nesnesi olarak aynı anda yalnızca bir satır tutulur.
     İlk iki satır: müşteri adı - tesis, alt satırda adres.
     Başlık satırı altında: tüketim oranı (genel), bölge bazlı oranlar.
     Sonra satırlar: bölüm bazında istasyonlar (Bölge, İstasyon Kodu, Açıklama).
     Sütunlar: her iş kaydı tarihi için tüketim (Var/Yok).
     En sonda: bölge istatistikleri (tüketim değişim oranı, istasyon değişimi oranı).
     """
-    import openpyxl
-    from openpyxl.styles import Font, Alignment, Border, Side
+    from openpyxl.utils import get_column_letter
 
-    data = get_istasyon_raporu_data(facility_id, start_date, end_date)
-    musteri_tesis = data["musteri_tesis"]
-    adres = data["adres"]
     date_headers = data["date_headers"]
-    rows = data["rows"]
     ratio_genel = data.get("ratio_genel", [])
     ratio_by_zone = data.get("ratio_by_zone", {})
     zone_stats = data.get("zone_stats", [])
     ncols = 3 + len(date_headers)
+    n_wr = len(date_headers)
+    son_sutun = get_column_letter(max(3, ncols))
 
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "İstasyon Raporu"
-
-    thin = Side(style="thin")
-    header_font = Font(bold=True)
-    small_font = Font(size=9)
+    ws = wb.create_sheet(title=title)
+    # Satır yüksekliği / sütun genişliği satırlar yazılmadan önce verilmeli (write_only)
+    ws.sheet_format.defaultRowHeight = 18
+    ws.sheet_format.customHeight = True
+    ws.row_dimensions[1].height = 20
+    ws.row_dimensions[3].height = 22
+    for harf, genislik in _SUTUN_GENISLIKLERI.items():
+        ws.column_dimensions[harf].width = genislik
+    for col_idx in range(4, 4 + n_wr):
+        ws.column_dimensions[get_column_letter(col_idx)].width = _TARIH_SUTUN_GENISLIGI
 
     # İlk iki satır: müşteri - tesis, adres
-    ws.cell(row=1, column=1, value=musteri_tesis)
-    ws.cell(row=1, column=1).font = Font(bold=True)
-    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=max(3, ncols))
-    ws.row_dimensions[1].height = 20
-    ws.cell(row=2, column=1, value=adres)
-    ws.merge_cells(start_row=2, start_column=1, end_row=2, end_column=max(3, ncols))
-    ws.row_dimensions[2].height = 18
+    ws.append([_hucre(ws, data["musteri_tesis"], "rapor_kalin")])
+    ws.merged_cells.add(f"A1:{son_sutun}1")
+    ws.append([data["adres"]])
+    ws.merged_cells.add(f"A2:{son_sutun}2")
 
     # Başlık satırı (3): Bölge | İstasyon Kodu | Açıklama | Tarih1 | Tarih2 | ...
-    header_row = 3
     headers = ["Bölge", "İstasyon Kodu", "Açıklama"] + date_headers
-    for col, h in enumerate(headers, 1):
-        cell = ws.cell(row=header_row, column=col, value=h)
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        cell.border = Border(left=thin, right=thin, top=thin, bottom=thin)
-    ws.row_dimensions[header_row].height = 22
-
-    # Tarih sütunları altına: tüketim oranı (genel)
-    current_row = header_row + 1
-    if ratio_genel:
-        ws.cell(row=current_row, column=1, value="Tüketim oranı (genel)")
-        ws.cell(row=current_row, column=1).font = small_font
-        ws.merge_cells(start_row=current_row, start_column=1, end_row=current_row, end_column=3)
-        for col_idx, val in enumerate(ratio_genel, 4):
-            cell = ws.cell(row=current_row, column=col_idx, value=_format_percent(val))
-            cell.font = small_font
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-            cell.border = Border(left=thin, right=thin, top=thin, bottom=thin)
-        current_row += 1
+    ws.append([_hucre(ws, h, "rapor_baslik") for h in headers])
+    current_row = 4
 
-        # Bölge bazlı oranlar
-        for zone_name in sorted(ratio_by_zone.keys()):
-            ratios = ratio_by_zone[zone_name]
-            ws.cell(row=current_row, column=1, value=f"Tüketim oranı - {zone_name}")
-            ws.cell(row=current_row, column=1).font = small_font
-            ws.merge_cells(start_row=current_row, start_column=1, end_row=current_row, end_column=3)
-            for col_idx, val in enumerate(ratios, 4):
-                cell = ws.cell(row=current_row, column=col_idx, value=_format_percent(val))
-                cell.font = small_font
-                cell.alignment = Alignment(horizontal="center", vertical="center")
-                cell.border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    # Tarih sütunları altına: tüketim oranı (genel), bölge bazlı oranlar
+    if ratio_genel:
+        oran_satirlari = [("Tüketim oranı (genel)", ratio_genel)] + [
+            (f"Tüketim oranı - {zone_name}", ratio_by_zone[zone_name]) for zone_name in sorted(ratio_by_zone.keys())
+        ]
+        for etiket, oranlar in oran_satirlari:
+            ws.append(
+                [_hucre(ws, etiket, "rapor_oran_etiket"), None, None]
+                + [_hucre(ws, _format_percent(val), "rapor_oran") for val in oranlar]
+            )
+            ws.merged_cells.add(f"A{current_row}:C{current_row}")
             current_row += 1
-
         # Boş satır ayırıcı
+        ws.append([])
         current_row += 1
 
-    # İstasyon satırları
-    for row in rows:
-        ws.cell(row=current_row, column=1, value=row["zone"])
-        ws.cell(row=current_row, column=2, value=row["kod"])
-        ws.cell(row=current_row, column=3, value=row["ad"])
-        for col_idx, val in enumerate(row["counts"], 4):
-            cell_val = "Var" if val else ("Yok" if val is False else "")
-            cell = ws.cell(row=current_row, column=col_idx, value=cell_val)
-            cell.alignment = Alignment(horizontal="center" if cell_val else "left", vertical="center")
-            cell.border = Border(left=thin, right=thin, top=thin, bottom=thin)
-        ws.row_dimensions[current_row].height = 18
+    # İstasyon satırları: hücreler matristen (-1 eksik, 0 yok, 1 var)
+    for zone, kod, ad, degerler in _istasyon_satirlari(data):
+        ws.append(
+            [zone, kod, ad]
+            + [
+                _hucre(ws, "Var", "rapor_hucre") if v == VAR
+                else _hucre(ws, "Yok", "rapor_hucre") if v == YOK
+                else _hucre(ws, "", "rapor_hucre_bos")
+                for v in degerler
+            ]
+        )
         current_row += 1
 
     # Bölge istatistikleri (tüketim değişim oranı, istasyon değişimi oranı)
+    ws.append([])
     current_row += 1
     if zone_stats:
-        ws.cell(row=current_row, column=1, value="Bölge İstatistikleri")
-        ws.cell(row=current_row, column=1).font = header_font
-        ws.merge_cells(start_row=current_row, start_column=1, end_row=current_row, end_column=4)
-        current_row += 1
-
+        ws.append([_hucre(ws, "Bölge İstatistikleri", "rapor_kalin")])
+        ws.merged_cells.add(f"A{current_row}:D{current_row}")
         stat_headers = ["Bölge", "Tüketim değişim oranı", "İstasyon değişimi oranı", "Var (ilk)", "Var (son)", "Toplam istasyon"]
-        for col, h in enumerate(stat_headers, 1):
-            cell = ws.cell(row=current_row, column=col, value=h)
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-            cell.border = Border(left=thin, right=thin, top=thin, bottom=thin)
-        current_row += 1
-
+        ws.append([_hucre(ws, h, "rapor_istatistik_baslik") for h in stat_headers])
         for stat in zone_stats:
-            ws.cell(row=current_row, column=1, value=stat["zone"])
-            ws.cell(row=current_row, column=2, value=_format_percent(stat["tuketim_degisim"]))
-            ws.cell(row=current_row, column=3, value=_format_percent(stat["istasyon_degisim"]))
-            ws.cell(row=current_row, column=4, value=stat["var_ilk"])
-            ws.cell(row=current_row, column=5, value=stat["var_son"])
-            ws.cell(row=current_row, column=6, value=stat["zone_total"])
-            for col in range(1, 7):
-                ws.cell(row=current_row, column=col).border = Border(left=thin, right=thin, top=thin, bottom=thin)
-            current_row += 1
+            ws.append([
+                _hucre(ws, value, "rapor_kenarlik") for value in (
+                    stat["zone"],
+                    _format_percent(stat["tuketim_degisim"]),
+                    _format_percent(stat["istasyon_degisim"]),
+                    stat["var_ilk"],
+                    stat["var_son"],
+                    stat["zone_total"],
+                )
+            ])
+    return ws
+
+
+def write_istasyon_raporu_excel(data, fileobj):
+    """Rapor verisini (get_istasyon_raporu_data) write_only modunda fileobj'a (dosya yolu veya ikili dosya) yazar."""
+    import openpyxl
 
-    # Sütun genişlikleri
-    ws.column_dimensions["A"].width = 28
-    ws.column_dimensions["B"].width = 14
-    ws.column_dimensions["C"].width = 22
-    for col_idx in range(4, 4 + len(date_headers)):
-        ws.column_dimensions[openpyxl.utils.get_column_letter(col_idx)].width = 12
+    wb = openpyxl.Workbook(write_only=True)
+    _excel_stilleri_ekle(wb)
+    _istasyon_sayfasi_yaz(wb, data)
+    wb.save(fileobj)
+
+
+def _sayfa_adi(ad, kullanilan):
+    """Excel sayfa adı: yasak karakterler temizlenir, 31 karaktere kısaltılır, çakışırsa numaralanır."""
+    temiz = "".join("_" if ch in '[]:*?/\\' else ch for ch in ad).strip("' ") or "Tesis"
+    aday = temiz[:31]
+    n = 2
+    while aday.lower() in kullanilan:
+        ek = f" ({n})"
+        aday = temiz[:31 - len(ek)] + ek
+        n += 1
+    kullanilan.add(aday.lower())
+    return aday
+
+
+def _ozet_sayfasi_yaz(wb, raporlar, baslik):
+    """Çoklu rapor özet sayfası: tesis başına istasyon / ziyaret sayısı ve tüketim oranları."""
+    ws = wb.create_sheet(title="Özet")
+    ws.sheet_format.defaultRowHeight = 18
+    ws.sheet_format.customHeight = True
+    ws.row_dimensions[3].height = 22
+    for harf, genislik in zip("ABCDEFGH", (14, 36, 12, 12, 16, 16, 16, 16)):
+        ws.column_dimensions[harf].width = genislik
+
+    ws.append([_hucre(ws, baslik, "rapor_kalin")])
+    ws.merged_cells.add("A1:H1")
+    ws.append([])
+    headers = [
+        "Tesis Kodu", "Tesis", "İstasyon", "Ziyaret", "İlk tarih", "Son tarih",
+        "Tüketim oranı (ilk)", "Tüketim oranı (son)",
+    ]
+    ws.append([_hucre(ws, h, "rapor_baslik") for h in headers])
+    for facility, data in raporlar:
+        oranlar = data["ratio_genel"]
+        tarihler = data["date_headers"]
+        ws.append([
+            _hucre(ws, value, "rapor_kenarlik") for value in (
+                facility.kod,
+                facility.ad,
+                len(data["rows"]),
+                len(tarihler),
+                tarihler[0] if tarihler else "",
+                tarihler[-1] if tarihler else "",
+                _format_percent(oranlar[0]) if oranlar else "—",
+                _format_percent(oranlar[-1]) if oranlar else "—",
+            )
+        ])
+    return ws
+
+
+def write_istasyon_raporu_excel_coklu(raporlar, fileobj, baslik="İstasyon Raporu"):
+    """get_istasyon_raporu_verileri çıktısını özet sayfası + tesis başına bir sayfa olarak fileobj'a yazar."""
+    import openpyxl
 
+    wb = openpyxl.Workbook(write_only=True)
+    _excel_stilleri_ekle(wb)
+    _ozet_sayfasi_yaz(wb, raporlar, baslik)
+    kullanilan = {"özet"}
+    for facility, data in raporlar:
+        _istasyon_sayfasi_yaz(wb, data, title=_sayfa_adi(f"{facility.kod} {facility.ad}", kullanilan))
+    wb.save(fileobj)
+
+
+def build_istasyon_raporu_excel(facility_id, start_date, end_date):
+    """Tesis ve tarih aralığına göre Excel dosyası üretir (bytes). Büyük raporlar için write_istasyon_raporu_excel."""
     buf = BytesIO()
-    wb.save(buf)
-    buf.seek(0)
+    write_istasyon_raporu_excel(get_istasyon_raporu_data(facility_id, start_date, end_date, hucreler=False), buf)
     return buf.getvalue()
+
+
+# Akış (streaming) dışa aktarımlar: StreamingHttpResponse ile parça parça gönderilir, dosya bellekte kurulmaz
+_CSV_TUKETIM = {VAR: "1", YOK: "0", EKSIK: ""}
+
+
+class _SatirTamponu:
+    """csv.writer için yazılanı geri döndüren sahte dosya (satır satır üretim)."""
+
+    def write(self, value):
+        return value
+
+
+def _istasyon_satirlari(data):
+    """(bölge, kod, açıklama, [hücre değerleri]) satırlarını matristen sırayla üretir."""
+    n_wr = len(data["date_headers"])
+    matris = data["matris"]
+    for i, row in enumerate(data["rows"]):
+        yield row["zone"], row["kod"], row["ad"], matris[i * n_wr:(i + 1) * n_wr]
+
+
+def istasyon_raporu_csv_uzun(data):
+    """
+    Uzun biçim CSV: her sayım bir satır (istasyon_kodu, bolge, aciklama, tarih, tuketim).
+    Sayım girilmemiş hücreler yazılmaz; tarih ISO (YYYY-AA-GG), tüketim 1/0.
+    """
+    writer = csv.writer(_SatirTamponu())
+    tarihler = [t.isoformat() for t in data["tarihler"]]
+    yield writer.writerow(["istasyon_kodu", "bolge", "aciklama", "tarih", "tuketim"])
+    for zone, kod, ad, degerler in _istasyon_satirlari(data):
+        parca = "".join(
+            writer.writerow([kod, zone, ad, tarihler[j], _CSV_TUKETIM[v]])
+            for j, v in enumerate(degerler) if v != EKSIK
+        )
+        if parca:
+            yield parca
+
+
+def istasyon_raporu_csv_genis(data):
+    """Geniş biçim CSV: istasyon başına bir satır, her tarih bir sütun (tüketim 1/0, sayım yoksa boş)."""
+    writer = csv.writer(_SatirTamponu())
+    yield writer.writerow(["bolge", "istasyon_kodu", "aciklama"] + [t.isoformat() for t in data["tarihler"]])
+    for zone, kod, ad, degerler in _istasyon_satirlari(data):
+        yield writer.writerow([zone, kod, ad] + [_CSV_TUKETIM[v] for v in degerler])
+
+
+def istasyon_raporu_json(data):
+    """
+    Sıkıştırılmış JSON matris: {"musteri_tesis", "adres", "tarihler", "kodlama", "istasyonlar": [[bolge, kod, ad]],
+    "matris": [[...]]}. matris satırları istasyonlarla aynı sırada; hücreler -1 (sayım yok), 0 (yok), 1 (var).
+    """
+    baslik = {
+        "musteri_tesis": data["musteri_tesis"],
+        "adres": data["adres"],
+        "tarihler": [t.isoformat() for t in data["tarihler"]],
+        "kodlama": {"eksik": EKSIK, "yok": YOK, "var": VAR},
+        "istasyonlar": [[row["zone"], row["kod"], row["ad"]] for row in data["rows"]],
+    }
+    yield json.dumps(baslik, ensure_ascii=False, separators=(",", ":"))[:-1] + ',"matris":['
+    for i, (_, _, _, degerler) in enumerate(_istasyon_satirlari(data)):
+        yield ("," if i else "") + "[" + ",".join(map(str, degerler)) + "]"
+    yield "]}"
+
+
+# Dışa aktarım biçimi → (üretici, içerik tipi, dosya adı soneki)
+AKIS_BICIMLERI = {
+    "csv_uzun": (istasyon_raporu_csv_uzun, "text/csv; charset=utf-8", "uzun.csv"),
+    "csv_genis": (istasyon_raporu_csv_genis, "text/csv; charset=utf-8", "genis.csv"),
+    "json": (istasyon_raporu_json, "application/json; charset=utf-8", "matris.json"),
+}
@@ -0,0 +1,358 @@
+"""
+İş kaydı istasyon sayımı servisleri. Toplu kayıt: istasyonlar tek sorguda doğrulanır, yalnızca
+değişen satırlar tek bir upsert ile yazılır (istasyon başına sorgu yok).
+Özet ve liste: istasyonlar bu iş kaydının sayımlarına LEFT JOIN (FilteredRelation) ile tek sorguda okunur.
+Çevrimdışı senkron: cihazda kuyruğa alınan taramalar istemci zamanına göre (son yazan kazanır) uygulanır.
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, F, FilteredRelation, Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Station, WorkRecordStationCount
+from .tuketim_ozeti import ozetleri_yenile
+
+
+def sayimlari_kaydet(work_record, sayimlar, facility=None):
+    """
+    İş kaydı için istasyon sayımlarını toplu kaydeder.
+    sayimlar: {station_id: (tuketim_var, not_alani)}. facility verilirse yalnızca o tesisin istasyonları kabul edilir.
+    Döndürür: {"olusturulan", "guncellenen", "degismeyen", "gecersiz"} sayıları ve
+    "durumlar": {station_id: "olusturuldu" | "guncellendi" | "degismedi"}.
+    """
+    stations_qs = Station.objects.only("pk", "zone_id")
+    if facility is not None:
+        stations_qs = stations_qs.filter(zone__facility=facility)
+    gecerli = stations_qs.in_bulk(list(sayimlar))
+    sonuc = {
+        "olusturulan": 0, "guncellenen": 0, "degismeyen": 0, "gecersiz": len(sayimlar) - len(gecerli),
+        "durumlar": {},
+    }
+    if not gecerli:
+        return sonuc
+
+    with transaction.atomic():
+        simdi = timezone.now()
+        mevcut = {
+            station_id: (tuketim_var, not_alani)
+            for station_id, tuketim_var, not_alani in WorkRecordStationCount.objects.filter(
+                work_record=work_record, station_id__in=gecerli,
+            ).values_list("station_id", "tuketim_var", "not_alani")
+        }
+        yazilacak = []
+        for station_id in gecerli:
+            tuketim_var, not_alani = sayimlar[station_id]
+            tuketim_var = bool(tuketim_var)
+            not_alani = (not_alani or "").strip()
+            onceki = mevcut.get(station_id)
+            if onceki is None:
+                sonuc["olusturulan"] += 1
+                sonuc["durumlar"][station_id] = "olusturuldu"
+            elif onceki == (tuketim_var, not_alani):
+                sonuc["degismeyen"] += 1
+                sonuc["durumlar"][station_id] = "degismedi"
+                continue
+            else:
+                sonuc["guncellenen"] += 1
+                sonuc["durumlar"][station_id] = "guncellendi"
+            yazilacak.append(WorkRecordStationCount(
+                work_record=work_record, station_id=station_id, tuketim_var=tuketim_var, not_alani=not_alani,
+                istemci_zamani=simdi,
+            ))
+        if yazilacak:
+            WorkRecordStationCount.objects.bulk_create(
+                yazilacak,
+                update_conflicts=True,
+                unique_fields=["work_record", "station"],
+                update_fields=["tuketim_var", "not_alani", "istemci_zamani"],
+            )
+            # bulk_create sinyal üretmez: tüketim özeti burada yenilenir
+            ozetleri_yenile({(work_record.pk, gecerli[s.station_id].zone_id) for s in yazilacak})
+    return sonuc
+
+
+def evet_mi(deger):
+    """Form / JSON değerini bool'a çevirir ("1", "true", "on", "yes" veya True)."""
+    if isinstance(deger, bool):
+        return deger
+    return str(deger).strip().lower() in ("1", "true", "on", "yes")
+
+
+def taramalari_kaydet(work_record, taramalar):
+    """
+    QR / kod taramalarını kaydeder (tek tarama = 1 elemanlı liste).
+    taramalar: [{"station_id" veya "benzersiz_kod", "tuketim_var", "not_alani"}]; aynı istasyon birden
+    fazla geçerse sonuncusu geçerlidir. İstasyonlar tek sorguda çözülür, yazma sayimlari_kaydet ile.
+    Yalnızca iş kaydının etkin tesisindeki istasyonlar kaydedilir; diğerleri "gecersiz" olarak döner.
+    Döndürür: {"sonuc": sayimlari_kaydet sayıları, "satirlar": [tarama başına sonuç], "ozetler": [tesis/bölge özeti]}.
+    """
+    ids, kodlar = set(), set()
+    for t in taramalar:
+        sid = str(t.get("station_id") or "").strip()
+        if sid.isdigit():
+            ids.add(int(sid))
+        elif t.get("benzersiz_kod"):
+            kodlar.add(str(t["benzersiz_kod"]).strip())
+    stations = list(
+        Station.objects.filter(Q(pk__in=ids) | Q(benzersiz_kod__in=kodlar))
+        .select_related("zone__facility")
+    ) if ids or kodlar else []
+    by_id = {st.pk: st for st in stations}
+    by_kod = {st.benzersiz_kod: st for st in stations}
+
+    sayimlar = {}
+    eslesen = []
+    baska_tesis = 0
+    for t in taramalar:
+        sid = str(t.get("station_id") or "").strip()
+        st = by_id.get(int(sid)) if sid.isdigit() else by_kod.get(str(t.get("benzersiz_kod") or "").strip())
+        eslesen.append(st)
+        if st is None:
+            continue
+        if work_record.etkin_tesis_id is None or st.zone.facility_id != work_record.etkin_tesis_id:
+            baska_tesis += 1
+            continue
+        sayimlar[st.pk] = (evet_mi(t.get("tuketim_var")), str(t.get("not_alani") or "")[:200])
+
+    sonuc = sayimlari_kaydet(work_record, sayimlar, facility=work_record.etkin_tesis) if sayimlar else {
+        "olusturulan": 0, "guncellenen": 0, "degismeyen": 0, "gecersiz": 0, "durumlar": {},
+    }
+    durumlar = sonuc.pop("durumlar")
+    sonuc["gecersiz"] += baska_tesis
+    sonuc["bulunamayan"] = sum(1 for st in eslesen if st is None)
+
+    satirlar = []
+    for t, st in zip(taramalar, eslesen):
+        if st is None:
+            satirlar.append({
+                "durum": "bulunamadi",
+                "station_id": t.get("station_id"),
+                "benzersiz_kod": t.get("benzersiz_kod"),
+            })
+            continue
+        if st.pk not in sayimlar:
+            satirlar.append({
+                "durum": "gecersiz",
+                "station_id": st.pk,
+                "benzersiz_kod": st.benzersiz_kod,
+                "facility_kod": st.zone.facility.kod,
+            })
+            continue
+        tuketim_var, not_alani = sayimlar[st.pk]
+        satirlar.append({
+            "durum": durumlar.get(st.pk, "bulunamadi"),
+            "station_id": st.pk,
+            "benzersiz_kod": st.benzersiz_kod,
+            "kod": st.kod,
+            "ad": st.ad,
+            "zone_id": st.zone_id,
+            "zone_kod": st.zone.kod,
+            "facility_id": st.zone.facility_id,
+            "facility_kod": st.zone.facility.kod,
+            "tuketim_var": tuketim_var,
+            "not_alani": not_alani.strip(),
+        })
+
+    # Dokunulan her tesis için güncel özet (genelde tek tesis: tek sorgu)
+    ozetler = []
+    tesisler = {}
+    for st in eslesen:
+        if st is not None and st.pk in sayimlar:
+            tesisler.setdefault(st.zone.facility_id, (st.zone.facility, st.zone_id))
+    for facility, zone_id in tesisler.values():
+        ozet = sayim_ozeti(work_record, facility, zone_id)
+        ozetler.append({"facility_id": facility.pk, "facility_kod": facility.kod, **ozet})
+    return {"sonuc": sonuc, "satirlar": satirlar, "ozetler": ozetler}
+
+
+def _istemci_zamani(deger):
+    """ISO 8601 istemci zamanı → aware datetime (saat dilimi yoksa UTC); geçersizse None."""
+    if isinstance(deger, datetime.datetime):
+        dt = deger
+    else:
+        try:
+            dt = parse_datetime(str(deger or "").strip().replace("Z", "+00:00"))
+        except ValueError:
+            dt = None
+    if dt is None:
+        return None
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt, datetime.timezone.utc)
+    return dt
+
+
+def taramalari_senkronla(work_record, taramalar):
+    """
+    Çevrimdışı kuyruktan gelen taramaları tek transaction'da uygular (idempotent; aynı paket tekrar gönderilebilir).
+    taramalar: [{"id": istemci kimliği, "station_id" | "benzersiz_kod", "tuketim_var", "not_alani", "zaman": ISO 8601}].
+    Çakışma: kayıttaki istemci_zamani gelen zamandan yeni veya eşitse tarama uygulanmaz (son yazan kazanır).
+    İş kaydının etkin tesisinde olmayan istasyonların taramaları "bulunamadi" olarak döner.
+    Döndürür: {"sonuc": {"uygulanan", "eski", "bulunamayan", "gecersiz"}, "satirlar": [{"id", "durum"}]}.
+    """
+    ids, kodlar = set(), set()
+    for t in taramalar:
+        sid = str(t.get("station_id") or "").strip()
+        if sid.isdigit():
+            ids.add(int(sid))
+        elif t.get("benzersiz_kod"):
+            kodlar.add(str(t["benzersiz_kod"]).strip())
+    # Yalnızca iş kaydının etkin tesisindeki istasyonlar çözülür; diğerleri "bulunamadi" döner
+    stations = Station.objects.filter(
+        Q(pk__in=ids) | Q(benzersiz_kod__in=kodlar), zone__facility=work_record.etkin_tesis,
+    ).only("pk", "benzersiz_kod", "zone_id") if (ids or kodlar) and work_record.etkin_tesis_id else []
+    zone_by_id = {st.pk: st.zone_id for st in stations}
+    by_id = {st.pk: st.pk for st in stations}
+    by_kod = {st.benzersiz_kod: st.pk for st in stations}
+
+    sonuc = {"uygulanan": 0, "eski": 0, "bulunamayan": 0, "gecersiz": 0}
+    satirlar = []
+    # İstasyon başına en yeni tarama: {station_id: (zaman, tuketim_var, not_alani, satır indeksi)}
+    en_yeni = {}
+    for t in taramalar:
+        sid = str(t.get("station_id") or "").strip()
+        station_id = by_id.get(int(sid)) if sid.isdigit() else by_kod.get(str(t.get("benzersiz_kod") or "").strip())
+        zaman = _istemci_zamani(t.get("zaman"))
+        satir = {"id": t.get("id"), "durum": "bulunamadi" if station_id is None else "gecersiz"}
+        satirlar.append(satir)
+        if station_id is None:
+            sonuc["bulunamayan"] += 1
+            continue
+        if zaman is None:
+            sonuc["gecersiz"] += 1
+            continue
+        satir["durum"] = "eski"
+        onceki = en_yeni.get(station_id)
+        if onceki is None or zaman > onceki[0]:
+            en_yeni[station_id] = (
+                zaman, evet_mi(t.get("tuketim_var")), str(t.get("not_alani") or "").strip()[:200], len(satirlar) - 1,
+            )
+
+    with transaction.atomic():
+        kayitli = dict(
+            WorkRecordStationCount.objects.filter(work_record=work_record, station_id__in=en_yeni)
+            .select_for_update()
+            .values_list("station_id", "istemci_zamani")
+        )
+        yazilacak = []
+        for station_id, (zaman, tuketim_var, not_alani, satir_no) in en_yeni.items():
+            kayit_zamani = kayitli.get(station_id)
+            if kayit_zamani is not None and kayit_zamani >= zaman:
+                continue
+            satirlar[satir_no]["durum"] = "uygulandi"
+            yazilacak.append(WorkRecordStationCount(
+                work_record=work_record, station_id=station_id,
+                tuketim_var=tuketim_var, not_alani=not_alani, istemci_zamani=zaman,
+            ))
+        if yazilacak:
+            WorkRecordStationCount.objects.bulk_create(
+                yazilacak,
+                update_conflicts=True,
+                unique_fields=["work_record", "station"],
+                update_fields=["tuketim_var", "not_alani", "istemci_zamani"],
+            )
+            ozetleri_yenile({(work_record.pk, zone_by_id[s.station_id]) for s in yazilacak})
+    sonuc["uygulanan"] = len(yazilacak)
+    sonuc["eski"] = sum(1 for s in satirlar if s["durum"] == "eski")
+    return {"sonuc": sonuc, "satirlar": satirlar}
+
+
+# İstasyon listesi JSON biçimi değiştiğinde artırılır (ETag'e dahildir; cihazlar yeniden indirir)
+ISTASYON_LISTESI_SURUMU = 2
+
+
+def tesis_istasyon_listesi(facility):
+    """
+    Cihazda QR çözümü için tesisin istasyonları (tek sorgu), kompakt JSON yapısı:
+    {"bolgeler": {zone_id: [kod, ad]}, "istasyonlar": {benzersiz_kod: [id, zone_id, kod, ad]}}.
+    """
+    bolgeler = {}
+    istasyonlar = {}
+    for pk, benzersiz_kod, kod, ad, zone_id, zone_kod, zone_ad in (
+        Station.objects.filter(zone__facility=facility)
+        .order_by("zone__kod", "kod")
+        .values_list("pk", "benzersiz_kod", "kod", "ad", "zone_id", "zone__kod", "zone__ad")
+    ):
+        bolgeler.setdefault(zone_id, [zone_kod, zone_ad])
+        istasyonlar[benzersiz_kod] = [pk, zone_id, kod, ad]
+    return {"bolgeler": bolgeler, "istasyonlar": istasyonlar}
+
+
+def tesis_istasyon_listesi_etag(facility):
+    """
+    İstasyon listesinin ETag'i: istasyon sayısı + en son eklenen istasyonun zamanı (tek aggregate sorgu).
+    Ekleme / silme listeyi yeniler; yalnızca ad değişikliği ETag'i değiştirmez.
+    """
+    ozet = Station.objects.filter(zone__facility=facility).aggregate(sayi=Count("pk"), son=Max("created_at"))
+    son = ozet["son"].timestamp() if ozet["son"] else 0
+    return f'"v{ISTASYON_LISTESI_SURUMU}-{facility.pk}-{ozet["sayi"]}-{son:.6f}"'
+
+
+def _istasyonlar_ve_sayim(work_record, facility):
+    """Tesisin istasyonları; "sayim" bu iş kaydının sayım satırına LEFT JOIN."""
+    return Station.objects.filter(zone__facility=facility).annotate(
+        sayim=FilteredRelation("sayim_kayitlari", condition=Q(sayim_kayitlari__work_record=work_record)),
+    )
+
+
+def _ozet(toplam=0, girilen=0, tuketim_var=0):
+    return {"toplam": toplam, "girilen": girilen, "kalan": toplam - girilen, "tuketim_var": tuketim_var}
+
+
+def sayim_ozeti(work_record, facility, zone_id=None):
+    """
+    Tesis ve bölge bazında toplam / girilen / kalan istasyon sayıları (tek gruplu sorgu).
+    Döndürür: {"tesis": {...}, "bolge": seçili bölge özeti veya None, "bolgeler": [{"id", "kod", "ad", ...}]}.
+    zone_id tesise ait değilse (veya bölgede istasyon yoksa) "bolge" None olur.
+    """
+    satirlar = (
+        _istasyonlar_ve_sayim(work_record, facility)
+        .values("zone_id", "zone__kod", "zone__ad")
+        .annotate(
+            toplam=Count("pk"),
+            girilen=Count("sayim__pk"),
+            tuketim_var=Count("sayim__pk", filter=Q(sayim__tuketim_var=True)),
+        )
+        .order_by("zone__kod")
+    )
+    tesis = _ozet()
+    bolgeler = []
+    secili = None
+    for r in satirlar:
+        bolge = {"id": r["zone_id"], "kod": r["zone__kod"], "ad": r["zone__ad"], **_ozet(r["toplam"], r["girilen"], r["tuketim_var"])}
+        bolgeler.append(bolge)
+        for alan in ("toplam", "girilen", "kalan", "tuketim_var"):
+            tesis[alan] += bolge[alan]
+        if zone_id and str(r["zone_id"]) == str(zone_id):
+            secili = _ozet(r["toplam"], r["girilen"], r["tuketim_var"])
+    return {"tesis": tesis, "bolge": secili, "bolgeler": bolgeler}
+
+
+def istasyon_satirlari(work_record, facility, zone_id=None):
+    """
+    Tesisin (isteğe bağlı bölgenin) istasyonları ve bu iş kaydındaki sayımları, tek sorguda.
+    [{"station": Station, "count_obj": WorkRecordStationCount veya None}] (bölge kodu, istasyon kodu sırasıyla).
+    """
+    qs = (
+        _istasyonlar_ve_sayim(work_record, facility)
+        .select_related("zone")
+        .annotate(
+            sayim_pk=F("sayim__pk"),
+            sayim_tuketim_var=F("sayim__tuketim_var"),
+            sayim_not_alani=F("sayim__not_alani"),
+        )
+        .order_by("zone__kod", "kod")
+    )
+    if zone_id:
+        qs = qs.filter(zone_id=zone_id)
+    satirlar = []
+    for st in qs:
+        count_obj = None
+        if st.sayim_pk is not None:
+            count_obj = WorkRecordStationCount(
+                pk=st.sayim_pk, work_record=work_record, station=st,
+                tuketim_var=st.sayim_tuketim_var, not_alani=st.sayim_not_alani,
+            )
+        satirlar.append({"station": st, "count_obj": count_obj})
+    return satirlar
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.faaliyet_raporu_toplu import isi_al, isi_calistir, takilan_isleri_kapat
+
+
+class Command(BaseCommand):
+    help = (
+        "Sıradaki toplu faaliyet raporu işlerini web isteği dışında çalıştırır. "
+        "--surekli ile yeni işleri yoklayarak çalışmaya devam eder (işçi süreci olarak çalıştırın)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--surekli",
+            action="store_true",
+            help="Sıra boşalınca çıkmak yerine yeni işleri yoklamaya devam et.",
+        )
+        parser.add_argument(
+            "--aralik",
+            type=float,
+            default=5,
+            help="Sürekli modda sıra boşken yoklama aralığı (saniye). Varsayılan: 5.",
+        )
+
+    def handle(self, *args, **options):
+        if options["aralik"] <= 0:
+            raise CommandError("Yoklama aralığı 0'dan büyük olmalı.")
+        while True:
+            takilan_isleri_kapat()
+            rapor_isi = isi_al()
+            if rapor_isi is None:
+                if not options["surekli"]:
+                    return
+                time.sleep(options["aralik"])
+                continue
+            isi_calistir(rapor_isi)
+            rapor_isi.refresh_from_db()
+            self.stdout.write(self.style.SUCCESS(
+                f"Rapor işi #{rapor_isi.pk}: {rapor_isi.get_durum_display()}, "
+                f"{rapor_isi.tamamlanan}/{rapor_isi.toplam} rapor, {rapor_isi.hatali} hatalı."
+            ))
@@ -0,0 +1,44 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.periyod import periyod_talepleri_olustur
+
+
+class Command(BaseCommand):
+    help = "Aktif periyodların verilen dönemdeki eksik taleplerini oluşturur (tekrar çalıştırmak güvenlidir)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--baslangic",
+            help="Dönem başlangıcı (YYYY-AA-GG). Varsayılan: bugün.",
+        )
+        parser.add_argument(
+            "--gun",
+            type=int,
+            default=90,
+            help="Dönem uzunluğu (gün). Varsayılan: 90.",
+        )
+        parser.add_argument(
+            "--deneme",
+            action="store_true",
+            help="Talep oluşturmadan yalnızca sayıları göster.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            baslangic = (
+                datetime.date.fromisoformat(options["baslangic"]) if options["baslangic"] else timezone.localdate()
+            )
+        except ValueError:
+            raise CommandError("Başlangıç tarihi YYYY-AA-GG biçiminde olmalı.")
+        if options["gun"] < 1:
+            raise CommandError("Gün sayısı en az 1 olmalı.")
+        bitis = baslangic + datetime.timedelta(days=options["gun"] - 1)
+        sonuc = periyod_talepleri_olustur(baslangic, bitis, kaydet=not options["deneme"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{baslangic:%d.%m.%Y} - {bitis:%d.%m.%Y}: {sonuc['periyod']} periyod, "
+            f"{sonuc['olusturulan']} talep {'oluşturulacak' if options['deneme'] else 'oluşturuldu'}, "
+            f"{sonuc['mevcut']} talep zaten vardı, {sonuc['tipsiz']} periyod talep tipi olmadığı için atlandı."
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.periyod import UFUK_GUN, periyod_tarihlerini_yenile
+
+
+class Command(BaseCommand):
+    help = f"Periyod tarihlerini (PeriyodTarihi) bugünden itibaren {UFUK_GUN} gün için yeniden açar; ufku kaydırmak için günlük çalıştırın."
+
+    def handle(self, *args, **options):
+        sayi = periyod_tarihlerini_yenile()
+        self.stdout.write(self.style.SUCCESS(f"{sayi} periyod tarihi oluşturuldu."))
@@ -0,0 +1,43 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.planlama import PLANLAMA_GUN_SAYISI, talepleri_planla
+
+
+class Command(BaseCommand):
+    help = "Bekleyen talepleri ekip kapasitesine göre günlere ve ekiplere planlar."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--baslangic",
+            help="Planlama başlangıcı (YYYY-AA-GG). Varsayılan: bugün.",
+        )
+        parser.add_argument(
+            "--gun",
+            type=int,
+            default=PLANLAMA_GUN_SAYISI,
+            help=f"Planlama dönemi (gün). Varsayılan: {PLANLAMA_GUN_SAYISI}.",
+        )
+        parser.add_argument(
+            "--deneme",
+            action="store_true",
+            help="Kaydetmeden yalnızca sayıları göster.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            baslangic = (
+                datetime.date.fromisoformat(options["baslangic"]) if options["baslangic"] else timezone.localdate()
+            )
+        except ValueError:
+            raise CommandError("Başlangıç tarihi YYYY-AA-GG biçiminde olmalı.")
+        if options["gun"] < 1:
+            raise CommandError("Gün sayısı en az 1 olmalı.")
+        sonuc = talepleri_planla(baslangic=baslangic, gun_sayisi=options["gun"], kaydet=not options["deneme"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{sonuc['ekip']} ekip, {sonuc['planlanan']} talep "
+            f"{'planlanacak' if options['deneme'] else 'planlandı'}, "
+            f"{sonuc['planlanamayan']} talep kapasiteye sığmadı."
+        ))
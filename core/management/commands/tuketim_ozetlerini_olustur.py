@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.tuketim_ozeti import ozetleri_yeniden_olustur
+
+
+class Command(BaseCommand):
+    help = "İstasyon tüketim özetlerini (IstasyonTuketimOzeti) ham sayımlardan yeniden oluşturur."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tesis",
+            type=int,
+            action="append",
+            dest="tesisler",
+            help="Yalnızca bu tesis (id) için; birden çok kez verilebilir. Verilmezse tüm tesisler.",
+        )
+
+    def handle(self, *args, **options):
+        sayi = ozetleri_yeniden_olustur(options["tesisler"])
+        self.stdout.write(self.style.SUCCESS(f"{sayi} tüketim özeti oluşturuldu."))
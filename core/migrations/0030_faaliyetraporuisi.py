@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_bagimsiz_tespit'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FaaliyetRaporuIsi',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('durum', models.CharField(choices=[('bekliyor', 'Bekliyor'), ('calisiyor', 'Çalışıyor'), ('tamamlandi', 'Tamamlandı'), ('hata', 'Hata')], default='bekliyor', max_length=20, verbose_name='Durum')),
+                ('toplam', models.PositiveIntegerField(default=0, verbose_name='Toplam')),
+                ('tamamlanan', models.PositiveIntegerField(default=0, verbose_name='Tamamlanan')),
+                ('hatali', models.PositiveIntegerField(default=0, verbose_name='Hatalı')),
+                ('mesaj', models.TextField(blank=True, verbose_name='Mesaj')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Oluşturulma')),
+                ('bitis', models.DateTimeField(blank=True, null=True, verbose_name='Bitiş')),
+                ('olusturan', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='faaliyet_raporu_isleri', to=settings.AUTH_USER_MODEL, verbose_name='Oluşturan')),
+            ],
+            options={
+                'verbose_name': 'Faaliyet raporu işi',
+                'verbose_name_plural': 'Faaliyet raporu işleri',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
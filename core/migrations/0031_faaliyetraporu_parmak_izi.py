@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_faaliyetraporuisi'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='faaliyetraporu',
+            name='parmak_izi',
+            field=models.CharField(blank=True, help_text='Rapor verisi ve şablon sürümünün SHA-256 özeti; değişmediyse PDF yeniden üretilmez.', max_length=64, verbose_name='Parmak izi'),
+        ),
+    ]
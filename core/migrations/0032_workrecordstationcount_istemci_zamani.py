@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_faaliyetraporu_parmak_izi'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workrecordstationcount',
+            name='istemci_zamani',
+            field=models.DateTimeField(blank=True, help_text='Sayımın cihazda yapıldığı an; çevrimdışı senkronda son yazan kazanır.', null=True, verbose_name='Sayım zamanı'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def ozetleri_doldur(apps, schema_editor):
+    """Mevcut sayımlardan (iş kaydı, bölge) bazında tüketim özetlerini oluşturur."""
+    WorkRecordStationCount = apps.get_model("core", "WorkRecordStationCount")
+    IstasyonTuketimOzeti = apps.get_model("core", "IstasyonTuketimOzeti")
+    satirlar = (
+        WorkRecordStationCount.objects.values(
+            "work_record_id", "station__zone_id", "station__zone__facility_id", "work_record__tarih",
+        )
+        .annotate(var=Count("pk", filter=Q(tuketim_var=True)), yok=Count("pk", filter=Q(tuketim_var=False)))
+        .order_by()
+    )
+    IstasyonTuketimOzeti.objects.bulk_create(
+        [
+            IstasyonTuketimOzeti(
+                facility_id=r["station__zone__facility_id"],
+                zone_id=r["station__zone_id"],
+                work_record_id=r["work_record_id"],
+                tarih=r["work_record__tarih"],
+                var_sayisi=r["var"],
+                yok_sayisi=r["yok"],
+            )
+            for r in satirlar
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_workrecordstationcount_istemci_zamani'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IstasyonTuketimOzeti',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tarih', models.DateField(help_text='İş kaydı tarihi (rapor aralığı filtresi için kopyalanır).', verbose_name='Tarih')),
+                ('var_sayisi', models.PositiveIntegerField(default=0, verbose_name='Tüketim var')),
+                ('yok_sayisi', models.PositiveIntegerField(default=0, verbose_name='Tüketim yok')),
+                ('facility', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tuketim_ozetleri', to='core.facility', verbose_name='Tesis')),
+                ('work_record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tuketim_ozetleri', to='core.workrecord', verbose_name='İş kaydı')),
+                ('zone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tuketim_ozetleri', to='core.zone', verbose_name='Bölge')),
+            ],
+            options={
+                'verbose_name': 'İstasyon tüketim özeti',
+                'verbose_name_plural': 'İstasyon tüketim özetleri',
+                'ordering': ['facility', 'tarih', 'zone'],
+                'indexes': [models.Index(fields=['facility', 'tarih'], name='tuketim_ozeti_tesis_tarih')],
+                'constraints': [models.UniqueConstraint(fields=('work_record', 'zone'), name='unique_tuketim_ozeti_workrecord_zone')],
+            },
+        ),
+        migrations.RunPython(ozetleri_doldur, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def etkin_alanlari_doldur(apps, schema_editor):
+    """Etkin müşteri / tesis: iş kaydındaki, yoksa kapatılan talepteki (tek UPDATE)."""
+    WorkRecord = apps.get_model("core", "WorkRecord")
+    Talep = apps.get_model("core", "Talep")
+    talep = Talep.objects.filter(pk=OuterRef("kapatilan_talep_id"))
+    WorkRecord.objects.update(
+        etkin_musteri_id=Coalesce("customer_id", Subquery(talep.values("customer_id")[:1])),
+        etkin_tesis_id=Coalesce("facility_id", Subquery(talep.values("facility_id")[:1])),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0033_istasyontuketimozeti'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workrecord',
+            name='etkin_musteri',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='etkin_is_kayitlari', to='core.customer', verbose_name='Etkin müşteri'),
+        ),
+        migrations.AddField(
+            model_name='workrecord',
+            name='etkin_tesis',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='etkin_is_kayitlari', to='core.facility', verbose_name='Etkin tesis'),
+        ),
+        migrations.AddIndex(
+            model_name='workrecord',
+            index=models.Index(fields=['etkin_tesis', 'tarih'], name='workrecord_etkin_tesis_tarih'),
+        ),
+        migrations.AddIndex(
+            model_name='workrecord',
+            index=models.Index(fields=['etkin_musteri', 'tarih'], name='workrecord_etkin_musteri_tarih'),
+        ),
+        migrations.RunPython(etkin_alanlari_doldur, migrations.RunPython.noop),
+    ]
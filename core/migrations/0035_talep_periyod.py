@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0034_workrecord_etkin_musteri_tesis'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='talep',
+            name='periyod',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='talepler', to='core.periyod', verbose_name='Periyod'),
+        ),
+        migrations.AddConstraint(
+            model_name='talep',
+            constraint=models.UniqueConstraint(fields=('periyod', 'tarih'), name='unique_periyod_talep_tarih'),
+        ),
+    ]
@@ -0,0 +1,139 @@
+# Generated by Django 5.2.18 on 2026-10-17 16:00
+
+import calendar
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# Backfill, uygulama kodundan (core.periyod) bağımsız olsun diye o günkü tarih açma mantığının dondurulmuş kopyası
+UFUK_GUN = 365
+
+
+def _haftanin_gunleri(periyod):
+    gunler = set()
+    for parca in (periyod.haftanin_gunleri or "").split(","):
+        parca = parca.strip()
+        if parca.isdigit() and 1 <= int(parca) <= 7:
+            gunler.add(int(parca) - 1)
+    return sorted(gunler) or [periyod.baslangic_tarihi.weekday()]
+
+
+def _ay_ekle(yil, ay, n):
+    toplam = yil * 12 + (ay - 1) + n
+    return toplam // 12, toplam % 12 + 1
+
+
+def _gun_kirp(yil, ay, gun):
+    return datetime.date(yil, ay, min(gun, calendar.monthrange(yil, ay)[1]))
+
+
+def _ilk_indeks(fark, adim):
+    return max(0, -(-fark // adim))
+
+
+def _periyod_tarihleri(periyod, baslangic, bitis):
+    ilk = periyod.baslangic_tarihi
+    son = min(bitis, periyod.bitis_tarihi) if periyod.bitis_tarihi else bitis
+    baslangic = max(baslangic, ilk)
+    if baslangic > son:
+        return []
+    adim = max(periyod.aralik or 1, 1)
+    limit = periyod.tekrar_sayisi
+    tarihler = []
+
+    if periyod.siklik == "gunluk":
+        k = _ilk_indeks((baslangic - ilk).days, adim)
+        while True:
+            tarih = ilk + datetime.timedelta(days=k * adim)
+            if tarih > son or (limit is not None and k >= limit):
+                break
+            tarihler.append(tarih)
+            k += 1
+
+    elif periyod.siklik == "haftalik":
+        gunler = _haftanin_gunleri(periyod)
+        hafta0 = ilk - datetime.timedelta(days=ilk.weekday())
+        ilk_haftada_atlanan = sum(1 for g in gunler if g < ilk.weekday())
+        c = _ilk_indeks(((baslangic - hafta0).days // 7) - adim + 1, adim)
+        while True:
+            hafta = hafta0 + datetime.timedelta(weeks=c * adim)
+            if hafta > son:
+                break
+            for sira, gun in enumerate(gunler):
+                indeks = c * len(gunler) + sira - ilk_haftada_atlanan
+                if indeks < 0:
+                    continue
+                if limit is not None and indeks >= limit:
+                    return tarihler
+                tarih = hafta + datetime.timedelta(days=gun)
+                if baslangic <= tarih <= son:
+                    tarihler.append(tarih)
+            c += 1
+
+    elif periyod.siklik in ("aylik", "yillik"):
+        ay_adimi = adim if periyod.siklik == "aylik" else adim * 12
+        gun = periyod.ayin_gunu or ilk.day
+        if periyod.siklik == "yillik":
+            ay0 = periyod.ay if periyod.ay and 1 <= periyod.ay <= 12 else ilk.month
+            yil0 = ilk.year if _gun_kirp(ilk.year, ay0, gun) >= ilk else ilk.year + 1
+        else:
+            ay0, yil0 = ilk.month, ilk.year
+            if _gun_kirp(yil0, ay0, gun) < ilk:
+                yil0, ay0 = _ay_ekle(yil0, ay0, 1)
+        fark = (baslangic.year - yil0) * 12 + (baslangic.month - ay0)
+        k = _ilk_indeks(fark, ay_adimi)
+        while True:
+            tarih = _gun_kirp(*_ay_ekle(yil0, ay0, k * ay_adimi), gun)
+            if tarih > son or (limit is not None and k >= limit):
+                break
+            if tarih >= baslangic:
+                tarihler.append(tarih)
+            k += 1
+    return tarihler
+
+
+def periyod_tarihlerini_doldur(apps, schema_editor):
+    """Aktif periyodların tarihlerini bugünden itibaren UFUK_GUN gün için açar."""
+    Periyod = apps.get_model("core", "Periyod")
+    PeriyodTarihi = apps.get_model("core", "PeriyodTarihi")
+    bugun = timezone.localdate()
+    bitis = bugun + datetime.timedelta(days=UFUK_GUN - 1)
+    PeriyodTarihi.objects.bulk_create(
+        [
+            PeriyodTarihi(periyod_id=p.pk, customer_id=p.customer_id, facility_id=p.facility_id, tarih=tarih)
+            for p in Periyod.objects.filter(aktif=True, baslangic_tarihi__lte=bitis)
+            for tarih in _periyod_tarihleri(p, bugun, bitis)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0035_talep_periyod'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeriyodTarihi',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tarih', models.DateField(verbose_name='Tarih')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='periyod_tarihleri', to='core.customer', verbose_name='Müşteri')),
+                ('facility', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='periyod_tarihleri', to='core.facility', verbose_name='Tesis')),
+                ('periyod', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tarihler', to='core.periyod', verbose_name='Periyod')),
+            ],
+            options={
+                'verbose_name': 'Periyod tarihi',
+                'verbose_name_plural': 'Periyod tarihleri',
+                'ordering': ['tarih', 'customer', 'facility'],
+                'indexes': [models.Index(fields=['tarih', 'facility'], name='periyod_tarihi_tarih_tesis')],
+                'constraints': [models.UniqueConstraint(fields=('periyod', 'tarih'), name='unique_periyod_tarihi')],
+            },
+        ),
+        migrations.RunPython(periyod_tarihlerini_doldur, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 16:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0036_periyodtarihi'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facility',
+            name='boylam',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='Boylam'),
+        ),
+        migrations.AddField(
+            model_name='facility',
+            name='enlem',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='Enlem'),
+        ),
+        migrations.CreateModel(
+            name='TesisMesafesi',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mesafe_km', models.DecimalField(decimal_places=2, max_digits=8, verbose_name='Mesafe (km)')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Güncellenme')),
+                ('hedef', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.facility', verbose_name='Hedef tesis')),
+                ('kaynak', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mesafeler', to='core.facility', verbose_name='Kaynak tesis')),
+            ],
+            options={
+                'verbose_name': 'Tesis mesafesi',
+                'verbose_name_plural': 'Tesis mesafeleri',
+                'ordering': ['kaynak', 'hedef'],
+                'constraints': [models.UniqueConstraint(fields=('kaynak', 'hedef'), name='unique_tesis_mesafesi')],
+            },
+        ),
+    ]
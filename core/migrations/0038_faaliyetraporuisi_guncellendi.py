@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 16:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0037_tesis_koordinat_mesafe'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='faaliyetraporuisi',
+            name='guncellendi',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Son ilerleme'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0038_faaliyetraporuisi_guncellendi'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='workrecord',
+            name='form_numarasi',
+            field=models.CharField(blank=True, editable=False, help_text='Otomatik: Müşteri kodu-Tesis kodu-YYYYMMDD (iş kaydı veya kapatılan talep üzerinden).', max_length=80, verbose_name='Form numarası'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0039_alter_workrecord_form_numarasi'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='faaliyetraporuisi',
+            name='is_kayitlari',
+            field=models.JSONField(blank=True, default=list, verbose_name='İş kayıtları'),
+        ),
+    ]
@@ -70,6 +70,8 @@ class Facility(models.Model):
     kod = models.CharField("Kod", max_length=20)
     ad = models.CharField("Tesis adı", max_length=200)
     adres = models.TextField("Adres", blank=True)
+    enlem = models.DecimalField("Enlem", max_digits=9, decimal_places=6, null=True, blank=True)
+    boylam = models.DecimalField("Boylam", max_digits=9, decimal_places=6, null=True, blank=True)
     not_alani = models.TextField("Not", blank=True)
     created_at = models.DateTimeField("Oluşturulma", auto_now_add=True)
 
@@ -88,6 +90,38 @@ class Facility(models.Model):
         return f"{self.customer.kod}-{self.kod} {self.ad}"
 
 
+class TesisMesafesi(models.Model):
+    """
+    İki tesis arasındaki yol mesafesi (rota planlaması için yerel mesafe matrisi). Girilmeyen çiftler için
+    tesis koordinatlarından yaklaşık mesafe hesaplanır. Mesafe iki yönde aynı kabul edilir; (A, B) yoksa (B, A) kullanılır.
+    """
+    kaynak = models.ForeignKey(
+        Facility,
+        on_delete=models.CASCADE,
+        related_name="mesafeler",
+        verbose_name="Kaynak tesis",
+    )
+    hedef = models.ForeignKey(
+        Facility,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Hedef tesis",
+    )
+    mesafe_km = models.DecimalField("Mesafe (km)", max_digits=8, decimal_places=2)
+    updated_at = models.DateTimeField("Güncellenme", auto_now=True)
+
+    class Meta:
+        verbose_name = "Tesis mesafesi"
+        verbose_name_plural = "Tesis mesafeleri"
+        ordering = ["kaynak", "hedef"]
+        constraints = [
+            models.UniqueConstraint(fields=["kaynak", "hedef"], name="unique_tesis_mesafesi"),
+        ]
+
+    def __str__(self):
+        return f"{self.kaynak} → {self.hedef}: {self.mesafe_km} km"
+
+
 class Periyod(models.Model):
     """
     Periyodik ziyaret tanımı (takvim tekrarlama). Müşteri/tesis için belirli aralıklarla
@@ -182,6 +216,51 @@ class Periyod(models.Model):
         return f"{self.customer.kod}{facility_str} ({self.get_siklik_display()})"
 
 
+class PeriyodTarihi(models.Model):
+    """
+    Periyodun açılmış ziyaret tarihi (bugünden itibaren core.periyod.UFUK_GUN gün). Periyod kaydedilince
+    o periyodun satırları yenilenir; ufuk periyod_tarihlerini_yenile komutuyla kaydırılır. Takvim / vade listeleri buradan okunur.
+    """
+    periyod = models.ForeignKey(
+        Periyod,
+        on_delete=models.CASCADE,
+        related_name="tarihler",
+        verbose_name="Periyod",
+    )
+    customer = models.ForeignKey(
+        Customer,
+        on_delete=models.CASCADE,
+        related_name="periyod_tarihleri",
+        verbose_name="Müşteri",
+    )
+    facility = models.ForeignKey(
+        Facility,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="periyod_tarihleri",
+        verbose_name="Tesis",
+    )
+    tarih = models.DateField("Tarih")
+
+    class Meta:
+        verbose_name = "Periyod tarihi"
+        verbose_name_plural = "Periyod tarihleri"
+        ordering = ["tarih", "customer", "facility"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["periyod", "tarih"],
+                name="unique_periyod_tarihi",
+            )
+        ]
+        indexes = [
+            models.Index(fields=["tarih", "facility"], name="periyod_tarihi_tarih_tesis"),
+        ]
+
+    def __str__(self):
+        return f"{self.tarih:%d.%m.%Y} - {self.periyod}"
+
+
 class Zone(models.Model):
     """Bölge (tesise ait)."""
     facility = models.ForeignKey(
@@ -409,11 +488,34 @@ class WorkRecord(models.Model):
         editable=False,
         help_text="Otomatik: Müşteri kodu-Tesis kodu-YYYYMMDD (iş kaydı veya kapatılan talep üzerinden).",
     )
+    # Raporlarda kullanılan müşteri / tesis: iş kaydındaki, yoksa kapatılan talepteki (save() ve Talep.save() günceller)
+    etkin_musteri = models.ForeignKey(
+        Customer,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="etkin_is_kayitlari",
+        verbose_name="Etkin müşteri",
+    )
+    etkin_tesis = models.ForeignKey(
+        Facility,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="etkin_is_kayitlari",
+        verbose_name="Etkin tesis",
+    )
 
     class Meta:
         verbose_name = "İş kaydı"
         verbose_name_plural = "İş kayıtları"
         ordering = ["-tarih", "-created_at"]
+        indexes = [
+            models.Index(fields=["etkin_tesis", "tarih"], name="workrecord_etkin_tesis_tarih"),
+            models.Index(fields=["etkin_musteri", "tarih"], name="workrecord_etkin_musteri_tarih"),
+        ]
 
     def save(self, *args, **kwargs):
         eski_talep_id = None
@@ -434,6 +536,7 @@ class WorkRecord(models.Model):
         # Form numarası: önce kapatılan talep, yoksa iş kaydındaki müşteri/tesis
         customer = None
         facility = None
+        talep = None
         if self.kapatilan_talep_id:
             talep = getattr(self, "_kapatilan_talep_cache", None)
             if talep is None:
@@ -441,6 +544,11 @@ class WorkRecord(models.Model):
             if talep:
                 customer = talep.customer
                 facility = talep.facility
+        # Etkin müşteri / tesis: iş kaydındaki, yoksa kapatılan talepteki
+        self.etkin_musteri_id = self.customer_id or (talep.customer_id if talep else None)
+        self.etkin_tesis_id = self.facility_id or (talep.facility_id if talep else None)
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "etkin_musteri", "etkin_tesis"}
         if not customer and self.customer_id:
             customer = getattr(self, "customer", None) or (Customer.objects.filter(pk=self.customer_id).first() if self.customer_id else None)
         if not facility and self.facility_id:
@@ -705,19 +813,54 @@ class Talep(models.Model):
         related_name="bagli_talepler",
         verbose_name="İlişkili talep",
     )
+    # Periyod tekrarlama motorunun (core.periyod) oluşturduğu talepler; periyod başına tarih tekildir
+    periyod = models.ForeignKey(
+        Periyod,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="talepler",
+        verbose_name="Periyod",
+    )
     created_at = models.DateTimeField("Oluşturulma", auto_now_add=True)
 
     class Meta:
         verbose_name = "Talep"
         verbose_name_plural = "Talepler"
         ordering = ["-tarih", "-created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["periyod", "tarih"],
+                name="unique_periyod_talep_tarih",
+            )
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Yüklenen müşteri / tesis: save() iş kayıtlarına yalnızca bunlar değişince yayar
+        instance._yuklenen_musteri_tesis = (instance.__dict__.get("customer_id"), instance.__dict__.get("facility_id"))
+        return instance
 
     def save(self, *args, **kwargs):
         # Durum güncellemesi artık WorkRecord.save() içinde (iş kaydında "Kapatılan talep" seçildiğinde)
         # Planlanan tarih ve ekip doluysa durum = Planlandı (yapıldı değilse)
         if self.planlanan_tarih and self.planlanan_ekip_id and self.durum != "yapildi":
             self.durum = "planlandi"
+        yeni = self._state.adding
         super().save(*args, **kwargs)
+        # Bu talebi kapatan iş kaydının etkin müşteri / tesisi (iş kaydında boşsa talepten gelir).
+        # Yeni talebi kapatan iş kaydı olamaz; mevcut talepte yalnızca müşteri / tesis değiştiyse güncellenir.
+        musteri_tesis = (self.customer_id, self.facility_id)
+        if yeni or getattr(self, "_yuklenen_musteri_tesis", None) == musteri_tesis:
+            self._yuklenen_musteri_tesis = musteri_tesis
+            return
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or {"customer", "facility"} & set(update_fields):
+            is_kayitlari = WorkRecord.objects.filter(kapatilan_talep=self)
+            is_kayitlari.filter(customer__isnull=True).update(etkin_musteri_id=self.customer_id)
+            is_kayitlari.filter(facility__isnull=True).update(etkin_tesis_id=self.facility_id)
+            self._yuklenen_musteri_tesis = musteri_tesis
 
     def recalculate_durum(self):
         """İş kaydıyla kapatılmadığında durumu planlanan bilgilere göre günceller (Yapıldı dışı)."""
@@ -751,6 +894,12 @@ class WorkRecordStationCount(models.Model):
         help_text="True: tüketim var, False: tüketim yok.",
     )
     not_alani = models.CharField("Not", max_length=200, blank=True)
+    istemci_zamani = models.DateTimeField(
+        "Sayım zamanı",
+        null=True,
+        blank=True,
+        help_text="Sayımın cihazda yapıldığı an; çevrimdışı senkronda son yazan kazanır.",
+    )
     created_at = models.DateTimeField("Oluşturulma", auto_now_add=True)
 
     class Meta:
@@ -768,6 +917,53 @@ class WorkRecordStationCount(models.Model):
         return f"{self.work_record} - {self.station.benzersiz_kod}: {'Tüketim var' if self.tuketim_var else 'Tüketim yok'}"
 
 
+class IstasyonTuketimOzeti(models.Model):
+    """
+    İş kaydı × bölge bazında sayım özeti (tüketim var / yok istasyon sayıları).
+    WorkRecordStationCount değiştikçe güncellenir (core.signals, toplu kayıtta core.tuketim_ozeti); istasyon bölgesi veya
+    bölge tesisi değişince de yenilenir; tuketim_ozetlerini_olustur komutu baştan kurar. İstasyon raporunun oran satırları ve
+    bölge istatistikleri buradan okunur.
+    """
+    facility = models.ForeignKey(
+        Facility,
+        on_delete=models.CASCADE,
+        related_name="tuketim_ozetleri",
+        verbose_name="Tesis",
+    )
+    zone = models.ForeignKey(
+        Zone,
+        on_delete=models.CASCADE,
+        related_name="tuketim_ozetleri",
+        verbose_name="Bölge",
+    )
+    work_record = models.ForeignKey(
+        WorkRecord,
+        on_delete=models.CASCADE,
+        related_name="tuketim_ozetleri",
+        verbose_name="İş kaydı",
+    )
+    tarih = models.DateField("Tarih", help_text="İş kaydı tarihi (rapor aralığı filtresi için kopyalanır).")
+    var_sayisi = models.PositiveIntegerField("Tüketim var", default=0)
+    yok_sayisi = models.PositiveIntegerField("Tüketim yok", default=0)
+
+    class Meta:
+        verbose_name = "İstasyon tüketim özeti"
+        verbose_name_plural = "İstasyon tüketim özetleri"
+        ordering = ["facility", "tarih", "zone"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["work_record", "zone"],
+                name="unique_tuketim_ozeti_workrecord_zone",
+            )
+        ]
+        indexes = [
+            models.Index(fields=["facility", "tarih"], name="tuketim_ozeti_tesis_tarih"),
+        ]
+
+    def __str__(self):
+        return f"{self.work_record} - {self.zone}: {self.var_sayisi} var / {self.yok_sayisi} yok"
+
+
 class BagimsizTespit(models.Model):
     """Bağımsız tespit kaydı. Tarih, firma, tesis, yer/gözlem açıklaması, öneriler, raporlandı ve 3 görsel."""
     tarih = models.DateField("Tarih")
@@ -836,6 +1032,12 @@ class FaaliyetRaporu(models.Model):
         blank=True,
         null=True,
     )
+    parmak_izi = models.CharField(
+        "Parmak izi",
+        max_length=64,
+        blank=True,
+        help_text="Rapor verisi ve şablon sürümünün SHA-256 özeti; değişmediyse PDF yeniden üretilmez.",
+    )
     created_at = models.DateTimeField("Oluşturulma", auto_now_add=True)
 
     class Meta:
@@ -845,3 +1047,46 @@ class FaaliyetRaporu(models.Model):
 
     def __str__(self):
         return f"{self.musteri_kod} / {self.is_kaydi_kod} ({self.rapor_tarihi})"
+
+
+class FaaliyetRaporuIsi(models.Model):
+    """
+    Toplu faaliyet raporu üretim işi. Admin aksiyonu işi sıraya alır, faaliyet_raporu_isleri işçisi çalıştırır;
+    ilerleme bu kayıttan okunur.
+    """
+    DURUM_BEKLIYOR = "bekliyor"
+    DURUM_CALISIYOR = "calisiyor"
+    DURUM_TAMAMLANDI = "tamamlandi"
+    DURUM_HATA = "hata"
+    DURUM_CHOICES = [
+        (DURUM_BEKLIYOR, "Bekliyor"),
+        (DURUM_CALISIYOR, "Çalışıyor"),
+        (DURUM_TAMAMLANDI, "Tamamlandı"),
+        (DURUM_HATA, "Hata"),
+    ]
+    durum = models.CharField("Durum", max_length=20, choices=DURUM_CHOICES, default=DURUM_BEKLIYOR)
+    toplam = models.PositiveIntegerField("Toplam", default=0)
+    tamamlanan = models.PositiveIntegerField("Tamamlanan", default=0)
+    hatali = models.PositiveIntegerField("Hatalı", default=0)
+    mesaj = models.TextField("Mesaj", blank=True)
+    # Raporu üretilecek iş kaydı id'leri (işçi işi buradan okur)
+    is_kayitlari = models.JSONField("İş kayıtları", default=list, blank=True)
+    olusturan = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="faaliyet_raporu_isleri",
+        verbose_name="Oluşturan",
+    )
+    created_at = models.DateTimeField("Oluşturulma", auto_now_add=True)
+    guncellendi = models.DateTimeField("Son ilerleme", null=True, blank=True)
+    bitis = models.DateTimeField("Bitiş", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Faaliyet raporu işi"
+        verbose_name_plural = "Faaliyet raporu işleri"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Rapor işi #{self.pk} ({self.tamamlanan}/{self.toplam})"
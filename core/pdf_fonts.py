@@ -0,0 +1,92 @@
+"""
+PDF üreticilerinin (etiket, faaliyet raporu, bağımsız tespit raporu) ortak font altyapısı.
+Türkçe karakter destekleyen TTF fontlar ilk çizimde bir kez bulunup kaydedilir (modül yüklenirken değil).
+Öncelik: core/fonts/DejaVu → Linux sistem DejaVu → Windows Arial → Helvetica.
+gunicorn --preload ile çalışırken warm_fonts() ana süreçte çağrılır; işçiler fork ile kayıtlı fontları devralır.
+"""
+import logging
+import os
+import threading
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+_LOCK = threading.Lock()
+# Seçilen fontlar: {"normal", "kalin", "kaynak"}; ilk font_names() çağrısında dolar
+_SECILEN = None
+
+_LINUX_DEJAVU_PATHS = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+]
+
+
+def _aday_fontlar():
+    """(normal ad, kalın ad, normal dosya, kalın dosya) adaylarını öncelik sırasıyla üretir."""
+    # 1) Proje içi core/fonts: DejaVuSans.ttf, DejaVuSans-Bold.ttf
+    fonts_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts")
+    yield (
+        "DejaVuSans", "DejaVuSans-Bold",
+        os.path.join(fonts_dir, "DejaVuSans.ttf"), os.path.join(fonts_dir, "DejaVuSans-Bold.ttf"),
+    )
+    # 2) Linux/Ubuntu: Sistem DejaVu fontları (fonts-dejavu-core paketi)
+    for regular in _LINUX_DEJAVU_PATHS:
+        yield "DejaVuSans", "DejaVuSans-Bold", regular, regular.replace("DejaVuSans.ttf", "DejaVuSans-Bold.ttf")
+    # 3) Windows: Arial (Türkçe destekli)
+    windir = os.environ.get("WINDIR", "")
+    if windir:
+        yield (
+            "ArialTR", "ArialTR-Bold",
+            os.path.join(windir, "Fonts", "arial.ttf"), os.path.join(windir, "Fonts", "arialbd.ttf"),
+        )
+
+
+def _register():
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    for normal, kalin, regular_path, bold_path in _aday_fontlar():
+        if not (os.path.isfile(regular_path) and os.path.isfile(bold_path)):
+            continue
+        try:
+            pdfmetrics.registerFont(TTFont(normal, regular_path))
+            pdfmetrics.registerFont(TTFont(kalin, bold_path))
+        except Exception:
+            continue
+        return {"normal": normal, "kalin": kalin, "kaynak": regular_path}
+    # Helvetica kalır (Türkçe karakterler boş/kutu çıkabilir)
+    return {"normal": "Helvetica", "kalin": "Helvetica-Bold", "kaynak": None}
+
+
+def font_names():
+    """(normal, kalın) font adlarını döndürür. İlk çağrıda fontlar bulunur ve kaydedilir."""
+    global _SECILEN
+    if _SECILEN is None:
+        with _LOCK:
+            if _SECILEN is None:
+                _SECILEN = _register()
+                logger.info(
+                    "PDF fontu seçildi: %s / %s (%s)",
+                    _SECILEN["normal"], _SECILEN["kalin"], _SECILEN["kaynak"] or "yerleşik Helvetica",
+                )
+    return _SECILEN["normal"], _SECILEN["kalin"]
+
+
+def font_info():
+    """Seçilen fontu döndürür: {"normal", "kalin", "kaynak"} (kaynak: TTF dosya yolu veya None)."""
+    font_names()
+    return dict(_SECILEN)
+
+
+def warm_fonts():
+    """Fontları önceden kaydeder (ör. WSGI yüklenirken; fork öncesi ana süreçte). Seçilen fontu döndürür."""
+    return font_info()
+
+
+@lru_cache(maxsize=4096)
+def string_width(text, font_name, size):
+    """pdfmetrics.stringWidth sonucunu önbellekten döndürür (başlık, tablo etiketi gibi tekrar eden metinler için)."""
+    from reportlab.pdfbase import pdfmetrics
+
+    return pdfmetrics.stringWidth(text, font_name, size)
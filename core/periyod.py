@@ -0,0 +1,197 @@
+"""
+Periyod tekrarlama motoru. Aktif periyodların verilen tarih aralığındaki ziyaret tarihleri hesaplanır
+(her periyod için aralığın başına doğrudan atlanır; başlangıçtan itibaren adım adım ilerlenmez),
+mevcut taleplerle tek sorguda karşılaştırılır ve eksik talepler tek bulk_create ile oluşturulur.
+Tekrar çalıştırmak güvenlidir: (periyod, tarih) benzersizdir, var olan talep yeniden oluşturulmaz.
+Takvim / vade listeleri için tarihler PeriyodTarihi tablosunda UFUK_GUN günlük ufka kadar açılmış tutulur.
+"""
+import calendar
+import datetime
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Periyod, PeriyodTarihi, Talep
+
+# PeriyodTarihi tablosunda bugünden itibaren tutulan gün sayısı
+UFUK_GUN = 365
+
+
+def haftanin_gunleri(periyod):
+    """haftanin_gunleri alanı ("1,3,5"; 1=Pazartesi) → sıralı weekday listesi (0=Pazartesi). Boşsa başlangıç günü."""
+    gunler = set()
+    for parca in (periyod.haftanin_gunleri or "").split(","):
+        parca = parca.strip()
+        if parca.isdigit() and 1 <= int(parca) <= 7:
+            gunler.add(int(parca) - 1)
+    return sorted(gunler) or [periyod.baslangic_tarihi.weekday()]
+
+
+def _ay_ekle(yil, ay, n):
+    toplam = yil * 12 + (ay - 1) + n
+    return toplam // 12, toplam % 12 + 1
+
+
+def _gun_kirp(yil, ay, gun):
+    """Ayın gün sayısını aşan günü ayın son gününe çeker (örn. 31 → 30 Nisan)."""
+    return datetime.date(yil, ay, min(gun, calendar.monthrange(yil, ay)[1]))
+
+
+def _ilk_indeks(fark, adim):
+    """fark birimden sonraki ilk adım katının indeksi (fark <= 0 ise 0)."""
+    return max(0, -(-fark // adim))
+
+
+def periyod_tarihleri(periyod, baslangic, bitis):
+    """
+    Periyodun [baslangic, bitis] aralığındaki ziyaret tarihleri (artan sırada).
+    Başlangıç tarihi, bitiş tarihi ve tekrar sayısı (periyod başlangıcından itibaren sayılır) dikkate alınır.
+    Günlük: her "aralik" gün; haftalık: her "aralik" haftada seçili günler; aylık: her "aralik" ayda ayin_gunu;
+    yıllık: her "aralik" yılda ay / ayin_gunu (boşsa başlangıç tarihinin ayı / günü).
+    """
+    ilk = periyod.baslangic_tarihi
+    son = min(bitis, periyod.bitis_tarihi) if periyod.bitis_tarihi else bitis
+    baslangic = max(baslangic, ilk)
+    if baslangic > son:
+        return []
+    adim = max(periyod.aralik or 1, 1)
+    limit = periyod.tekrar_sayisi
+    tarihler = []
+
+    if periyod.siklik == Periyod.SIKLIK_GUNLUK:
+        k = _ilk_indeks((baslangic - ilk).days, adim)
+        while True:
+            tarih = ilk + datetime.timedelta(days=k * adim)
+            if tarih > son or (limit is not None and k >= limit):
+                break
+            tarihler.append(tarih)
+            k += 1
+
+    elif periyod.siklik == Periyod.SIKLIK_HAFTALIK:
+        gunler = haftanin_gunleri(periyod)
+        hafta0 = ilk - datetime.timedelta(days=ilk.weekday())
+        # İlk haftada başlangıçtan önceki günler sayılmaz (tekrar sayısı indeksi için)
+        ilk_haftada_atlanan = sum(1 for g in gunler if g < ilk.weekday())
+        c = _ilk_indeks(((baslangic - hafta0).days // 7) - adim + 1, adim)
+        while True:
+            hafta = hafta0 + datetime.timedelta(weeks=c * adim)
+            if hafta > son:
+                break
+            for sira, gun in enumerate(gunler):
+                indeks = c * len(gunler) + sira - ilk_haftada_atlanan
+                if indeks < 0:
+                    continue
+                if limit is not None and indeks >= limit:
+                    return tarihler
+                tarih = hafta + datetime.timedelta(days=gun)
+                if baslangic <= tarih <= son:
+                    tarihler.append(tarih)
+            c += 1
+
+    elif periyod.siklik in (Periyod.SIKLIK_AYLIK, Periyod.SIKLIK_YILLIK):
+        ay_adimi = adim if periyod.siklik == Periyod.SIKLIK_AYLIK else adim * 12
+        gun = periyod.ayin_gunu or ilk.day
+        if periyod.siklik == Periyod.SIKLIK_YILLIK:
+            ay0 = periyod.ay if periyod.ay and 1 <= periyod.ay <= 12 else ilk.month
+            yil0 = ilk.year if _gun_kirp(ilk.year, ay0, gun) >= ilk else ilk.year + 1
+        else:
+            ay0, yil0 = ilk.month, ilk.year
+            if _gun_kirp(yil0, ay0, gun) < ilk:
+                yil0, ay0 = _ay_ekle(yil0, ay0, 1)
+        fark = (baslangic.year - yil0) * 12 + (baslangic.month - ay0)
+        k = _ilk_indeks(fark, ay_adimi)
+        while True:
+            tarih = _gun_kirp(*_ay_ekle(yil0, ay0, k * ay_adimi), gun)
+            if tarih > son or (limit is not None and k >= limit):
+                break
+            if tarih >= baslangic:
+                tarihler.append(tarih)
+            k += 1
+    return tarihler
+
+
+def aktif_periyodlar(baslangic, bitis):
+    """Aralıkla kesişen aktif periyodlar (tek sorgu)."""
+    return Periyod.objects.filter(aktif=True, baslangic_tarihi__lte=bitis).filter(
+        Q(bitis_tarihi__isnull=True) | Q(bitis_tarihi__gte=baslangic),
+    )
+
+
+def talep_aciklamasi(periyod):
+    return f"Periyodik ziyaret: {periyod.ad}" if periyod.ad else "Periyodik ziyaret"
+
+
+def periyod_talepleri_olustur(baslangic, bitis, periyodlar=None, kaydet=True):
+    """
+    Periyodların [baslangic, bitis] aralığındaki eksik taleplerini oluşturur (sabit sayıda sorgu).
+    periyodlar verilmezse aralıkla kesişen tüm aktif periyodlar. Talep tipi olmayan periyodlar atlanır.
+    kaydet=False: yalnızca hesaplar (deneme; "olusturulan" oluşturulacak sayıdır).
+    Döndürür: {"periyod", "olusturulan", "mevcut", "tipsiz"}.
+    """
+    periyodlar = list(aktif_periyodlar(baslangic, bitis) if periyodlar is None else periyodlar)
+    sonuc = {"periyod": len(periyodlar), "olusturulan": 0, "mevcut": 0, "tipsiz": 0}
+    tipli = []
+    for periyod in periyodlar:
+        if periyod.talep_tipi_id:
+            tipli.append(periyod)
+        else:
+            sonuc["tipsiz"] += 1
+    aralik_talepleri = Talep.objects.filter(
+        periyod_id__in=[p.pk for p in tipli], tarih__gte=baslangic, tarih__lte=bitis,
+    )
+    mevcut = set(aralik_talepleri.values_list("periyod_id", "tarih")) if tipli else set()
+
+    yeni = []
+    for periyod in tipli:
+        aciklama = talep_aciklamasi(periyod)
+        for tarih in periyod_tarihleri(periyod, baslangic, bitis):
+            if (periyod.pk, tarih) in mevcut:
+                sonuc["mevcut"] += 1
+                continue
+            yeni.append(Talep(
+                periyod=periyod,
+                customer_id=periyod.customer_id,
+                facility_id=periyod.facility_id,
+                tip_id=periyod.talep_tipi_id,
+                tarih=tarih,
+                aciklama=aciklama,
+            ))
+    if kaydet and yeni:
+        # Eşzamanlı çalışmalar periyod satırlarını kilitleyerek sıraya girer; kilit altında mevcut (periyod, tarih)
+        # anahtarları yeniden okunur ve yalnızca eksik talepler eklenir (oluşturulan = eklenen satırlar)
+        with transaction.atomic():
+            list(Periyod.objects.select_for_update().filter(pk__in=[p.pk for p in tipli]).values_list("pk", flat=True))
+            araya_giren = set(aralik_talepleri.values_list("periyod_id", "tarih"))
+            eklenecek = [talep for talep in yeni if (talep.periyod_id, talep.tarih) not in araya_giren]
+            Talep.objects.bulk_create(eklenecek, batch_size=1000, ignore_conflicts=True)
+        sonuc["mevcut"] += len(yeni) - len(eklenecek)
+        yeni = eklenecek
+    sonuc["olusturulan"] = len(yeni)
+    return sonuc
+
+
+def periyod_tarihlerini_yenile(periyodlar=None, bugun=None):
+    """
+    PeriyodTarihi satırlarını [bugün, bugün + UFUK_GUN) için yeniden oluşturur.
+    periyodlar verilirse yalnızca onların satırları yenilenir (pasif periyodun satırları silinir);
+    verilmezse tablo baştan kurulur (ufku kaydırmak için günlük çalıştırılır). Oluşturulan satır sayısını döndürür.
+    """
+    bugun = bugun or timezone.localdate()
+    bitis = bugun + datetime.timedelta(days=UFUK_GUN - 1)
+    if periyodlar is None:
+        silinecek = PeriyodTarihi.objects.all()
+        aktifler = aktif_periyodlar(bugun, bitis)
+    else:
+        periyodlar = list(periyodlar)
+        silinecek = PeriyodTarihi.objects.filter(periyod__in=periyodlar)
+        aktifler = [p for p in periyodlar if p.aktif]
+    satirlar = [
+        PeriyodTarihi(periyod=p, customer_id=p.customer_id, facility_id=p.facility_id, tarih=tarih)
+        for p in aktifler
+        for tarih in periyod_tarihleri(p, bugun, bitis)
+    ]
+    with transaction.atomic():
+        silinecek.delete()
+        PeriyodTarihi.objects.bulk_create(satirlar, batch_size=1000)
+    return len(satirlar)
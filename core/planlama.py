@@ -0,0 +1,113 @@
+"""
+Ekip kapasite planlaması. Bekleyen talepler ekiplere ve günlere toplu atanır (planlanan_tarih / planlanan_ekip).
+Ekibin günlük kapasitesi kişi sayısı × KISI_BASI_GUNLUK_ZIYARET ziyarettir; dönemde zaten planlanmış talepler düşülür.
+Aynı müşteri / tesisin aynı güne düşen talepleri grup olarak aynı ekibe ve aynı güne verilir (grup kapasiteyi aşmadıkça).
+Her gün için ekipler kalan kapasiteye göre bir yığında (heap) tutulur; grup en erken uygun günde en boş ekibe gider.
+Sonuç tek transaction'da bulk_update ile yazılır (talep başına save() yok).
+"""
+import bisect
+import datetime
+import heapq
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Ekip, Talep
+
+# Ekipte kişi başına günlük ziyaret sayısı (ekip kapasitesi = kisi_sayisi × bu değer)
+KISI_BASI_GUNLUK_ZIYARET = 2
+# Planlama yapılan haftanın günleri (0=Pazartesi); pazar günleri planlanmaz
+CALISMA_GUNLERI = (0, 1, 2, 3, 4, 5)
+# Varsayılan planlama dönemi (gün)
+PLANLAMA_GUN_SAYISI = 30
+
+
+def _gruplar(talepler, baslangic):
+    """
+    Talepleri (müşteri, tesis, en erken gün) bazında gruplar; en erken gün talep (veya önceden verilen planlanan)
+    tarihidir, geçmişte kalanlar dönem başına çekilir. Gruplar en erken gün, sonra büyükten küçüğe sıralanır.
+    """
+    gruplar = defaultdict(list)
+    for talep in talepler:
+        en_erken = max(baslangic, talep.planlanan_tarih or talep.tarih)
+        gruplar[(talep.customer_id, talep.facility_id, en_erken)].append(talep)
+    return sorted(gruplar.items(), key=lambda item: (item[0][2], -len(item[1]), item[0][0], item[0][1] or 0))
+
+
+def plan_olustur(talepler, ekipler, baslangic, gun_sayisi, mevcut_yuk=None, kisi_basi=KISI_BASI_GUNLUK_ZIYARET):
+    """
+    Veritabanına erişmeden atama yapar. talepler: Talep nesneleri; ekipler: Ekip nesneleri (kisi_sayisi > 0);
+    mevcut_yuk: {(tarih, ekip_id): planlı talep sayısı}. Atanan taleplerin planlanan_tarih / planlanan_ekip / durum
+    alanlarını günceller; (atananlar, atanamayanlar) döndürür.
+    """
+    kapasite = {e.pk: e.kisi_sayisi * kisi_basi for e in ekipler if e.kisi_sayisi > 0}
+    if not kapasite:
+        return [], list(talepler)
+    en_buyuk = max(kapasite.values())
+    mevcut_yuk = mevcut_yuk or {}
+    gunler = [
+        gun for gun in (baslangic + datetime.timedelta(days=i) for i in range(gun_sayisi))
+        if gun.weekday() in CALISMA_GUNLERI
+    ]
+    # Gün başına ekip yığını: (-kalan kapasite, ekip_id); yalnızca en üstteki değiştiği için yığın hep geçerli kalır
+    yiginlar = {}
+
+    def yigin(i):
+        if i not in yiginlar:
+            gun = gunler[i]
+            yiginlar[i] = [(-(kap - mevcut_yuk.get((gun, ekip_id), 0)), ekip_id) for ekip_id, kap in kapasite.items()]
+            heapq.heapify(yiginlar[i])
+        return yiginlar[i]
+
+    ekip_by_id = {e.pk: e for e in ekipler}
+    atananlar, atanamayanlar = [], []
+    for (_, _, en_erken), grup in _gruplar(talepler, baslangic):
+        i = bisect.bisect_left(gunler, en_erken)
+        kalan_grup = list(grup)
+        while kalan_grup and i < len(gunler):
+            h = yigin(i)
+            bos = -h[0][0]
+            # Grup bir ekibin günlük kapasitesine sığıyorsa bölünmez: sığmıyorsa sonraki güne geçilir
+            if bos <= 0 or (bos < len(kalan_grup) and len(kalan_grup) <= en_buyuk):
+                i += 1
+                continue
+            _, ekip_id = heapq.heappop(h)
+            parca, kalan_grup = kalan_grup[:bos], kalan_grup[bos:]
+            heapq.heappush(h, (-(bos - len(parca)), ekip_id))
+            for talep in parca:
+                talep.planlanan_tarih = gunler[i]
+                talep.planlanan_ekip = ekip_by_id[ekip_id]
+                talep.durum = "planlandi"
+            atananlar.extend(parca)
+        atanamayanlar.extend(kalan_grup)
+    return atananlar, atanamayanlar
+
+
+def talepleri_planla(talepler=None, baslangic=None, gun_sayisi=PLANLAMA_GUN_SAYISI, kaydet=True):
+    """
+    Bekleyen talepleri (talepler verilmezse tümü) [baslangic, baslangic + gun_sayisi) dönemine planlar.
+    Sabit sayıda sorgu: ekipler, dönemdeki mevcut yük, talepler ve tek bulk_update.
+    Döndürür: {"planlanan", "planlanamayan", "ekip"}.
+    """
+    baslangic = baslangic or timezone.localdate()
+    bitis = baslangic + datetime.timedelta(days=gun_sayisi - 1)
+    with transaction.atomic():
+        ekipler = list(Ekip.objects.filter(kisi_sayisi__gt=0).order_by("kod"))
+        mevcut_yuk = {
+            (r["planlanan_tarih"], r["planlanan_ekip_id"]): r["sayi"]
+            for r in Talep.objects.filter(
+                planlanan_ekip__in=ekipler, planlanan_tarih__gte=baslangic, planlanan_tarih__lte=bitis,
+                durum="planlandi",
+            ).values("planlanan_tarih", "planlanan_ekip_id").annotate(sayi=Count("pk")).order_by()
+        }
+        qs = Talep.objects.all() if talepler is None else talepler
+        # Yalnızca talep satırları kilitlenir; qs'teki select_related'ın ilişkili tabloları kilitlemesi engellenir
+        talepler = list(
+            qs.filter(durum="beklemede").select_related(None).select_for_update(of=("self",)).order_by("tarih", "pk")
+        )
+        atananlar, atanamayanlar = plan_olustur(talepler, ekipler, baslangic, gun_sayisi, mevcut_yuk)
+        if kaydet and atananlar:
+            Talep.objects.bulk_update(atananlar, ["planlanan_tarih", "planlanan_ekip", "durum"], batch_size=500)
+    return {"planlanan": len(atananlar), "planlanamayan": len(atanamayanlar), "ekip": len(ekipler)}
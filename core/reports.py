@@ -1,10 +1,19 @@
 """Admin rapor view'ları."""
+import tempfile
+
 from django.contrib import admin
 from django.contrib.admin.views.decorators import staff_member_required
-from django.http import HttpResponse
+from django.http import FileResponse, StreamingHttpResponse
 from django.shortcuts import render
 
-from .istasyon_raporu import IstasyonRaporuForm, build_istasyon_raporu_excel, get_istasyon_raporu_data
+from .istasyon_raporu import (
+    AKIS_BICIMLERI,
+    IstasyonRaporuForm,
+    get_istasyon_raporu_data,
+    get_istasyon_raporu_verileri,
+    write_istasyon_raporu_excel,
+    write_istasyon_raporu_excel_coklu,
+)
 from .models import WorkRecordIlac
 
 
@@ -14,13 +23,12 @@ def ilac_kullanımlari_raporu(request):
     qs = (
         WorkRecordIlac.objects.select_related(
             "work_record",
-            "work_record__customer",
-            "work_record__facility",
+            "work_record__etkin_musteri",
+            "work_record__etkin_tesis__customer",
             "work_record__personel",
             "work_record__ekip",
             "work_record__kapatilan_talep",
             "work_record__kapatilan_talep__customer",
-            "work_record__kapatilan_talep__facility",
             "work_record__kapatilan_talep__tip",
             "ilac_tanim",
         )
@@ -30,8 +38,8 @@ def ilac_kullanımlari_raporu(request):
     for wri in qs:
         wr = wri.work_record
         talep = getattr(wr, "kapatilan_talep", None)
-        customer = wr.customer or (talep.customer if talep else None)
-        facility = wr.facility or (talep.facility if talep else None)
+        customer = wr.etkin_musteri
+        facility = wr.etkin_tesis
         rows.append({
             "ilac_ticari_ismi": wri.ilac_tanim.ticari_ismi,
             "ilac_firma": wri.ilac_tanim.temin_edildigi_firma,
@@ -54,10 +62,34 @@ def ilac_kullanımlari_raporu(request):
     return render(request, "admin/core/rapor_ilac_kullanımlari.html", context)
 
 
+def _istasyon_raporu_musteri_excel(form):
+    """Müşterinin tüm tesisleri için özet + tesis başına sayfa içeren Excel (sabit sayıda sorgu)."""
+    musteri = form.cleaned_data["musteri"]
+    start = form.cleaned_data["baslangic_tarihi"]
+    end = form.cleaned_data["bitis_tarihi"]
+    raporlar = get_istasyon_raporu_verileri(musteri.tesisler.values_list("pk", flat=True), start, end, hucreler=False)
+    tmp = tempfile.TemporaryFile()
+    write_istasyon_raporu_excel_coklu(
+        raporlar, tmp, baslik=f"{musteri.firma_ismi} - İstasyon Raporu ({start:%d.%m.%Y} - {end:%d.%m.%Y})",
+    )
+    tmp.seek(0)
+    return FileResponse(
+        tmp,
+        as_attachment=True,
+        filename=f"istasyon_raporu_{musteri.kod}_{start:%Y%m%d}_{end:%Y%m%d}.xlsx",
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+
+
 @staff_member_required
 def istasyon_raporu(request):
-    """İstasyon raporu: tesis + tarih aralığı seç; Excel indir veya ekranda tablo göster."""
+    """İstasyon raporu: tesis + tarih aralığı seç; Excel indir veya ekranda tablo göster. Müşteri seçilirse tüm tesisler tek Excel."""
     form = IstasyonRaporuForm(request.POST or None)
+    if request.method == "POST" and form.is_valid() and form.cleaned_data["musteri"]:
+        if request.POST.get("ekran") or request.POST.get("bicim"):
+            form.add_error("musteri", "Müşteri raporu yalnızca Excel olarak indirilebilir; ekran ve CSV/JSON için tesis seçin.")
+        else:
+            return _istasyon_raporu_musteri_excel(form)
     if request.method == "POST" and form.is_valid():
         facility_id = form.cleaned_data["tesis"].pk
         start = form.cleaned_data["baslangic_tarihi"]
@@ -85,12 +117,28 @@ def istasyon_raporu(request):
                 "rapor_zone_stats": data.get("zone_stats", []),
             }
             return render(request, "admin/core/rapor_istasyon.html", context)
-        excel_bytes = build_istasyon_raporu_excel(facility_id, start, end)
         facility = form.cleaned_data["tesis"]
-        filename = f"istasyon_raporu_{facility.customer.kod}_{facility.kod}_{start:%Y%m%d}_{end:%Y%m%d}.xlsx"
-        response = HttpResponse(excel_bytes, content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-        response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        return response
+        dosya_koku = f"istasyon_raporu_{facility.customer.kod}_{facility.kod}_{start:%Y%m%d}_{end:%Y%m%d}"
+        bicim = request.POST.get("bicim")
+        if bicim in AKIS_BICIMLERI:
+            # CSV / JSON: satırlar üretildikçe gönderilir
+            uretici, content_type, uzanti = AKIS_BICIMLERI[bicim]
+            response = StreamingHttpResponse(
+                uretici(get_istasyon_raporu_data(facility_id, start, end, hucreler=False)), content_type=content_type,
+            )
+            response["Content-Disposition"] = f'attachment; filename="{dosya_koku}_{uzanti}"'
+            return response
+        filename = f"{dosya_koku}.xlsx"
+        # write_only çalışma kitabı geçici dosyaya yazılır; yanıt dosyadan parça parça okunur
+        tmp = tempfile.TemporaryFile()
+        write_istasyon_raporu_excel(get_istasyon_raporu_data(facility_id, start, end, hucreler=False), tmp)
+        tmp.seek(0)
+        return FileResponse(
+            tmp,
+            as_attachment=True,
+            filename=filename,
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
     context = {
         **admin.site.each_context(request),
         "title": "İstasyon Raporu",
@@ -0,0 +1,145 @@
+"""
+Ekip günlük rota planlaması. Ekibin bir güne planlanmış talepleri tesis bazında duraklara ayrılır ve duraklar
+yerel mesafe matrisine göre en yakın komşu + 2-opt sezgiseliyle sıralanır (harici harita servisi kullanılmaz).
+Mesafe önce TesisMesafesi tablosundan alınır; girilmemişse tesis koordinatlarından kuş uçuşu × YOL_KATSAYISI.
+"""
+import math
+
+from .models import Talep, TesisMesafesi
+
+DUNYA_YARICAPI_KM = 6371.0
+# Kuş uçuşu mesafeden yaklaşık yol mesafesine çarpan
+YOL_KATSAYISI = 1.3
+# Mesafesi de koordinatı da olmayan çiftler için ceza mesafesi (bu duraklar rotanın sonuna itilir)
+BILINMEYEN_MESAFE_KM = 1000.0
+
+
+def kus_ucusu_km(tesis1, tesis2):
+    """İki tesis arasındaki kuş uçuşu mesafe (haversine, km); koordinatı eksikse None."""
+    if None in (tesis1.enlem, tesis1.boylam, tesis2.enlem, tesis2.boylam):
+        return None
+    enlem1, boylam1, enlem2, boylam2 = map(
+        math.radians, (float(tesis1.enlem), float(tesis1.boylam), float(tesis2.enlem), float(tesis2.boylam))
+    )
+    a = (
+        math.sin((enlem2 - enlem1) / 2) ** 2
+        + math.cos(enlem1) * math.cos(enlem2) * math.sin((boylam2 - boylam1) / 2) ** 2
+    )
+    return 2 * DUNYA_YARICAPI_KM * math.asin(math.sqrt(a))
+
+
+def mesafe_matrisi(tesisler):
+    """
+    Tesisler için simetrik n×n mesafe matrisi (km) ve mesafesi bilinmeyen çift sayısı. Kayıtlı mesafeler tek sorguyla okunur.
+    """
+    ids = [t.pk for t in tesisler]
+    kayitli = {
+        (kaynak_id, hedef_id): float(km)
+        for kaynak_id, hedef_id, km in TesisMesafesi.objects.filter(
+            kaynak_id__in=ids, hedef_id__in=ids,
+        ).values_list("kaynak_id", "hedef_id", "mesafe_km")
+    } if len(ids) > 1 else {}
+    n = len(tesisler)
+    matris = [[0.0] * n for _ in range(n)]
+    eksik = 0
+    for i in range(n):
+        for j in range(i + 1, n):
+            a, b = tesisler[i], tesisler[j]
+            km = kayitli.get((a.pk, b.pk), kayitli.get((b.pk, a.pk)))
+            if km is None:
+                km = kus_ucusu_km(a, b)
+                if km is None:
+                    km = BILINMEYEN_MESAFE_KM
+                    eksik += 1
+                else:
+                    km *= YOL_KATSAYISI
+            matris[i][j] = matris[j][i] = km
+    return matris, eksik
+
+
+def rota_uzunlugu(sira, matris):
+    return sum(matris[a][b] for a, b in zip(sira, sira[1:]))
+
+
+def en_yakin_komsu(matris, baslangic=0):
+    """baslangic durağından başlayıp her adımda en yakın ziyaret edilmemiş durağa giden sıra."""
+    kalan = set(range(len(matris))) - {baslangic}
+    sira = [baslangic]
+    while kalan:
+        son = sira[-1]
+        sonraki = min(kalan, key=lambda j: (matris[son][j], j))
+        sira.append(sonraki)
+        kalan.remove(sonraki)
+    return sira
+
+
+def iki_opt(sira, matris):
+    """
+    Açık rota (dönüşsüz) için 2-opt: rotayı kısaltan ters çevrilebilir bir bölüm kalmayana kadar
+    sira[i..j] bölümlerini ters çevirir.
+    """
+    sira = list(sira)
+    n = len(sira)
+    iyilesti = True
+    while iyilesti:
+        iyilesti = False
+        for i in range(n - 1):
+            for j in range(i + 1, n):
+                once = sira[i - 1] if i > 0 else None
+                sonra = sira[j + 1] if j < n - 1 else None
+                eski = (matris[once][sira[i]] if once is not None else 0) + (matris[sira[j]][sonra] if sonra is not None else 0)
+                yeni = (matris[once][sira[j]] if once is not None else 0) + (matris[sira[i]][sonra] if sonra is not None else 0)
+                if yeni < eski - 1e-9:
+                    sira[i:j + 1] = reversed(sira[i:j + 1])
+                    iyilesti = True
+    return sira
+
+
+def rota_olustur(matris):
+    """Her duraktan başlayan en yakın komşu rotasını 2-opt ile iyileştirir; en kısa olanı döndürür."""
+    if len(matris) < 2:
+        return list(range(len(matris)))
+    return min(
+        (iki_opt(en_yakin_komsu(matris, baslangic), matris) for baslangic in range(len(matris))),
+        key=lambda sira: rota_uzunlugu(sira, matris),
+    )
+
+
+def gunluk_rota(ekip, tarih):
+    """
+    Ekibin tarih gününe planlanmış taleplerinin sıralı durak listesi (sabit sayıda sorgu).
+    Döndürür: {"duraklar": [{"sira", "tesis", "talepler", "mesafe_km"}], "toplam_km", "eksik_mesafe", "tesissiz"}.
+    mesafe_km: önceki duraktan mesafe; tesissiz: tesisi belirtilmemiş (rotaya alınamayan) talepler.
+    """
+    talepler = (
+        Talep.objects.filter(planlanan_ekip=ekip, planlanan_tarih=tarih)
+        .select_related("customer", "facility", "tip")
+        .order_by("customer__kod", "facility__kod", "pk")
+    )
+    tesisler, tesis_talepleri, tesissiz = [], {}, []
+    for talep in talepler:
+        if talep.facility_id is None:
+            tesissiz.append(talep)
+            continue
+        if talep.facility_id not in tesis_talepleri:
+            tesisler.append(talep.facility)
+            tesis_talepleri[talep.facility_id] = []
+        tesis_talepleri[talep.facility_id].append(talep)
+
+    matris, eksik = mesafe_matrisi(tesisler)
+    sira = rota_olustur(matris)
+    duraklar = []
+    for n, i in enumerate(sira):
+        tesis = tesisler[i]
+        duraklar.append({
+            "sira": n + 1,
+            "tesis": tesis,
+            "talepler": tesis_talepleri[tesis.pk],
+            "mesafe_km": matris[sira[n - 1]][i] if n else None,
+        })
+    return {
+        "duraklar": duraklar,
+        "toplam_km": rota_uzunlugu(sira, matris),
+        "eksik_mesafe": eksik,
+        "tesissiz": tesissiz,
+    }
@@ -0,0 +1,88 @@
+"""
+Çekirdek sinyal alıcıları; CoreConfig.ready içinde bağlanır.
+İstasyon sayımı tekil kaydedilir / silinirse ilgili (iş kaydı, bölge) tüketim özeti yenilenir; istasyon başka bölgeye
+taşınınca eski ve yeni bölgenin özetleri, bölge başka tesise taşınınca özet satırlarının tesisi güncellenir.
+Periyod kaydedilince (pasife alma dahil) açılmış tarihleri (PeriyodTarihi) yenilenir.
+Talep silinince onu kapatan iş kayıtlarının etkin müşteri / tesisi kendi müşteri / tesislerine döner
+(SET_NULL bir SQL UPDATE olduğundan WorkRecord.save çalışmaz).
+bulk_create / update sinyal üretmediğinden toplu sayım servisleri özeti kendisi yeniler.
+Toplu iş kaydı durum geçişleri (durum_gecisleri) post_save yerine is_kaydi_durumu_degisti sinyalini gönderir.
+"""
+import django.dispatch
+from django.db.models import F, QuerySet
+
+from .models import Customer, Facility, IstasyonTuketimOzeti, Station, Talep, WorkRecord, WorkRecordStationCount, Zone
+from .periyod import periyod_tarihlerini_yenile
+from .tuketim_ozeti import ozetleri_yenile
+
+# Toplu başlat / tamamla sonrası gönderilir (sender=WorkRecord): ids (değişen iş kaydı id'leri), durum (yeni durum).
+# save() çağrılmadığından durum değişikliğine bağlanacak işler post_save yerine buradan dinlenir.
+is_kaydi_durumu_degisti = django.dispatch.Signal()
+
+# Silinmesi özet satırlarını da kaskadla silen modeller: sayımlar bunlarla birlikte silinirken yeniden hesaplama gereksiz
+_OZETI_SILEN_MODELLER = (WorkRecord, Zone, Facility, Customer)
+
+
+def _zone_id(sayim):
+    if "station" in sayim._state.fields_cache:
+        return sayim.station.zone_id
+    return Station.objects.filter(pk=sayim.station_id).values_list("zone_id", flat=True).first()
+
+
+def sayim_kaydedildi(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    ozetleri_yenile({(instance.work_record_id, _zone_id(instance))})
+
+
+def sayim_silindi(sender, instance, origin=None, **kwargs):
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if issubclass(model, _OZETI_SILEN_MODELLER):
+        return
+    ozetleri_yenile({(instance.work_record_id, _zone_id(instance))})
+
+
+def is_kaydi_kaydedildi(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """İş kaydı tarihi değişirse özet satırlarındaki kopya tarih güncellenir."""
+    if raw or created or (update_fields is not None and "tarih" not in update_fields):
+        return
+    instance.tuketim_ozetleri.exclude(tarih=instance.tarih).update(tarih=instance.tarih)
+
+
+def istasyon_kaydedilecek(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Bölge değişikliğini post_save'de görmek için kayıttaki eski bölge saklanır (bölge alanı yazılmıyorsa sorgu yok)."""
+    instance._eski_zone_id = None
+    if raw or instance.pk is None or (update_fields is not None and "zone" not in update_fields):
+        return
+    instance._eski_zone_id = Station.objects.filter(pk=instance.pk).values_list("zone_id", flat=True).first()
+
+
+def istasyon_kaydedildi(sender, instance, created=False, raw=False, **kwargs):
+    """İstasyon başka bölgeye taşındıysa sayımı olan iş kayıtlarının eski ve yeni bölge özetleri yenilenir."""
+    eski_zone_id = getattr(instance, "_eski_zone_id", None)
+    if raw or created or eski_zone_id is None or eski_zone_id == instance.zone_id:
+        return
+    wr_ids = WorkRecordStationCount.objects.filter(station=instance).values_list("work_record_id", flat=True)
+    ozetleri_yenile({(wr_id, zone_id) for wr_id in wr_ids for zone_id in (eski_zone_id, instance.zone_id)})
+
+
+def bolge_kaydedildi(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """Bölge başka tesise taşındıysa özet satırlarındaki kopya tesis güncellenir."""
+    if raw or created or (update_fields is not None and "facility" not in update_fields):
+        return
+    IstasyonTuketimOzeti.objects.filter(zone=instance).exclude(facility_id=instance.facility_id).update(
+        facility_id=instance.facility_id,
+    )
+
+
+def periyod_kaydedildi(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    periyod_tarihlerini_yenile([instance])
+
+
+def talep_silinecek(sender, instance, **kwargs):
+    """Talebi kapatan iş kayıtlarının etkin alanları, kapatilan_talep SET_NULL ile boşaltılmadan önce yenilenir."""
+    WorkRecord.objects.filter(kapatilan_talep=instance).update(
+        etkin_musteri_id=F("customer_id"), etkin_tesis_id=F("facility_id"),
+    )
@@ -1,3 +1,1432 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import json
+import random
+import re
+import shutil
+import tempfile
+from collections import defaultdict
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    faaliyet_raporu_toplu,
+    istasyon_raporu,
+    istasyon_sayim,
+    label_pdf,
+    periyod as periyod_motoru,
+    rota,
+    tuketim_ozeti,
+)
+from .durum_gecisleri import durum_gecisi
+from .faaliyet_raporu_pdf import faaliyet_raporu_verileri, generate_faaliyet_raporu_pdf, rapor_parmak_izi
+from .models import (
+    Customer,
+    Ekip,
+    FaaliyetRaporu,
+    FaaliyetRaporuIsi,
+    FaaliyetTanim,
+    Facility,
+    IlacTanim,
+    IstasyonTuketimOzeti,
+    Periyod,
+    PeriyodTarihi,
+    Station,
+    Talep,
+    TalepTipi,
+    TesisMesafesi,
+    TespitTanim,
+    UygulamaTanim,
+    WorkRecord,
+    WorkRecordFaaliyet,
+    WorkRecordIlac,
+    WorkRecordStationCount,
+    WorkRecordTespit,
+    WorkRecordUygulama,
+    Zone,
+)
+from .planlama import plan_olustur
+from .signals import is_kaydi_durumu_degisti
+
+
+class WorkRecordChangelistQueryTests(TestCase):
+    """İş kaydı listesi satır sayısından bağımsız, sabit sayıda sorguyla çizilmeli."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "x")
+        cls.customer = Customer.objects.create(kod="M1", firma_ismi="Firma")
+        cls.facility = Facility.objects.create(customer=cls.customer, kod="T1", ad="Tesis")
+        cls.ekip = Ekip.objects.create(kod="E1", ekip_lideri=cls.user, kisi_sayisi=2)
+        cls.tip = TalepTipi.objects.create(ad="Periyodik")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _kayit_ekle(self, adet):
+        baslangic = WorkRecord.objects.count()
+        for i in range(baslangic, baslangic + adet):
+            tarih = datetime.date(2026, 1, 1) + datetime.timedelta(days=i)
+            talep = Talep.objects.create(customer=self.customer, facility=self.facility, tarih=tarih, tip=self.tip)
+            wr = WorkRecord.objects.create(
+                tarih=tarih, customer=self.customer, facility=self.facility,
+                personel=self.user, ekip=self.ekip, kapatilan_talep=talep,
+            )
+            # Rapor durumlarının hepsi listede yer alsın: yok / bekliyor / hazır
+            if i % 3 == 1:
+                FaaliyetRaporu.objects.create(work_record=wr, musteri_kod="M1", is_kaydi_kod=f"WR-{wr.pk}", rapor_tarihi=tarih)
+            elif i % 3 == 2:
+                FaaliyetRaporu.objects.create(
+                    work_record=wr, musteri_kod="M1", is_kaydi_kod=f"WR-{wr.pk}", rapor_tarihi=tarih,
+                    rapor_olusturuldu=True, pdf=f"faaliyet_raporlari/WR-{wr.pk}.pdf",
+                )
+
+    def _changelist_sorgu_sayisi(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("admin:core_workrecord_changelist"))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_sorgu_sayisi_satir_sayisindan_bagimsiz(self):
+        self._kayit_ekle(3)
+        az = self._changelist_sorgu_sayisi()
+        self._kayit_ekle(27)
+        cok = self._changelist_sorgu_sayisi()
+        self.assertEqual(az, cok)
+
+
+def _tarih(ay, gun, yil=2026):
+    return datetime.date(yil, ay, gun)
+
+
+class PeriyodTarihleriTests(SimpleTestCase):
+    """periyod_tarihleri saf hesaptır; kaydedilmemiş Periyod ile veritabanısız denenir. 1 Ocak 2026 Perşembe."""
+
+    def _tarihler(self, baslangic, bitis, **alanlar):
+        alanlar.setdefault("baslangic_tarihi", _tarih(1, 1))
+        return periyod_motoru.periyod_tarihleri(Periyod(**alanlar), baslangic, bitis)
+
+    def test_gunluk_aralik(self):
+        self.assertEqual(
+            self._tarihler(_tarih(1, 5), _tarih(1, 15), siklik=Periyod.SIKLIK_GUNLUK, aralik=3),
+            [_tarih(1, 7), _tarih(1, 10), _tarih(1, 13)],
+        )
+
+    def test_gunluk_tekrar_sayisi_periyod_basindan_sayilir(self):
+        alanlar = {"siklik": Periyod.SIKLIK_GUNLUK, "tekrar_sayisi": 3}
+        self.assertEqual(self._tarihler(_tarih(1, 1), _tarih(1, 31), **alanlar), [_tarih(1, 1), _tarih(1, 2), _tarih(1, 3)])
+        self.assertEqual(self._tarihler(_tarih(1, 2), _tarih(1, 31), **alanlar), [_tarih(1, 2), _tarih(1, 3)])
+
+    def test_haftalik_secili_gunler_ve_aralik(self):
+        self.assertEqual(
+            self._tarihler(_tarih(1, 1), _tarih(1, 31), siklik=Periyod.SIKLIK_HAFTALIK, aralik=2, haftanin_gunleri="1,4"),
+            [_tarih(1, 1), _tarih(1, 12), _tarih(1, 15), _tarih(1, 26), _tarih(1, 29)],
+        )
+
+    def test_haftalik_gun_secilmezse_baslangic_gunu(self):
+        self.assertEqual(
+            self._tarihler(_tarih(1, 1), _tarih(1, 31), siklik=Periyod.SIKLIK_HAFTALIK),
+            [_tarih(1, 1), _tarih(1, 8), _tarih(1, 15), _tarih(1, 22), _tarih(1, 29)],
+        )
+
+    def test_haftalik_tekrar_sayisi_ilk_haftada_atlanan_gunleri_saymaz(self):
+        # İlk haftanın Pazartesisi (29 Aralık) başlangıçtan önce; tekrar sayısına girmez
+        alanlar = {"siklik": Periyod.SIKLIK_HAFTALIK, "haftanin_gunleri": "1,4", "tekrar_sayisi": 3}
+        self.assertEqual(self._tarihler(_tarih(1, 1), _tarih(3, 31), **alanlar), [_tarih(1, 1), _tarih(1, 5), _tarih(1, 8)])
+        self.assertEqual(self._tarihler(_tarih(1, 6), _tarih(3, 31), **alanlar), [_tarih(1, 8)])
+
+    def test_aylik_ay_sonunu_asan_gun_kirpilir_ve_kaymaz(self):
+        self.assertEqual(
+            self._tarihler(
+                _tarih(1, 1), _tarih(5, 31), siklik=Periyod.SIKLIK_AYLIK, ayin_gunu=31, baslangic_tarihi=_tarih(1, 15),
+            ),
+            [_tarih(1, 31), _tarih(2, 28), _tarih(3, 31), _tarih(4, 30), _tarih(5, 31)],
+        )
+
+    def test_aylik_gecmis_gun_sonraki_aydan_baslar(self):
+        self.assertEqual(
+            self._tarihler(
+                _tarih(1, 1), _tarih(12, 31), siklik=Periyod.SIKLIK_AYLIK, ayin_gunu=10,
+                baslangic_tarihi=_tarih(1, 20), tekrar_sayisi=2,
+            ),
+            [_tarih(2, 10), _tarih(3, 10)],
+        )
+
+    def test_yillik_subat_29_artik_olmayan_yilda_kirpilir(self):
+        self.assertEqual(
+            self._tarihler(
+                _tarih(1, 1, 2027), _tarih(12, 31, 2032), siklik=Periyod.SIKLIK_YILLIK, ay=2, ayin_gunu=29,
+                baslangic_tarihi=_tarih(3, 1, 2027),
+            ),
+            [_tarih(2, 29, 2028), _tarih(2, 28, 2029), _tarih(2, 28, 2030), _tarih(2, 28, 2031), _tarih(2, 29, 2032)],
+        )
+
+    def test_bitis_tarihi(self):
+        alanlar = {"siklik": Periyod.SIKLIK_GUNLUK, "bitis_tarihi": _tarih(1, 5)}
+        self.assertEqual(self._tarihler(_tarih(1, 1), _tarih(1, 31), **alanlar), [_tarih(1, d) for d in range(1, 6)])
+        self.assertEqual(self._tarihler(_tarih(1, 6), _tarih(1, 31), **alanlar), [])
+
+
+class PeriyodTalepleriOlusturTests(TestCase):
+    """Oluşturulan sayısı yalnızca eklenen talepleri saymalı; araya girenler mevcut sayılır."""
+
+    @classmethod
+    def setUpTestData(cls):
+        customer = Customer.objects.create(kod="M1", firma_ismi="Firma")
+        cls.periyod = Periyod.objects.create(
+            customer=customer, talep_tipi=TalepTipi.objects.create(ad="Periyodik"),
+            baslangic_tarihi=_tarih(1, 1), siklik=Periyod.SIKLIK_GUNLUK,
+        )
+
+    def _olustur(self):
+        return periyod_motoru.periyod_talepleri_olustur(_tarih(1, 1), _tarih(1, 10), periyodlar=[self.periyod])
+
+    def test_tekrar_calistirmak_talep_olusturmaz(self):
+        self.assertEqual(self._olustur()["olusturulan"], 10)
+        sonuc = self._olustur()
+        self.assertEqual((sonuc["olusturulan"], sonuc["mevcut"]), (0, 10))
+        self.assertEqual(Talep.objects.filter(periyod=self.periyod).count(), 10)
+
+    def test_eszamanli_eklenen_talep_olusturulan_sayilmaz(self):
+        gercek = periyod_motoru.periyod_tarihleri
+
+        def araya_giren(periyod, baslangic, bitis):
+            # Mevcut talepler okunduktan sonra başka bir çalışma aynı tarihi ekler
+            Talep.objects.create(
+                periyod=periyod, customer_id=periyod.customer_id, tip_id=periyod.talep_tipi_id, tarih=_tarih(1, 3),
+            )
+            return gercek(periyod, baslangic, bitis)
+
+        with mock.patch.object(periyod_motoru, "periyod_tarihleri", araya_giren):
+            sonuc = self._olustur()
+        self.assertEqual((sonuc["olusturulan"], sonuc["mevcut"]), (9, 1))
+        self.assertEqual(Talep.objects.filter(periyod=self.periyod).count(), 10)
+
+
+class PeriyodTarihleriniYenileTests(TestCase):
+    """Açılmış tarihler [bugün, bugün + UFUK_GUN) ufkunun dışına taşmamalı."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(kod="M1", firma_ismi="Firma")
+
+    def _periyod(self, **alanlar):
+        alanlar = {"baslangic_tarihi": _tarih(1, 1), "siklik": Periyod.SIKLIK_GUNLUK, **alanlar}
+        return Periyod.objects.create(customer=self.customer, **alanlar)
+
+    def _tarihler(self, periyod):
+        return list(PeriyodTarihi.objects.filter(periyod=periyod).order_by("tarih").values_list("tarih", flat=True))
+
+    def test_ufuk_disina_tasmaz(self):
+        periyod = self._periyod()
+        bugun = _tarih(3, 1)
+        self.assertEqual(periyod_motoru.periyod_tarihlerini_yenile([periyod], bugun=bugun), periyod_motoru.UFUK_GUN)
+        tarihler = self._tarihler(periyod)
+        self.assertEqual(len(tarihler), periyod_motoru.UFUK_GUN)
+        self.assertEqual(tarihler[0], bugun)
+        self.assertEqual(tarihler[-1], bugun + datetime.timedelta(days=periyod_motoru.UFUK_GUN - 1))
+
+    def test_tam_yenileme_ufku_kaydirir(self):
+        periyod = self._periyod(bitis_tarihi=_tarih(2, 28, yil=2027))
+        periyod_motoru.periyod_tarihlerini_yenile(bugun=_tarih(1, 1))
+        periyod_motoru.periyod_tarihlerini_yenile(bugun=_tarih(1, 1, yil=2027))
+        tarihler = self._tarihler(periyod)
+        self.assertEqual((tarihler[0], tarihler[-1]), (_tarih(1, 1, yil=2027), _tarih(2, 28, yil=2027)))
+        self.assertEqual(len(tarihler), 59)
+
+    def test_kaydetmek_yalnizca_o_periyodu_yeniler(self):
+        with mock.patch.object(timezone, "localdate", return_value=_tarih(1, 1)):
+            diger = self._periyod(siklik=Periyod.SIKLIK_HAFTALIK)
+            periyod = self._periyod()
+        diger_sayisi = len(self._tarihler(diger))
+        self.assertEqual(len(self._tarihler(periyod)), periyod_motoru.UFUK_GUN)
+        periyod.aktif = False
+        with mock.patch.object(timezone, "localdate", return_value=_tarih(1, 1)):
+            periyod.save()
+        self.assertEqual(self._tarihler(periyod), [])
+        self.assertEqual(len(self._tarihler(diger)), diger_sayisi)
+        self.assertTrue(diger_sayisi)
+
+
+class PlanOlusturTests(SimpleTestCase):
+    """plan_olustur veritabanına erişmez; kaydedilmemiş Ekip / Talep ile denenir. 3 Ocak 2026 Cumartesi."""
+
+    def _ekipler(self, *kisi_sayilari):
+        return [Ekip(pk=i, kod=f"E{i}", kisi_sayisi=kisi) for i, kisi in enumerate(kisi_sayilari, start=1)]
+
+    def _talepler(self, adet, tarih, customer_id=None):
+        # customer_id verilmezse her talep ayrı müşteriye ait (gruplanmaz)
+        return [
+            Talep(customer_id=customer_id or 100 + i, facility_id=None, tarih=tarih, durum="beklemede")
+            for i in range(adet)
+        ]
+
+    def _gunluk(self, atananlar):
+        sayilar = defaultdict(int)
+        for talep in atananlar:
+            sayilar[(talep.planlanan_tarih, talep.planlanan_ekip.pk)] += 1
+        return dict(sayilar)
+
+    def test_ekip_kapasitesi_asilmaz(self):
+        atananlar, atanamayanlar = plan_olustur(self._talepler(5, _tarih(1, 5)), self._ekipler(1), _tarih(1, 5), 3)
+        self.assertEqual(self._gunluk(atananlar), {(_tarih(1, 5), 1): 2, (_tarih(1, 6), 1): 2, (_tarih(1, 7), 1): 1})
+        self.assertEqual(atanamayanlar, [])
+        self.assertTrue(all(t.durum == "planlandi" for t in atananlar))
+
+    def test_mevcut_yuk_dusulur_ve_sigmayanlar_atanamaz(self):
+        atananlar, atanamayanlar = plan_olustur(
+            self._talepler(4, _tarih(1, 5)), self._ekipler(1), _tarih(1, 5), 2, mevcut_yuk={(_tarih(1, 5), 1): 1},
+        )
+        self.assertEqual(self._gunluk(atananlar), {(_tarih(1, 5), 1): 1, (_tarih(1, 6), 1): 2})
+        self.assertEqual(len(atanamayanlar), 1)
+        self.assertIsNone(atanamayanlar[0].planlanan_tarih)
+
+    def test_pazar_planlanmaz(self):
+        atananlar, _ = plan_olustur(self._talepler(5, _tarih(1, 3)), self._ekipler(1), _tarih(1, 3), 4)
+        self.assertEqual(self._gunluk(atananlar), {(_tarih(1, 3), 1): 2, (_tarih(1, 5), 1): 2, (_tarih(1, 6), 1): 1})
+
+    def test_talep_tarihinden_once_planlanmaz(self):
+        atananlar, _ = plan_olustur(self._talepler(1, _tarih(1, 7)), self._ekipler(1), _tarih(1, 5), 5)
+        self.assertEqual(atananlar[0].planlanan_tarih, _tarih(1, 7))
+
+    def test_ayni_tesis_grubu_bolunmeden_ayni_ekibe_ve_gune_gider(self):
+        # Pazartesi iki ekipte de tek yer var; 2 kişilik grup bölünmez, Salı aynı ekibe gider
+        atananlar, _ = plan_olustur(
+            self._talepler(2, _tarih(1, 5), customer_id=1), self._ekipler(1, 1), _tarih(1, 5), 2,
+            mevcut_yuk={(_tarih(1, 5), 1): 1, (_tarih(1, 5), 2): 1},
+        )
+        self.assertEqual(len(self._gunluk(atananlar)), 1)
+        self.assertEqual(atananlar[0].planlanan_tarih, _tarih(1, 6))
+
+    def test_en_buyuk_kapasiteyi_asan_grup_bolunur(self):
+        atananlar, atanamayanlar = plan_olustur(
+            self._talepler(3, _tarih(1, 5), customer_id=1), self._ekipler(1), _tarih(1, 5), 2,
+        )
+        self.assertEqual(self._gunluk(atananlar), {(_tarih(1, 5), 1): 2, (_tarih(1, 6), 1): 1})
+        self.assertEqual(atanamayanlar, [])
+
+    def test_kisi_sayisi_olmayan_ekip_planlanmaz(self):
+        talepler = self._talepler(2, _tarih(1, 5))
+        self.assertEqual(plan_olustur(talepler, self._ekipler(0), _tarih(1, 5), 5), ([], talepler))
+
+
+class IstasyonListesiTests(TestCase):
+    """Tesis istasyon listesi ETag ile doğrulanır; değişmediyse 304, istasyon eklenince yeni ETag."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "x")
+        customer = Customer.objects.create(kod="M1", firma_ismi="Firma")
+        cls.facility = Facility.objects.create(customer=customer, kod="T1", ad="Tesis")
+        cls.zone = Zone.objects.create(facility=cls.facility, kod="B1", ad="Bölge")
+        Station.objects.create(zone=cls.zone, kod="1", ad="İstasyon 1")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse("admin:core_facility_istasyon_listesi", args=[self.facility.pk])
+
+    def test_liste_ve_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["ETag"])
+        veri = response.json()
+        self.assertEqual(list(veri["istasyonlar"]), ["M1-T1-B1-1"])
+        self.assertEqual(veri["bolgeler"][str(self.zone.pk)], ["B1", "Bölge"])
+
+    def test_degismediyse_304(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+    def test_istasyon_eklenince_etag_degisir(self):
+        etag = self.client.get(self.url)["ETag"]
+        Station.objects.create(zone=self.zone, kod="2", ad="İstasyon 2")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.json()["istasyonlar"]), 2)
+
+
+def _pdf_sayfa_sayisi(pdf):
+    """PDF'teki sayfa nesnesi sayısı (/Type /Page; /Pages kökü sayılmaz)."""
+    return len(re.findall(rb"/Type /Page\b", pdf))
+
+
+class EtiketPdfTests(SimpleTestCase):
+    """Etiket PDF'leri kaydedilmemiş Station nesneleriyle veritabanısız üretilir."""
+
+    def _istasyonlar(self, adet):
+        zone = Zone(kod="B1", ad="Bölge")
+        return [Station(pk=i, zone=zone, kod=str(i), ad=f"İstasyon {i}", benzersiz_kod=f"M1-T1-B1-{i}") for i in range(1, adet + 1)]
+
+    def test_her_etiket_ayri_sayfa(self):
+        buf = io.BytesIO()
+        label_pdf.write_station_labels_pdf(self._istasyonlar(3), buf, chunk_size=2)
+        pdf = buf.getvalue()
+        self.assertTrue(pdf.startswith(b"%PDF-"))
+        self.assertTrue(pdf.rstrip().endswith(b"%%EOF"))
+        self.assertEqual(_pdf_sayfa_sayisi(pdf), 3)
+
+    def test_istasyon_yoksa_bos_pdf(self):
+        pdf = label_pdf.generate_station_labels_pdf([])
+        self.assertTrue(pdf.startswith(b"%PDF-"))
+        self.assertLessEqual(_pdf_sayfa_sayisi(pdf), 1)
+
+    def test_qr_a_sigmayan_kod_metinle_basilir(self):
+        istasyon = self._istasyonlar(1)[0]
+        istasyon.benzersiz_kod = "X" * 5000
+        with self.assertLogs("core.label_pdf", level="WARNING"):
+            pdf = label_pdf.generate_station_labels_pdf([istasyon])
+        self.assertEqual(_pdf_sayfa_sayisi(pdf), 1)
+
+    def test_a4_sayfa_duzenleri(self):
+        for layout, sayfa_basi in (("2x10", 20), ("3x8", 24)):
+            with self.subTest(layout=layout):
+                pdf = label_pdf.generate_station_label_sheets_pdf(self._istasyonlar(sayfa_basi + 1), layout=layout)
+                self.assertTrue(pdf.startswith(b"%PDF-"))
+                self.assertEqual(_pdf_sayfa_sayisi(pdf), 2)
+                self.assertIn(b"/MediaBox [ 0 0 595.2756 841.8898 ]", pdf)
+                tam = label_pdf.generate_station_label_sheets_pdf(self._istasyonlar(sayfa_basi), layout=layout)
+                self.assertEqual(_pdf_sayfa_sayisi(tam), 1)
+
+    def test_bilinmeyen_duzen_reddedilir(self):
+        with self.assertRaises(ValueError):
+            label_pdf.generate_station_label_sheets_pdf(self._istasyonlar(1), layout="4x4")
+
+    def _boyanan_moduller(self, ops):
+        """_qr_ops çıktısındaki 're' dikdörtgenlerinin kapladığı (sütun, satır) modülleri."""
+        moduller = []
+        for satir in ops.splitlines():
+            if satir.endswith(" re"):
+                x, y, w, h = (int(v) for v in satir.split()[:4])
+                moduller.extend((x + i, y + j) for i in range(w) for j in range(h))
+        return moduller
+
+    def test_birlestirilmis_run_ayni_modulleri_boyar(self):
+        for kod in ("M1-T1-B1-42", "M001-T01-B01-1234567890"):
+            with self.subTest(kod=kod):
+                ayri, birlesik = self._run_karsilastir(label_pdf._encode_qr(kod))
+                self.assertLess(birlesik.count(" re") * 2, ayri.count(" re"))
+
+    def test_dikey_birlestirme(self):
+        matrix = ((1, 1, 0), (1, 1, 0), (0, 1, 1), (1, 1, 0))
+        self.assertEqual(label_pdf._qr_ops(matrix).splitlines(), ["0 0 2 2 re", "1 2 2 1 re", "0 3 2 1 re", "f"])
+        self._run_karsilastir(matrix)
+
+    def _run_karsilastir(self, matrix):
+        koyu = {(c, r) for r, row in enumerate(matrix) for c, dark in enumerate(row) if dark}
+        ayri = label_pdf._qr_ops(matrix, merge_runs=False)
+        birlesik = label_pdf._qr_ops(matrix, merge_runs=True)
+        for ops in (ayri, birlesik):
+            moduller = self._boyanan_moduller(ops)
+            self.assertEqual(len(moduller), len(set(moduller)))
+            self.assertEqual(set(moduller), koyu)
+            self.assertTrue(ops.endswith("\nf"))
+        return ayri, birlesik
+
+
+class TakilanIsleriKapatTests(TestCase):
+    """
+    ZAMAN_ASIMI_DAKIKA boyunca ilerleme yazmayan çalışan işler Hata olarak kapatılır; bekleyen işler yalnızca
+    sıra ilerlemiyorsa.
+    """
+
+    def _is(self, durum, guncellendi_dk=None, olusturma_dk=0):
+        simdi = timezone.now()
+        rapor_isi = FaaliyetRaporuIsi.objects.create(durum=durum, mesaj="Önceki")
+        FaaliyetRaporuIsi.objects.filter(pk=rapor_isi.pk).update(
+            created_at=simdi - datetime.timedelta(minutes=olusturma_dk),
+            guncellendi=simdi - datetime.timedelta(minutes=guncellendi_dk) if guncellendi_dk is not None else None,
+        )
+        return rapor_isi.pk
+
+    def test_yalnizca_zaman_asimina_ugrayan_isler_kapanir(self):
+        asim = faaliyet_raporu_toplu.ZAMAN_ASIMI_DAKIKA + 1
+        takilan_calisan = self._is(FaaliyetRaporuIsi.DURUM_CALISIYOR, guncellendi_dk=asim)
+        takilan_bekleyen = self._is(FaaliyetRaporuIsi.DURUM_BEKLIYOR, olusturma_dk=asim)
+        ilerleyen = self._is(FaaliyetRaporuIsi.DURUM_CALISIYOR, guncellendi_dk=1, olusturma_dk=asim)
+        yeni = self._is(FaaliyetRaporuIsi.DURUM_BEKLIYOR)
+        biten = self._is(FaaliyetRaporuIsi.DURUM_TAMAMLANDI, guncellendi_dk=asim)
+
+        self.assertEqual(faaliyet_raporu_toplu.takilan_isleri_kapat(), 1)
+        durumlar = dict(FaaliyetRaporuIsi.objects.values_list("pk", "durum"))
+        self.assertEqual(durumlar[takilan_calisan], FaaliyetRaporuIsi.DURUM_HATA)
+        # İlerleyen işin arkasında sırada bekliyor
+        self.assertEqual(durumlar[takilan_bekleyen], FaaliyetRaporuIsi.DURUM_BEKLIYOR)
+        self.assertEqual(durumlar[ilerleyen], FaaliyetRaporuIsi.DURUM_CALISIYOR)
+        self.assertEqual(durumlar[yeni], FaaliyetRaporuIsi.DURUM_BEKLIYOR)
+        self.assertEqual(durumlar[biten], FaaliyetRaporuIsi.DURUM_TAMAMLANDI)
+        kapanan = FaaliyetRaporuIsi.objects.get(pk=takilan_calisan)
+        self.assertTrue(kapanan.mesaj.startswith("Önceki\nİş yarıda kaldı"))
+        self.assertIsNotNone(kapanan.bitis)
+        self.assertEqual(faaliyet_raporu_toplu.takilan_isleri_kapat(), 0)
+
+    def test_sira_ilerlemiyorsa_bekleyen_kapanir(self):
+        asim = faaliyet_raporu_toplu.ZAMAN_ASIMI_DAKIKA + 1
+        takilan_bekleyen = self._is(FaaliyetRaporuIsi.DURUM_BEKLIYOR, olusturma_dk=asim)
+        yeni = self._is(FaaliyetRaporuIsi.DURUM_BEKLIYOR)
+        self.assertEqual(faaliyet_raporu_toplu.takilan_isleri_kapat(), 1)
+        kapanan = FaaliyetRaporuIsi.objects.get(pk=takilan_bekleyen)
+        self.assertEqual(kapanan.durum, FaaliyetRaporuIsi.DURUM_HATA)
+        self.assertIn("faaliyet_raporu_isleri", kapanan.mesaj)
+        self.assertEqual(FaaliyetRaporuIsi.objects.get(pk=yeni).durum, FaaliyetRaporuIsi.DURUM_BEKLIYOR)
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(prefix="faaliyet-raporu-isci-test-"),
+    FAALIYET_RAPORU_SURECLERI=1,
+    FAALIYET_RAPORU_CALISTIRICI="komut",
+)
+class FaaliyetRaporuIsciTests(TestCase):
+    """Toplu rapor işi web isteğinde çalışmaz: sıraya alınır, faaliyet_raporu_isleri komutu çalıştırır."""
+
+    @classmethod
+    def setUpTestData(cls):
+        customer = Customer.objects.create(kod="M1", firma_ismi="Firma")
+        facility = Facility.objects.create(customer=customer, kod="T1", ad="Tesis")
+        user = get_user_model().objects.create_user("personel")
+        cls.ids = [
+            WorkRecord.objects.create(tarih=_tarih(1, gun), customer=customer, facility=facility, personel=user).pk
+            for gun in (1, 2)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_is_siraya_alinir_ve_komutla_calisir(self):
+        with (
+            mock.patch.object(faaliyet_raporu_toplu.threading, "Thread") as thread,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            rapor_isi = faaliyet_raporu_toplu.toplu_rapor_isi_baslat(self.ids)
+        thread.assert_not_called()
+        rapor_isi.refresh_from_db()
+        self.assertEqual((rapor_isi.durum, rapor_isi.is_kayitlari), (FaaliyetRaporuIsi.DURUM_BEKLIYOR, self.ids))
+
+        cikti = io.StringIO()
+        call_command("faaliyet_raporu_isleri", stdout=cikti)
+        rapor_isi.refresh_from_db()
+        self.assertEqual((rapor_isi.durum, rapor_isi.tamamlanan, rapor_isi.hatali), (FaaliyetRaporuIsi.DURUM_TAMAMLANDI, 2, 0))
+        self.assertEqual(FaaliyetRaporu.objects.filter(work_record_id__in=self.ids, rapor_olusturuldu=True).count(), 2)
+        self.assertIn(f"Rapor işi #{rapor_isi.pk}", cikti.getvalue())
+
+    def test_is_bir_kez_alinir(self):
+        ilk = faaliyet_raporu_toplu.toplu_rapor_isi_baslat(self.ids[:1])
+        ikinci = faaliyet_raporu_toplu.toplu_rapor_isi_baslat(self.ids[1:])
+        self.assertEqual(faaliyet_raporu_toplu.isi_al().pk, ilk.pk)
+        self.assertIsNone(faaliyet_raporu_toplu.isi_al(ilk.pk))
+        self.assertEqual(faaliyet_raporu_toplu.isi_al().pk, ikinci.pk)
+        self.assertIsNone(faaliyet_raporu_toplu.isi_al())
+
+    @override_settings(FAALIYET_RAPORU_CALISTIRICI="thread")
+    def test_thread_modunda_commit_sonrasi_baslar(self):
+        with (
+            mock.patch.object(faaliyet_raporu_toplu.threading, "Thread") as thread,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            rapor_isi = faaliyet_raporu_toplu.toplu_rapor_isi_baslat(self.ids)
+        self.assertEqual(thread.call_args.kwargs["args"], (rapor_isi.pk,))
+        thread.return_value.start.assert_called_once_with()
+
+    def test_surec_sayisi_varsayilan_cpu_sayisi(self):
+        with mock.patch.object(faaliyet_raporu_toplu.os, "cpu_count", return_value=4):
+            with override_settings(FAALIYET_RAPORU_SURECLERI=0):
+                self.assertEqual(faaliyet_raporu_toplu.surec_sayisi(), 4)
+            with override_settings(FAALIYET_RAPORU_SURECLERI=2):
+                self.assertEqual(faaliyet_raporu_toplu.surec_sayisi(), 2)
+
+
+class FaaliyetRaporuVerileriTests(TestCase):
+    """Faaliyet raporu veri modelleri kayıt sayısından bağımsız, sabit sayıda sorguyla yüklenir."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "x")
+        cls.customer = Customer.objects.create(kod="M1", firma_ismi="Firma")
+        cls.facility = Facility.objects.create(customer=cls.customer, kod="T1", ad="Tesis")
+        cls.ekip = Ekip.objects.create(kod="E1", ekip_lideri=cls.user, kisi_sayisi=2)
+        cls.zone = Zone.objects.create(facility=cls.facility, kod="B1", ad="Bölge")
+        cls.stations = [Station.objects.create(zone=cls.zone, kod=str(i), ad=f"İstasyon {i}") for i in range(3)]
+        cls.tespit = TespitTanim.objects.create(ad="Fare")
+        cls.uygulama = UygulamaTanim.objects.create(ad="Pülverizasyon")
+        cls.faaliyet = FaaliyetTanim.objects.create(ad="Yem istasyonu")
+        cls.ilac = IlacTanim.objects.create(ticari_ismi="İlaç")
+
+    def _kayit_ekle(self, adet):
+        ids = []
+        for i in range(adet):
+            wr = WorkRecord.objects.create(
+                tarih=_tarih(1, 1) + datetime.timedelta(days=i), customer=self.customer, facility=self.facility,
+                personel=self.user, ekip=self.ekip,
+            )
+            WorkRecordTespit.objects.create(work_record=wr, tespit_tanim=self.tespit)
+            WorkRecordUygulama.objects.create(work_record=wr, uygulama_tanim=self.uygulama)
+            WorkRecordFaaliyet.objects.create(work_record=wr, faaliyet_tanim=self.faaliyet, kontrol=True)
+            WorkRecordIlac.objects.create(work_record=wr, ilac_tanim=self.ilac, miktar=2)
+            WorkRecordStationCount.objects.bulk_create(
+                WorkRecordStationCount(work_record=wr, station=st, tuketim_var=bool(j % 2))
+                for j, st in enumerate(self.stations)
+            )
+            ids.append(wr.pk)
+        return ids
+
+    def _sorgu_sayisi(self, ids):
+        with CaptureQueriesContext(connection) as ctx:
+            kayitlar = faaliyet_raporu_verileri(WorkRecord.objects.filter(pk__in=ids))
+        self.assertEqual(len(kayitlar), len(ids))
+        return len(ctx.captured_queries)
+
+    def test_sorgu_sayisi_kayit_sayisindan_bagimsiz(self):
+        az = self._sorgu_sayisi(self._kayit_ekle(1))
+        cok = self._sorgu_sayisi(self._kayit_ekle(10))
+        self.assertEqual(az, cok)
+
+    def test_pdf_kayitli_veriden_sorgusuz_uretilir(self):
+        (_, veri), = faaliyet_raporu_verileri(WorkRecord.objects.filter(pk__in=self._kayit_ekle(1)))
+        with CaptureQueriesContext(connection) as ctx:
+            pdf = generate_faaliyet_raporu_pdf(veri)
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertTrue(pdf.startswith(b"%PDF-"))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix="faaliyet-raporu-test-"))
+class FaaliyetRaporuParmakIziTests(TestCase):
+    """Parmak izi aynı veride sabit, veri değişince farklı; güncel rapor yeniden üretilmeden kayıtlı dosyadan gönderilir."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "x")
+        customer = Customer.objects.create(kod="M1", firma_ismi="Firma")
+        cls.wr = WorkRecord.objects.create(
+            tarih=_tarih(1, 1), customer=customer, facility=Facility.objects.create(customer=customer, kod="T1", ad="Tesis"),
+            personel=cls.user,
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse("admin:core_workrecord_faaliyet_raporu_pdf", args=[self.wr.pk])
+
+    def _parmak_izi(self):
+        (_, veri), = faaliyet_raporu_verileri(WorkRecord.objects.filter(pk=self.wr.pk))
+        return rapor_parmak_izi(veri)
+
+    def test_parmak_izi_kararli_ve_veriyle_degisir(self):
+        ilk = self._parmak_izi()
+        self.assertEqual(ilk, self._parmak_izi())
+        WorkRecord.objects.filter(pk=self.wr.pk).update(sozlesme_disi_islem_var=True)
+        self.assertNotEqual(ilk, self._parmak_izi())
+
+    def test_parmak_izi_sablon_surumuyle_degisir(self):
+        ilk = self._parmak_izi()
+        with mock.patch("core.faaliyet_raporu_pdf.SABLON_SURUMU", 999):
+            self.assertNotEqual(ilk, self._parmak_izi())
+
+    def test_guncel_rapor_kayitli_dosyadan_gonderilir(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        ilk_pdf = response.content
+        rapor = FaaliyetRaporu.objects.get(work_record=self.wr)
+        self.assertEqual(rapor.parmak_izi, self._parmak_izi())
+
+        with mock.patch("core.admin.generate_faaliyet_raporu_pdf") as uret:
+            response = self.client.get(self.url)
+            self.assertEqual(b"".join(response.streaming_content), ilk_pdf)
+        uret.assert_not_called()
+        self.assertIn("attachment", response["Content-Disposition"])
+
+    def test_veri_degisince_yeniden_uretilir_ve_eski_dosya_silinir(self):
+        self.client.get(self.url)
+        eski = FaaliyetRaporu.objects.get(work_record=self.wr).pdf.name
+        WorkRecord.objects.filter(pk=self.wr.pk).update(skb=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        rapor = FaaliyetRaporu.objects.get(work_record=self.wr)
+        self.assertNotEqual(rapor.pdf.name, eski)
+        self.assertFalse(rapor.pdf.storage.exists(eski))
+        self.assertTrue(rapor.pdf.storage.exists(rapor.pdf.name))
+
+
+class IstasyonSayimTestMixin:
+    """İki tesisli sayım fikstürü: self.stations T1'de (iki bölge), self.baska_station T2'de."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "x")
+        customer = Customer.objects.create(kod="M1", firma_ismi="Firma")
+        cls.facility = Facility.objects.create(customer=customer, kod="T1", ad="Tesis")
+        cls.zones = [Zone.objects.create(facility=cls.facility, kod=f"B{i}", ad=f"Bölge {i}") for i in (1, 2)]
+        cls.stations = [
+            Station.objects.create(zone=cls.zones[i % 2], kod=str(i), ad=f"İstasyon {i}") for i in range(6)
+        ]
+        baska_tesis = Facility.objects.create(customer=customer, kod="T2", ad="Başka tesis")
+        cls.baska_station = Station.objects.create(
+            zone=Zone.objects.create(facility=baska_tesis, kod="B1", ad="Bölge"), kod="1", ad="Başka",
+        )
+        cls.wr = WorkRecord.objects.create(tarih=_tarih(1, 1), customer=customer, facility=cls.facility, personel=cls.user)
+
+    def _sayimlar(self):
+        return {
+            station_id: (tuketim_var, not_alani)
+            for station_id, tuketim_var, not_alani in WorkRecordStationCount.objects.filter(
+                work_record=self.wr,
+            ).values_list("station_id", "tuketim_var", "not_alani")
+        }
+
+
+class SayimlariKaydetTests(IstasyonSayimTestMixin, TestCase):
+
+    def test_olusturulan_guncellenen_degismeyen(self):
+        s0, s1, s2 = (st.pk for st in self.stations[:3])
+        sonuc = istasyon_sayim.sayimlari_kaydet(self.wr, {s0: (True, "not"), s1: (False, "")}, facility=self.facility)
+        self.assertEqual(
+            {k: sonuc[k] for k in ("olusturulan", "guncellenen", "degismeyen", "gecersiz")},
+            {"olusturulan": 2, "guncellenen": 0, "degismeyen": 0, "gecersiz": 0},
+        )
+
+        sonuc = istasyon_sayim.sayimlari_kaydet(
+            self.wr, {s0: (True, " not "), s1: (True, ""), s2: (False, "")}, facility=self.facility,
+        )
+        self.assertEqual(
+            {k: sonuc[k] for k in ("olusturulan", "guncellenen", "degismeyen", "gecersiz")},
+            {"olusturulan": 1, "guncellenen": 1, "degismeyen": 1, "gecersiz": 0},
+        )
+        self.assertEqual(sonuc["durumlar"], {s0: "degismedi", s1: "guncellendi", s2: "olusturuldu"})
+        self.assertEqual(self._sayimlar(), {s0: (True, "not"), s1: (True, ""), s2: (False, "")})
+
+    def test_baska_tesisin_istasyonu_gecersiz(self):
+        s0 = self.stations[0].pk
+        sonuc = istasyon_sayim.sayimlari_kaydet(
+            self.wr, {s0: (True, ""), self.baska_station.pk: (True, "")}, facility=self.facility,
+        )
+        self.assertEqual((sonuc["olusturulan"], sonuc["gecersiz"]), (1, 1))
+        self.assertEqual(list(self._sayimlar()), [s0])
+
+    def test_sorgu_sayisi_istasyon_sayisindan_bagimsiz(self):
+        def sorgu_sayisi(stations, tuketim_var):
+            with CaptureQueriesContext(connection) as ctx:
+                istasyon_sayim.sayimlari_kaydet(
+                    self.wr, {st.pk: (tuketim_var, "") for st in stations}, facility=self.facility,
+                )
+            return len(ctx.captured_queries)
+
+        self.assertEqual(sorgu_sayisi(self.stations[:1], True), sorgu_sayisi(self.stations, True))
+        self.assertEqual(sorgu_sayisi(self.stations[:1], False), sorgu_sayisi(self.stations, False))
+
+
+class SayimOzetiTests(IstasyonSayimTestMixin, TestCase):
+    """Sayım özeti ve istasyon listesi istasyon sayısından bağımsız olarak tek sorguyla okunur."""
+
+    def setUp(self):
+        # B1: 0, 2, 4 (ikisi girildi, biri tüketim var); B2: 1, 3, 5 (biri girildi)
+        s = self.stations
+        istasyon_sayim.sayimlari_kaydet(self.wr, {s[0].pk: (True, "x"), s[2].pk: (False, ""), s[1].pk: (False, "")})
+
+    def test_ozet(self):
+        with self.assertNumQueries(1):
+            ozet = istasyon_sayim.sayim_ozeti(self.wr, self.facility, str(self.zones[0].pk))
+        self.assertEqual(ozet["tesis"], {"toplam": 6, "girilen": 3, "kalan": 3, "tuketim_var": 1})
+        self.assertEqual(ozet["bolge"], {"toplam": 3, "girilen": 2, "kalan": 1, "tuketim_var": 1})
+        self.assertEqual([(b["kod"], b["girilen"]) for b in ozet["bolgeler"]], [("B1", 2), ("B2", 1)])
+
+    def test_baska_tesisin_bolgesi_secilemez(self):
+        baska_zone_id = self.baska_station.zone_id
+        self.assertIsNone(istasyon_sayim.sayim_ozeti(self.wr, self.facility, baska_zone_id)["bolge"])
+
+    def test_istasyon_satirlari(self):
+        with self.assertNumQueries(1):
+            satirlar = istasyon_sayim.istasyon_satirlari(self.wr, self.facility)
+            # Satırdaki istasyon / bölge / sayım erişimi ek sorgu atmaz
+            ozet = [(r["station"].zone.kod, r["station"].kod, r["count_obj"] and r["count_obj"].tuketim_var) for r in satirlar]
+        self.assertEqual(
+            ozet,
+            [("B1", "0", True), ("B1", "2", False), ("B1", "4", None), ("B2", "1", False), ("B2", "3", None), ("B2", "5", None)],
+        )
+        self.assertEqual(satirlar[0]["count_obj"].not_alani, "x")
+
+    def test_istasyon_satirlari_bolge_filtresi(self):
+        satirlar = istasyon_sayim.istasyon_satirlari(self.wr, self.facility, self.zones[1].pk)
+        self.assertEqual([r["station"].kod for r in satirlar], ["1", "3", "5"])
+
+
+class SayimApiTests(IstasyonSayimTestMixin, TestCase):
+    """Tek / toplu tarama API'si: yalnızca iş kaydının tesisindeki istasyonlar yazılır."""
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse("admin:core_workrecord_istasyon_sayim_api", args=[self.wr.pk])
+        self.toplu_url = reverse("admin:core_workrecord_istasyon_sayim_api_toplu", args=[self.wr.pk])
+
+    def test_tek_tarama_kaydedilir(self):
+        st = self.stations[0]
+        response = self.client.post(self.url, {"benzersiz_kod": st.benzersiz_kod, "tuketim_var": "1", "not_alani": "not"})
+        self.assertEqual(response.status_code, 200)
+        veri = response.json()
+        self.assertEqual(veri["satir"]["durum"], "olusturuldu")
+        self.assertEqual(veri["ozet"]["tesis"]["girilen"], 1)
+        self.assertEqual(self._sayimlar(), {st.pk: (True, "not")})
+
+    def test_bilinmeyen_kod_404(self):
+        response = self.client.post(self.url, {"benzersiz_kod": "YOK-1", "tuketim_var": "1"})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.json()["found"])
+        self.assertEqual(self._sayimlar(), {})
+
+    def test_kilitli_kayit_409(self):
+        WorkRecord.objects.filter(pk=self.wr.pk).update(bitis_saati=datetime.time(12, 0))
+        response = self.client.post(self.url, {"station_id": self.stations[0].pk, "tuketim_var": "1"})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self._sayimlar(), {})
+
+    def test_baska_tesisin_istasyonu_yazilmaz(self):
+        response = self.client.post(self.url, {"station_id": self.baska_station.pk, "tuketim_var": "1"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["satir"]["durum"], "gecersiz")
+        self.assertEqual(self._sayimlar(), {})
+
+    def test_toplu_tarama(self):
+        s0, s1 = self.stations[:2]
+        response = self.client.post(
+            self.toplu_url,
+            {"taramalar": [
+                {"station_id": s0.pk, "tuketim_var": True},
+                {"benzersiz_kod": s1.benzersiz_kod, "tuketim_var": False},
+                {"station_id": s0.pk, "tuketim_var": False, "not_alani": "son"},
+                {"station_id": self.baska_station.pk, "tuketim_var": True},
+                {"benzersiz_kod": "YOK-1"},
+            ]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        veri = response.json()
+        self.assertEqual(
+            {k: veri["sonuc"][k] for k in ("olusturulan", "gecersiz", "bulunamayan")},
+            {"olusturulan": 2, "gecersiz": 1, "bulunamayan": 1},
+        )
+        self.assertEqual(
+            [s["durum"] for s in veri["satirlar"]], ["olusturuldu", "olusturuldu", "olusturuldu", "gecersiz", "bulunamadi"],
+        )
+        self.assertEqual([o["facility_id"] for o in veri["ozetler"]], [self.facility.pk])
+        self.assertEqual(self._sayimlar(), {s0.pk: (False, "son"), s1.pk: (False, "")})
+
+    def test_tesissiz_is_kaydinda_tarama_yazilmaz(self):
+        WorkRecord.objects.filter(pk=self.wr.pk).update(facility=None, etkin_tesis=None)
+        sonuc = istasyon_sayim.taramalari_kaydet(
+            WorkRecord.objects.get(pk=self.wr.pk), [{"station_id": self.stations[0].pk, "tuketim_var": True}],
+        )
+        self.assertEqual(sonuc["sonuc"]["gecersiz"], 1)
+        self.assertEqual(self._sayimlar(), {})
+
+
+class TaramalariSenkronlaTests(IstasyonSayimTestMixin, TestCase):
+    """Çevrimdışı kuyruk senkronu: istemci zamanına göre son yazan kazanır, paket tekrar gönderilebilir."""
+
+    def _tarama(self, id, station, tuketim_var, saat, **alanlar):
+        return {"id": id, "station_id": station.pk, "tuketim_var": tuketim_var, "zaman": f"2026-01-01T{saat}:00Z", **alanlar}
+
+    def _senkronla(self, taramalar):
+        return istasyon_sayim.taramalari_senkronla(WorkRecord.objects.get(pk=self.wr.pk), taramalar)
+
+    def test_ayni_pakette_en_yeni_tarama_kazanir(self):
+        st = self.stations[0]
+        sonuc = self._senkronla([
+            self._tarama("a", st, True, "10:05", not_alani="yeni"),
+            self._tarama("b", st, False, "10:00"),
+        ])
+        self.assertEqual(sonuc["sonuc"]["uygulanan"], 1)
+        self.assertEqual(sonuc["sonuc"]["eski"], 1)
+        self.assertEqual([s["durum"] for s in sonuc["satirlar"]], ["uygulandi", "eski"])
+        self.assertEqual(self._sayimlar(), {st.pk: (True, "yeni")})
+
+    def test_kayittaki_daha_yeni_sayim_ezilmez(self):
+        st = self.stations[0]
+        self._senkronla([self._tarama("a", st, True, "10:05")])
+        sonuc = self._senkronla([self._tarama("b", st, False, "10:00")])
+        self.assertEqual(sonuc["satirlar"], [{"id": "b", "durum": "eski"}])
+        self.assertEqual(self._sayimlar(), {st.pk: (True, "")})
+
+        sonuc = self._senkronla([self._tarama("c", st, False, "10:10")])
+        self.assertEqual(sonuc["satirlar"], [{"id": "c", "durum": "uygulandi"}])
+        self.assertEqual(self._sayimlar(), {st.pk: (False, "")})
+
+    def test_ayni_paket_tekrar_gonderilebilir(self):
+        paket = [self._tarama("a", self.stations[0], True, "10:00"), self._tarama("b", self.stations[1], False, "10:01")]
+        self.assertEqual(self._senkronla(paket)["sonuc"]["uygulanan"], 2)
+        sonuc = self._senkronla(paket)
+        self.assertEqual((sonuc["sonuc"]["uygulanan"], sonuc["sonuc"]["eski"]), (0, 2))
+        self.assertEqual(len(self._sayimlar()), 2)
+
+    def test_gecersiz_zaman_ve_baska_tesis(self):
+        sonuc = self._senkronla([
+            self._tarama("a", self.stations[0], True, "10:00", zaman="dün"),
+            self._tarama("b", self.baska_station, True, "10:00"),
+            {"id": "c", "benzersiz_kod": self.baska_station.benzersiz_kod, "zaman": "2026-01-01T10:00:00Z"},
+        ])
+        self.assertEqual([s["durum"] for s in sonuc["satirlar"]], ["gecersiz", "bulunamadi", "bulunamadi"])
+        self.assertEqual((sonuc["sonuc"]["gecersiz"], sonuc["sonuc"]["bulunamayan"]), (1, 2))
+        self.assertEqual(self._sayimlar(), {})
+
+
+def _eski_istasyon_raporu_verisi(facility, work_records, stations, counts):
+    """Matris öncesi (count_map sözlüğüyle) hesaplama; _rapor_verisi_olustur ile karşılaştırma için referans."""
+    customer = facility.customer
+    count_map = {(wr_id, st_id): val for wr_id, st_id, val in counts}
+    wr_ids = [wr_id for wr_id, _ in work_records]
+    zone_stations = defaultdict(list)
+    for st in stations:
+        zone_stations[str(st.zone) if st.zone else "—"].append(st)
+
+    def var_sayisi(wr_id, st_list):
+        return sum(1 for st in st_list if count_map.get((wr_id, st.id)) is True)
+
+    zone_stats = []
+    if len(wr_ids) >= 2:
+        for zone_name in sorted(zone_stations):
+            st_list = zone_stations[zone_name]
+            var_ilk, var_son = var_sayisi(wr_ids[0], st_list), var_sayisi(wr_ids[-1], st_list)
+            if var_ilk > 0:
+                tuketim_degisim = (var_son - var_ilk) / var_ilk * 100
+            else:
+                tuketim_degisim = var_son * 100 if var_son > 0 else 0
+            degisen = sum(
+                1 for st in st_list
+                if (count_map.get((wr_ids[0], st.id)) is True) != (count_map.get((wr_ids[-1], st.id)) is True)
+            )
+            zone_stats.append({
+                "zone": zone_name, "tuketim_degisim": tuketim_degisim, "istasyon_degisim": degisen / len(st_list) * 100,
+                "var_ilk": var_ilk, "var_son": var_son, "zone_total": len(st_list),
+            })
+    return {
+        "musteri_tesis": f"{customer.firma_ismi} - {facility.ad}",
+        "adres": (facility.adres or "").strip() or (customer.adres or "").strip() or "—",
+        "date_headers": [tarih.strftime("%d.%m.%Y") for _, tarih in work_records],
+        "rows": [
+            {
+                "zone": str(st.zone) if st.zone else "—", "kod": st.kod, "ad": st.ad or "",
+                "counts": [count_map.get((wr_id, st.id)) for wr_id in wr_ids],
+            }
+            for st in stations
+        ],
+        "ratio_genel": [var_sayisi(wr_id, stations) / len(stations) if stations else 0 for wr_id in wr_ids],
+        "ratio_by_zone": {
+            zone_name: [var_sayisi(wr_id, st_list) / len(st_list) for wr_id in wr_ids]
+            for zone_name, st_list in zone_stations.items()
+        },
+        "zone_stats": zone_stats,
+    }
+
+
+class IstasyonRaporuVerisiTests(SimpleTestCase):
+    """_rapor_verisi_olustur (int8 matris) eski sözlük tabanlı hesapla aynı sonucu vermeli; veritabanısız."""
+
+    def _fikstur(self, n_station, n_wr, tohum):
+        rnd = random.Random(tohum)
+        customer = Customer(kod="M1", firma_ismi="Firma", adres="Müşteri adresi")
+        facility = Facility(pk=1, customer=customer, kod="T1", ad="Tesis", adres="")
+        zones = [Zone(pk=z, facility=facility, kod=f"B{z}", ad=f"Bölge {z}") for z in (1, 2, 3)]
+        stations = [
+            Station(pk=i, zone=zones[rnd.randrange(len(zones))], kod=f"{i:03d}", ad=f"İstasyon {i}")
+            for i in range(1, n_station + 1)
+        ]
+        stations.sort(key=lambda st: (st.zone.kod, st.kod))
+        work_records = [(100 + j, _tarih(1, 1) + datetime.timedelta(days=7 * j)) for j in range(n_wr)]
+        counts = [
+            (wr_id, st.pk, rnd.random() < 0.5)
+            for wr_id, _ in work_records for st in stations if rnd.random() < 0.8
+        ]
+        # Rapora ait olmayan iş kaydı / istasyon sayımları yok sayılır
+        counts += [(999, stations[0].pk, True), (work_records[0][0], 999, True)] if work_records and stations else []
+        rnd.shuffle(counts)
+        return facility, work_records, stations, counts
+
+    def _karsilastir(self, *fikstur):
+        yeni = istasyon_raporu._rapor_verisi_olustur(*fikstur)
+        eski = _eski_istasyon_raporu_verisi(*fikstur)
+        for anahtar, deger in eski.items():
+            self.assertEqual(yeni[anahtar], deger, anahtar)
+        facility, work_records, stations, counts = fikstur
+        self.assertEqual(len(yeni["matris"]), len(stations) * len(work_records))
+        # hucreler=False: rows[].counts yok, matris aynı
+        sade = istasyon_raporu._rapor_verisi_olustur(*fikstur, hucreler=False)
+        self.assertNotIn("counts", sade["rows"][0] if sade["rows"] else {})
+        self.assertEqual(sade["matris"], yeni["matris"])
+
+    def test_eski_hesapla_ayni(self):
+        for tohum in range(5):
+            with self.subTest(tohum=tohum):
+                self._karsilastir(*self._fikstur(40, 6, tohum))
+
+    def test_tek_tarih_bolge_istatistigi_yok(self):
+        fikstur = self._fikstur(5, 1, 0)
+        self._karsilastir(*fikstur)
+        self.assertEqual(istasyon_raporu._rapor_verisi_olustur(*fikstur)["zone_stats"], [])
+
+    def test_istasyon_ve_tarih_yok(self):
+        facility = self._fikstur(1, 1, 0)[0]
+        self._karsilastir(facility, [], [], [])
+        self._karsilastir(facility, [(1, _tarih(1, 1)), (2, _tarih(1, 8))], [], [])
+
+
+class IstasyonRaporuTestMixin:
+    """İki tesis; T1'de iki bölge, üç istasyon ve iki ziyaret (2026-01-05, 2026-01-12), T2'de tek istasyon ve ziyaret."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user("personel")
+        cls.customer = Customer.objects.create(kod="M1", firma_ismi="Firma", adres="Adres")
+        cls.facility = Facility.objects.create(customer=cls.customer, kod="T1", ad="Tesis")
+        cls.facility2 = Facility.objects.create(customer=cls.customer, kod="T2", ad="İkinci tesis")
+        b1 = Zone.objects.create(facility=cls.facility, kod="B1", ad="Depo")
+        b2 = Zone.objects.create(facility=cls.facility, kod="B2", ad="Mutfak")
+        s1, s2, s3 = (
+            Station.objects.create(zone=zone, kod=kod, ad=f"İstasyon {kod}") for zone, kod in ((b1, "1"), (b1, "2"), (b2, "1"))
+        )
+        s4 = Station.objects.create(zone=Zone.objects.create(facility=cls.facility2, kod="B1", ad="Bahçe"), kod="1", ad="")
+        wr1, wr2, wr3 = (
+            WorkRecord.objects.create(tarih=tarih, customer=cls.customer, facility=facility, personel=user)
+            for tarih, facility in ((_tarih(1, 5), cls.facility), (_tarih(1, 12), cls.facility), (_tarih(1, 5), cls.facility2))
+        )
+        WorkRecordStationCount.objects.bulk_create(
+            WorkRecordStationCount(work_record=wr, station=st, tuketim_var=var)
+            for wr, st, var in ((wr1, s1, True), (wr1, s2, False), (wr2, s1, False), (wr2, s3, True), (wr3, s4, True))
+        )
+        # bulk_create sinyal üretmez: oranların okunduğu tüketim özeti kurulur
+        tuketim_ozeti.ozetleri_yeniden_olustur()
+
+    def _veri(self, **kwargs):
+        return istasyon_raporu.get_istasyon_raporu_data(self.facility.pk, _tarih(1, 1), _tarih(1, 31), **kwargs)
+
+    def _sayfa_degerleri(self, ws):
+        """Sayfa satırları; sondaki boş hücreler atılır."""
+        satirlar = []
+        for satir in ws.iter_rows(values_only=True):
+            satir = list(satir)
+            while satir and satir[-1] is None:
+                satir.pop()
+            satirlar.append(satir)
+        return satirlar
+
+
+class IstasyonRaporuExcelTests(IstasyonRaporuTestMixin, TestCase):
+
+    def test_write_only_excel(self):
+        buf = io.BytesIO()
+        istasyon_raporu.write_istasyon_raporu_excel(self._veri(hucreler=False), buf)
+        buf.seek(0)
+        wb = openpyxl.load_workbook(buf)
+        self.assertEqual(wb.sheetnames, ["İstasyon Raporu"])
+        satirlar = self._sayfa_degerleri(wb.active)
+        self.assertEqual(satirlar[0][0], "Firma - Tesis")
+        self.assertEqual(satirlar[1][0], "Adres")
+        self.assertEqual(satirlar[2], ["Bölge", "İstasyon Kodu", "Açıklama", "05.01.2026", "12.01.2026"])
+        self.assertEqual(satirlar[3], ["Tüketim oranı (genel)", None, None, "33.3%", "33.3%"])
+        istasyonlar = [s for s in satirlar if len(s) > 1 and s[1] in ("1", "2")]
+        self.assertEqual(
+            [s[3:] for s in istasyonlar], [["Var", "Yok"], ["Yok"], [None, "Var"]],
+        )
+        self.assertIn("Bölge İstatistikleri", [s[0] for s in satirlar if s])
+        self.assertEqual(wb.active["D4"].style, "rapor_oran")
+
+    def test_veri_sabit_sayida_sorguyla_okunur(self):
+        with self.assertNumQueries(5):
+            self._veri(hucreler=False)
+
+
+class IstasyonRaporuAkisTests(IstasyonRaporuTestMixin, TestCase):
+
+    def _cikti(self, bicim):
+        uretici, _, _ = istasyon_raporu.AKIS_BICIMLERI[bicim]
+        return "".join(uretici(self._veri(hucreler=False)))
+
+    def test_csv_uzun(self):
+        satirlar = list(csv.reader(io.StringIO(self._cikti("csv_uzun"))))
+        self.assertEqual(satirlar[0], ["istasyon_kodu", "bolge", "aciklama", "tarih", "tuketim"])
+        self.assertEqual(
+            [(s[0], s[3], s[4]) for s in satirlar[1:]],
+            [("1", "2026-01-05", "1"), ("1", "2026-01-12", "0"), ("2", "2026-01-05", "0"), ("1", "2026-01-12", "1")],
+        )
+        self.assertEqual(satirlar[3][2], "İstasyon 2")
+
+    def test_csv_genis(self):
+        satirlar = list(csv.reader(io.StringIO(self._cikti("csv_genis"))))
+        self.assertEqual(satirlar[0], ["bolge", "istasyon_kodu", "aciklama", "2026-01-05", "2026-01-12"])
+        self.assertEqual([s[1:] for s in satirlar[1:]], [
+            ["1", "İstasyon 1", "1", "0"],
+            ["2", "İstasyon 2", "0", ""],
+            ["1", "İstasyon 1", "", "1"],
+        ])
+
+    def test_json(self):
+        veri = json.loads(self._cikti("json"))
+        self.assertEqual(veri["musteri_tesis"], "Firma - Tesis")
+        self.assertEqual(veri["tarihler"], ["2026-01-05", "2026-01-12"])
+        self.assertEqual(len(veri["istasyonlar"]), 3)
+        k = veri["kodlama"]
+        self.assertEqual(veri["matris"], [[k["var"], k["yok"]], [k["yok"], k["eksik"]], [k["eksik"], k["var"]]])
+
+
+class IstasyonRaporuCokluExcelTests(IstasyonRaporuTestMixin, TestCase):
+
+    def test_ozet_ve_tesis_sayfalari(self):
+        raporlar = istasyon_raporu.get_istasyon_raporu_verileri(
+            [self.facility2.pk, self.facility.pk], _tarih(1, 1), _tarih(1, 31), hucreler=False,
+        )
+        buf = io.BytesIO()
+        istasyon_raporu.write_istasyon_raporu_excel_coklu(raporlar, buf, baslik="Ocak")
+        buf.seek(0)
+        wb = openpyxl.load_workbook(buf)
+        self.assertEqual(wb.sheetnames, ["Özet", "T1 Tesis", "T2 İkinci tesis"])
+        ozet = self._sayfa_degerleri(wb["Özet"])
+        self.assertEqual(ozet[0], ["Ocak"])
+        self.assertEqual([s[:4] for s in ozet[3:]], [["T1", "Tesis", 3, 2], ["T2", "İkinci tesis", 1, 1]])
+        self.assertEqual(self._sayfa_degerleri(wb["T2 İkinci tesis"])[2][3:], ["05.01.2026"])
+
+    def test_ayni_adli_tesisler_numaralanir(self):
+        kullanilan = {"özet"}
+        adlar = [istasyon_raporu._sayfa_adi(ad, kullanilan) for ad in ("Özet", "T1 A/B", "t1 a/b", "X" * 40)]
+        self.assertEqual(adlar, ["Özet (2)", "T1 A_B", "t1 a_b (2)", "X" * 31])
+
+
+class EtkinMusteriTesisTests(TestCase):
+    """İş kaydında boş müşteri / tesis kapatılan talepten gelir; talepteki değişiklik iş kaydına yayılır."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "x")
+        cls.m1 = Customer.objects.create(kod="M1", firma_ismi="Birinci")
+        cls.m2 = Customer.objects.create(kod="M2", firma_ismi="İkinci")
+        cls.t1 = Facility.objects.create(customer=cls.m1, kod="T1", ad="Tesis 1")
+        cls.t2 = Facility.objects.create(customer=cls.m2, kod="T2", ad="Tesis 2")
+        cls.tip = TalepTipi.objects.create(ad="Periyodik")
+
+    def setUp(self):
+        self.talep = Talep.objects.create(customer=self.m1, facility=self.t1, tarih=_tarih(1, 1), tip=self.tip)
+        self.wr = WorkRecord.objects.create(tarih=_tarih(1, 2), personel=self.user, kapatilan_talep=self.talep)
+
+    def _etkin(self, wr=None):
+        wr = WorkRecord.objects.get(pk=(wr or self.wr).pk)
+        return wr.etkin_musteri_id, wr.etkin_tesis_id
+
+    def _rapor_tarihleri(self, facility):
+        return istasyon_raporu.get_istasyon_raporu_data(facility.pk, _tarih(1, 1), _tarih(1, 31))["tarihler"]
+
+    def test_bos_musteri_tesis_talepten_gelir(self):
+        self.assertEqual(self._etkin(), (self.m1.pk, self.t1.pk))
+
+    def test_talep_degisikligi_is_kaydina_yayilir(self):
+        talep = Talep.objects.get(pk=self.talep.pk)
+        talep.customer = self.m2
+        talep.facility = self.t2
+        talep.save()
+        self.assertEqual(self._etkin(), (self.m2.pk, self.t2.pk))
+
+    def test_kendi_tesisi_olan_is_kaydi_degismez(self):
+        wr = WorkRecord.objects.create(
+            tarih=_tarih(1, 3), personel=self.user, customer=self.m1, facility=self.t1,
+            kapatilan_talep=Talep.objects.create(customer=self.m1, facility=self.t1, tarih=_tarih(1, 3), tip=self.tip),
+        )
+        talep = Talep.objects.get(pk=wr.kapatilan_talep_id)
+        talep.customer = self.m2
+        talep.facility = None
+        talep.save()
+        self.assertEqual(self._etkin(wr), (self.m1.pk, self.t1.pk))
+
+    def test_talep_silinince_etkin_alanlar_kendi_degerlerine_doner(self):
+        wr = WorkRecord.objects.create(
+            tarih=_tarih(1, 3), personel=self.user, customer=self.m2, facility=self.t2,
+            kapatilan_talep=Talep.objects.create(customer=self.m1, facility=self.t1, tarih=_tarih(1, 3), tip=self.tip),
+        )
+        Talep.objects.filter(pk__in=[self.talep.pk, wr.kapatilan_talep_id]).delete()
+        self.assertEqual(self._etkin(), (None, None))
+        self.assertEqual(self._etkin(wr), (self.m2.pk, self.t2.pk))
+        self.assertIsNone(WorkRecord.objects.get(pk=self.wr.pk).kapatilan_talep_id)
+
+    def test_degismeyen_kayit_ek_update_yapmaz(self):
+        talep = Talep.objects.get(pk=self.talep.pk)
+        talep.aciklama = "Güncellendi"
+        with self.assertNumQueries(1):
+            talep.save()
+        with self.assertNumQueries(1):
+            talep.save(update_fields=["aciklama"])
+
+    def test_yeni_talep_ek_update_yapmaz(self):
+        with self.assertNumQueries(1):
+            Talep.objects.create(customer=self.m1, facility=self.t1, tarih=_tarih(1, 5), tip=self.tip)
+
+    def test_ilac_raporu_etkin_musteri_tesisi_gosterir(self):
+        ilac = IlacTanim.objects.create(ticari_ismi="İlaç")
+        WorkRecordIlac.objects.create(work_record=self.wr, ilac_tanim=ilac, miktar=1)
+        talep = Talep.objects.get(pk=self.talep.pk)
+        talep.customer = self.m2
+        talep.facility = self.t2
+        talep.save()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("admin:rapor_ilac_kullanımlari"))
+        self.assertEqual(response.status_code, 200)
+        [satir] = response.context["rows"]
+        self.assertEqual(satir["talep_musteri"], "M2")
+        self.assertEqual(satir["talep_tesis"], str(self.t2))
+
+    def test_istasyon_raporu_etkin_tesise_gore_secer(self):
+        zone = Zone.objects.create(facility=self.t2, kod="B1", ad="Depo")
+        station = Station.objects.create(zone=zone, kod="1")
+        WorkRecordStationCount.objects.create(work_record=self.wr, station=station, tuketim_var=True)
+        self.assertEqual(self._rapor_tarihleri(self.t2), [])
+        talep = Talep.objects.get(pk=self.talep.pk)
+        talep.facility = self.t2
+        talep.save()
+        self.assertEqual(self._rapor_tarihleri(self.t1), [])
+        self.assertEqual(self._rapor_tarihleri(self.t2), [_tarih(1, 2)])
+
+
+class TalepPlanlaActionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "x")
+        customer = Customer.objects.create(kod="M1", firma_ismi="Firma")
+        Ekip.objects.create(kod="E1", ekip_lideri=cls.user, kisi_sayisi=1)
+        tip = TalepTipi.objects.create(ad="Periyodik")
+        cls.talepler = [
+            Talep.objects.create(customer=customer, tarih=_tarih(1, 1), tip=tip, aciklama=str(i)) for i in range(3)
+        ]
+
+    def test_mesaj_planlama_donemini_gosterir(self):
+        self.client.force_login(self.user)
+        # 5 Ocak 2026 Pazartesi; tek günlük dönemde kişi başı 2 ziyaret sığar
+        with (
+            mock.patch.object(timezone, "localdate", return_value=_tarih(1, 5)),
+            mock.patch("core.admin.TalepAdmin.planlama_gun_sayisi", 1),
+        ):
+            response = self.client.post(
+                reverse("admin:core_talep_changelist"),
+                {"action": "planla_action", "_selected_action": [t.pk for t in self.talepler]},
+                follow=True,
+            )
+        mesajlar = [str(m) for m in response.context["messages"]]
+        self.assertIn("2 talep planlandı.", mesajlar)
+        self.assertIn("1 talep 1 gün içinde ekip kapasitesine sığmadığı için planlanamadı.", mesajlar)
+
+
+class RotaSezgiselTests(SimpleTestCase):
+    """En yakın komşu + 2-opt: geçerli bir sıra döner ve 2-opt rotayı hiçbir zaman uzatmaz."""
+
+    def _matris(self, n, tohum):
+        rnd = random.Random(tohum)
+        noktalar = [(rnd.uniform(0, 100), rnd.uniform(0, 100)) for _ in range(n)]
+        return [[((x1 - x2) ** 2 + (y1 - y2) ** 2) ** 0.5 for x2, y2 in noktalar] for x1, y1 in noktalar]
+
+    def test_rota_gecerli_permutasyon(self):
+        for n in (0, 1, 2, 3, 8, 15):
+            with self.subTest(n=n):
+                self.assertEqual(sorted(rota.rota_olustur(self._matris(n, n))), list(range(n)))
+
+    def test_iki_opt_rotayi_uzatmaz(self):
+        for tohum in range(20):
+            matris = self._matris(10, tohum)
+            rnd = random.Random(tohum)
+            for sira in (rota.en_yakin_komsu(matris, tohum % 10), rnd.sample(range(10), 10)):
+                with self.subTest(tohum=tohum, sira=sira):
+                    iyilesen = rota.iki_opt(sira, matris)
+                    self.assertEqual(sorted(iyilesen), list(range(10)))
+                    self.assertLessEqual(
+                        rota.rota_uzunlugu(iyilesen, matris), rota.rota_uzunlugu(sira, matris) + 1e-9,
+                    )
+
+    def test_dogru_uzerindeki_duraklar_sirayla_gezilir(self):
+        noktalar = [0, 7, 2, 9, 4, 1]
+        matris = [[abs(a - b) for b in noktalar] for a in noktalar]
+        self.assertEqual(rota.rota_uzunlugu(rota.rota_olustur(matris), matris), 9)
+
+
+class MesafeMatrisiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        customer = Customer.objects.create(kod="M1", firma_ismi="Firma")
+        cls.a = Facility.objects.create(customer=customer, kod="A", ad="A", enlem=41, boylam=29)
+        cls.b = Facility.objects.create(customer=customer, kod="B", ad="B", enlem=41, boylam=30)
+        cls.c = Facility.objects.create(customer=customer, kod="C", ad="C")
+
+    def test_kayitli_mesafe_kus_ucusu_ve_bilinmeyen(self):
+        matris, eksik = rota.mesafe_matrisi([self.a, self.b, self.c])
+        self.assertAlmostEqual(matris[0][1], rota.kus_ucusu_km(self.a, self.b) * rota.YOL_KATSAYISI)
+        self.assertEqual((matris[0][2], matris[2][1]), (rota.BILINMEYEN_MESAFE_KM, rota.BILINMEYEN_MESAFE_KM))
+        self.assertEqual(eksik, 2)
+        TesisMesafesi.objects.create(kaynak=self.c, hedef=self.a, mesafe_km=12)
+        with self.assertNumQueries(1):
+            matris, eksik = rota.mesafe_matrisi([self.a, self.b, self.c])
+        self.assertEqual((matris[0][2], matris[2][0], eksik), (12.0, 12.0, 1))
+
+    def test_koordinatsiz_tesis_rotanin_ucuna_itilir(self):
+        # Açık rotada ceza mesafesi yalnızca bir kez ödenir: bilinmeyen durak baştadır ya da sonda
+        matris, _ = rota.mesafe_matrisi([self.a, self.c, self.b])
+        sira = rota.rota_olustur(matris)
+        self.assertIn(1, (sira[0], sira[-1]))
+        self.assertAlmostEqual(rota.rota_uzunlugu(sira, matris), rota.BILINMEYEN_MESAFE_KM + matris[0][2])
+
+
+class DurumGecisiTests(TestCase):
+    """Toplu başlat / bitir: dolu saatler korunur, kapatılan talep Yapıldı olur, sinyal değişen id'lerle gider."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("personel")
+        cls.customer = Customer.objects.create(kod="M1", firma_ismi="Firma")
+        cls.tip = TalepTipi.objects.create(ad="Periyodik")
+
+    def _kayitlar(self, adet, **alanlar):
+        return [
+            WorkRecord.objects.create(tarih=_tarih(1, 5), customer=self.customer, personel=self.user, **alanlar)
+            for _ in range(adet)
+        ]
+
+    def _gecis(self, kayitlar, gecis):
+        alinan = []
+
+        def alici(sender, ids, durum, **kwargs):
+            alinan.append((sender, sorted(ids), durum))
+
+        is_kaydi_durumu_degisti.connect(alici)
+        try:
+            ids = durum_gecisi(WorkRecord.objects.filter(pk__in=[wr.pk for wr in kayitlar]), gecis)
+        finally:
+            is_kaydi_durumu_degisti.disconnect(alici)
+        return ids, alinan
+
+    def test_baslat_bos_saati_doldurur_doluyu_korur(self):
+        dolu, bos = self._kayitlar(2)
+        WorkRecord.objects.filter(pk=dolu.pk).update(baslama_saati=datetime.time(8, 30))
+        ids, alinan = self._gecis([dolu, bos], "baslat")
+        self.assertEqual(sorted(ids), [dolu.pk, bos.pk])
+        self.assertEqual(alinan, [(WorkRecord, sorted(ids), WorkRecord.DURUM_DEVAM_EDIYOR)])
+        dolu.refresh_from_db()
+        bos.refresh_from_db()
+        self.assertEqual((dolu.durum, dolu.baslama_saati), (WorkRecord.DURUM_DEVAM_EDIYOR, datetime.time(8, 30)))
+        self.assertIsNotNone(bos.baslama_saati)
+
+    def test_uygun_durumda_olmayan_atlanir_ve_sinyal_gitmez(self):
+        [wr] = self._kayitlar(1)
+        ids, alinan = self._gecis([wr], "bitir")
+        self.assertEqual((ids, alinan), ([], []))
+        wr.refresh_from_db()
+        self.assertEqual((wr.durum, wr.bitis_saati), (WorkRecord.DURUM_BASLANMADI, None))
+
+    def test_bitir_kapatilan_talebi_yapildi_yapar(self):
+        talep = Talep.objects.create(customer=self.customer, tarih=_tarih(1, 1), tip=self.tip)
+        [wr] = self._kayitlar(1, kapatilan_talep=talep, durum=WorkRecord.DURUM_DEVAM_EDIYOR)
+        Talep.objects.filter(pk=talep.pk).update(durum="planlandi")
+        ids, alinan = self._gecis([wr], "bitir")
+        self.assertEqual(ids, [wr.pk])
+        self.assertEqual(alinan, [(WorkRecord, [wr.pk], WorkRecord.DURUM_TAMAMLANDI)])
+        talep.refresh_from_db()
+        self.assertEqual(talep.durum, "yapildi")
+
+    def test_sorgu_sayisi_kayit_sayisindan_bagimsiz(self):
+        sayilar = []
+        for adet in (1, 6):
+            kayitlar = self._kayitlar(adet)
+            with CaptureQueriesContext(connection) as ctx:
+                self._gecis(kayitlar, "baslat")
+            sayilar.append(len(ctx))
+        self.assertEqual(sayilar[0], sayilar[1])
+
+
+class TuketimOzetiTests(IstasyonSayimTestMixin, TestCase):
+    """IstasyonTuketimOzeti sayımlarla birlikte güncel kalır ve istasyon raporunun oranları buradan okunur."""
+
+    def _girdi(self):
+        return {st.pk: (i % 3 == 0, "") for i, st in enumerate(self.stations)}
+
+    def _ozet(self):
+        return {
+            (zone_id, tarih): (var, yok)
+            for zone_id, tarih, var, yok in IstasyonTuketimOzeti.objects.filter(work_record=self.wr).values_list(
+                "zone_id", "tarih", "var_sayisi", "yok_sayisi",
+            )
+        }
+
+    def _ham_ozet(self):
+        """Özetin ham sayımlardan beklenen hali."""
+        beklenen = defaultdict(lambda: [0, 0])
+        for zone_id, var in WorkRecordStationCount.objects.filter(work_record=self.wr).values_list(
+            "station__zone_id", "tuketim_var",
+        ):
+            beklenen[(zone_id, self.wr.tarih)][0 if var else 1] += 1
+        return {k: tuple(v) for k, v in beklenen.items()}
+
+    def test_tekil_kayit_ve_silme_ozeti_gunceller(self):
+        st = self.stations[0]
+        sayim = WorkRecordStationCount.objects.create(work_record=self.wr, station=st, tuketim_var=True)
+        self.assertEqual(self._ozet(), {(st.zone_id, self.wr.tarih): (1, 0)})
+        sayim.tuketim_var = False
+        sayim.save()
+        self.assertEqual(self._ozet(), {(st.zone_id, self.wr.tarih): (0, 1)})
+        sayim.delete()
+        self.assertEqual(self._ozet(), {})
+
+    def test_toplu_kayit_ve_senkron_ozeti_gunceller(self):
+        istasyon_sayim.sayimlari_kaydet(self.wr, self._girdi())
+        self.assertEqual(self._ozet(), self._ham_ozet())
+        istasyon_sayim.taramalari_senkronla(self.wr, [
+            {"id": "t1", "station_id": self.stations[0].pk, "tuketim_var": False, "zaman": timezone.now().isoformat()},
+        ])
+        self.assertEqual(self._ozet(), self._ham_ozet())
+
+    def test_istasyon_bolge_degisikligi_ve_tarih_degisikligi(self):
+        istasyon_sayim.sayimlari_kaydet(self.wr, self._girdi())
+        st = self.stations[0]
+        st.zone = self.zones[1] if st.zone_id == self.zones[0].pk else self.zones[0]
+        st.save()
+        self.wr.tarih = _tarih(2, 1)
+        self.wr.save()
+        self.assertEqual(self._ozet(), self._ham_ozet())
+
+    def test_is_kaydi_silinince_ozet_de_silinir(self):
+        istasyon_sayim.sayimlari_kaydet(self.wr, self._girdi())
+        self.wr.delete()
+        self.assertFalse(IstasyonTuketimOzeti.objects.exists())
+
+    def test_komut_ozeti_yeniden_olusturur(self):
+        istasyon_sayim.sayimlari_kaydet(self.wr, self._girdi())
+        beklenen = self._ozet()
+        IstasyonTuketimOzeti.objects.all().delete()
+        call_command("tuketim_ozetlerini_olustur", tesisler=[self.facility.pk + 1000], stdout=io.StringIO())
+        self.assertEqual(self._ozet(), {})
+        cikti = io.StringIO()
+        call_command("tuketim_ozetlerini_olustur", tesisler=[self.facility.pk], stdout=cikti)
+        self.assertEqual(self._ozet(), beklenen)
+        self.assertIn(f"{len(beklenen)} tüketim özeti", cikti.getvalue())
+
+    def test_rapor_oranlari_ozetten_okunur(self):
+        istasyon_sayim.sayimlari_kaydet(self.wr, self._girdi())
+        veri = istasyon_raporu.get_istasyon_raporu_data(self.facility.pk, self.wr.tarih, self.wr.tarih)
+        var = sum(1 for v, _ in self._girdi().values() if v)
+        self.assertEqual(veri["ratio_genel"], [var / len(self.stations)])
+        matris = bytes(veri["matris"])
+        # Özet değişirse (ham sayımlar aynıyken) oranlar ve bölge istatistikleri de değişir; hücreler değişmez
+        IstasyonTuketimOzeti.objects.filter(work_record=self.wr).update(var_sayisi=0)
+        veri = istasyon_raporu.get_istasyon_raporu_data(self.facility.pk, self.wr.tarih, self.wr.tarih)
+        self.assertEqual(veri["ratio_genel"], [0])
+        self.assertEqual(set(sum(veri["ratio_by_zone"].values(), [])), {0})
+        self.assertEqual(bytes(veri["matris"]), matris)
@@ -0,0 +1,80 @@
+"""
+İstasyon tüketim özeti (IstasyonTuketimOzeti) bakımı. (iş kaydı, bölge) çiftlerinin özeti ham sayımlardan
+tek gruplu sorguyla yeniden hesaplanıp toplu upsert edilir; sayımı kalmayan çiftin satırı silinir.
+Tekil kayıt / silmede core.signals, toplu sayım kaydında istasyon_sayim servisleri bu modülü çağırır.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import IstasyonTuketimOzeti, WorkRecordStationCount
+
+# Tam yeniden oluşturmada tek INSERT'teki satır sayısı
+TOPLU_BOYUT = 1000
+
+
+def _ozet_satirlari(sayimlar):
+    """Sayım queryset'ini (iş kaydı, bölge) bazında gruplayıp kaydedilmemiş IstasyonTuketimOzeti nesneleri üretir."""
+    for r in (
+        sayimlar.values("work_record_id", "station__zone_id", "station__zone__facility_id", "work_record__tarih")
+        .annotate(
+            var=Count("pk", filter=Q(tuketim_var=True)),
+            yok=Count("pk", filter=Q(tuketim_var=False)),
+        )
+        .order_by()
+    ):
+        yield IstasyonTuketimOzeti(
+            facility_id=r["station__zone__facility_id"],
+            zone_id=r["station__zone_id"],
+            work_record_id=r["work_record_id"],
+            tarih=r["work_record__tarih"],
+            var_sayisi=r["var"],
+            yok_sayisi=r["yok"],
+        )
+
+
+def ozetleri_yenile(ciftler):
+    """
+    Verilen (work_record_id, zone_id) çiftlerinin özetini yeniden hesaplar (bir okuma + bir upsert, gerekirse bir silme).
+    Yazılan özet satırı sayısını döndürür.
+    """
+    ciftler = {(wr_id, zone_id) for wr_id, zone_id in ciftler if wr_id and zone_id}
+    if not ciftler:
+        return 0
+    sayimlar = WorkRecordStationCount.objects.filter(
+        work_record_id__in={wr_id for wr_id, _ in ciftler},
+        station__zone_id__in={zone_id for _, zone_id in ciftler},
+    )
+    ozetler = [o for o in _ozet_satirlari(sayimlar) if (o.work_record_id, o.zone_id) in ciftler]
+    bos = ciftler - {(o.work_record_id, o.zone_id) for o in ozetler}
+    with transaction.atomic():
+        if ozetler:
+            IstasyonTuketimOzeti.objects.bulk_create(
+                ozetler,
+                update_conflicts=True,
+                unique_fields=["work_record", "zone"],
+                update_fields=["facility", "tarih", "var_sayisi", "yok_sayisi"],
+            )
+        if bos:
+            IstasyonTuketimOzeti.objects.filter(
+                reduce(or_, (Q(work_record_id=wr_id, zone_id=zone_id) for wr_id, zone_id in bos))
+            ).delete()
+    return len(ozetler)
+
+
+def ozetleri_yeniden_olustur(facility_ids=None):
+    """
+    Özet tablosunu ham sayımlardan baştan kurar (facility_ids verilirse yalnızca o tesisler).
+    Bölgesi / tesisi değişen istasyonlar gibi sinyallerin kapsamadığı durumlar için. Oluşturulan satır sayısını döndürür.
+    """
+    ozetler_qs = IstasyonTuketimOzeti.objects.all()
+    sayimlar = WorkRecordStationCount.objects.all()
+    if facility_ids is not None:
+        facility_ids = list(facility_ids)
+        ozetler_qs = ozetler_qs.filter(facility_id__in=facility_ids)
+        sayimlar = sayimlar.filter(station__zone__facility_id__in=facility_ids)
+    with transaction.atomic():
+        ozetler_qs.delete()
+        return len(IstasyonTuketimOzeti.objects.bulk_create(_ozet_satirlari(sayimlar), batch_size=TOPLU_BOYUT))
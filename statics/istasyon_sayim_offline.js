@@ -0,0 +1,180 @@
+/* Kale İlaçlama — çevrimdışı istasyon sayımı kuyruğu (IndexedDB).
+ * Sayfada ve service worker'da (importScripts) ortak kullanılır; window'a bağımlı değildir.
+ * Taramalar cihazda zaman damgasıyla kuyruğa alınır, bağlantı gelince senkron uç noktasına toplu gönderilir.
+ * Kuyruktan yalnızca sunucunun "uygulandi" / "eski" dediği taramalar silinir. Sunucunun kabul etmediği taramalar
+ * (sayım kilitli, istasyon bulunamadı, geçersiz) silinmez; "reddedildi" işaretlenip kullanıcıya gösterilir.
+ */
+(function (kok) {
+  'use strict';
+
+  var DB_ADI = 'kale-sayim';
+  var DB_SURUM = 1;
+  var KUYRUK = 'kuyruk';
+  var SENKRON_ETIKETI = 'kale-sayim-senkron';
+  var PAKET_BOYUTU = 500;
+  var CSRF_CEREZI = 'csrftoken';
+
+  function dbAc() {
+    return new Promise(function (resolve, reject) {
+      var istek = indexedDB.open(DB_ADI, DB_SURUM);
+      istek.onupgradeneeded = function () {
+        var db = istek.result;
+        if (!db.objectStoreNames.contains(KUYRUK)) {
+          db.createObjectStore(KUYRUK, { keyPath: 'id' });
+        }
+      };
+      istek.onsuccess = function () { resolve(istek.result); };
+      istek.onerror = function () { reject(istek.error); };
+    });
+  }
+
+  function islem(mod, fn) {
+    return dbAc().then(function (db) {
+      return new Promise(function (resolve, reject) {
+        var tx = db.transaction(KUYRUK, mod);
+        var sonuc = fn(tx.objectStore(KUYRUK));
+        tx.oncomplete = function () { db.close(); resolve(sonuc && sonuc.result !== undefined ? sonuc.result : sonuc); };
+        tx.onerror = function () { db.close(); reject(tx.error); };
+      });
+    });
+  }
+
+  function yeniId() {
+    if (kok.crypto && kok.crypto.randomUUID) return kok.crypto.randomUUID();
+    return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2);
+  }
+
+  /** Taramayı kuyruğa ekler. kayit: {senkronUrl, station_id, benzersiz_kod, tuketim_var, not_alani} */
+  function ekle(kayit) {
+    kayit.id = kayit.id || yeniId();
+    kayit.zaman = kayit.zaman || new Date().toISOString();
+    return islem('readwrite', function (store) { store.put(kayit); }).then(function () { return kayit; });
+  }
+
+  function hepsi() {
+    return islem('readonly', function (store) { return store.getAll(); });
+  }
+
+  function sil(idler) {
+    return islem('readwrite', function (store) {
+      idler.forEach(function (id) { store.delete(id); });
+    });
+  }
+
+  /** Kayıtları gönderilmeyecek şekilde işaretler (reddedildi: sunucu durumu, örn. "kilitli", "bulunamadi"). */
+  function reddet(kayitlar) {
+    return islem('readwrite', function (store) {
+      kayitlar.forEach(function (k) { store.put(k); });
+    });
+  }
+
+  function bekleyenler() {
+    return hepsi().then(function (kayitlar) { return kayitlar.filter(function (k) { return !k.reddedildi; }); });
+  }
+
+  function reddedilenler() {
+    return hepsi().then(function (kayitlar) { return kayitlar.filter(function (k) { return k.reddedildi; }); });
+  }
+
+  /** Senkron bekleyen (reddedilmemiş) tarama sayısı. */
+  function sayi() {
+    return bekleyenler().then(function (kayitlar) { return kayitlar.length; });
+  }
+
+  /** Güncel CSRF çerezi (kayıtla saklanmaz; çerez yenilenmiş olabilir). Service worker'da cookieStore kullanılır. */
+  function csrfAl() {
+    function bul(metin) {
+      var eslesme = (metin || '').match(new RegExp('(?:^|;\\s*)' + CSRF_CEREZI + '=([^;]*)'));
+      return eslesme ? decodeURIComponent(eslesme[1]) : '';
+    }
+    if (kok.document) return Promise.resolve(bul(kok.document.cookie));
+    if (kok.cookieStore) {
+      return kok.cookieStore.get(CSRF_CEREZI).then(function (c) { return c ? c.value : ''; }).catch(function () { return ''; });
+    }
+    return Promise.resolve('');
+  }
+
+  function paketGonder(url, kayitlar) {
+    var govde = {
+      taramalar: kayitlar.map(function (k) {
+        return {
+          id: k.id, station_id: k.station_id, benzersiz_kod: k.benzersiz_kod,
+          tuketim_var: k.tuketim_var, not_alani: k.not_alani, zaman: k.zaman
+        };
+      })
+    };
+    return csrfAl().then(function (csrf) {
+      return fetch(url, {
+        method: 'POST',
+        credentials: 'same-origin',
+        // Oturum düşmüşse admin giriş sayfasına yönlendirme izlenmez (200 HTML yanıtı başarı sanılmasın)
+        redirect: 'manual',
+        headers: { 'Content-Type': 'application/json', 'Accept': 'application/json', 'X-CSRFToken': csrf },
+        body: JSON.stringify(govde)
+      });
+    }).then(function (r) {
+      var json = (r.headers.get('Content-Type') || '').indexOf('application/json') === 0;
+      if (r.type === 'opaqueredirect' || r.redirected || !json) {
+        // Oturum kapalı, CSRF hatası vb.: kuyruk olduğu gibi kalır, sonra tekrar denenir
+        throw new Error('Senkron başarısız: oturum açık değil veya beklenmeyen yanıt (' + r.status + ')');
+      }
+      return r.json().then(function (veri) {
+        if (r.status === 409) {
+          // Sayım kilitli: tekrar denemenin anlamı yok, taramalar kullanıcıya gösterilmek üzere saklanır
+          kayitlar.forEach(function (k) { k.reddedildi = 'kilitli'; });
+          return reddet(kayitlar).then(function () { return { kilitli: kayitlar.length, hata: veri.hata }; });
+        }
+        if (!r.ok) throw new Error('Senkron başarısız: ' + r.status + (veri.hata ? ' — ' + veri.hata : ''));
+        var durumlar = {};
+        (veri.satirlar || []).forEach(function (s) { durumlar[s.id] = s.durum; });
+        var silinecek = [];
+        var reddedilen = [];
+        kayitlar.forEach(function (k) {
+          var durum = durumlar[k.id];
+          if (durum === 'uygulandi' || durum === 'eski') {
+            silinecek.push(k.id);
+          } else if (durum) {
+            k.reddedildi = durum;
+            reddedilen.push(k);
+          }
+          // Yanıtta olmayan tarama kuyrukta kalır ve tekrar gönderilir
+        });
+        return sil(silinecek).then(function () { return reddet(reddedilen); }).then(function () { return veri; });
+      });
+    });
+  }
+
+  /** Kuyruktaki (reddedilmemiş) taramaları iş kaydı (senkron URL) bazında paketler halinde gönderir. */
+  function gonder() {
+    return bekleyenler().then(function (kayitlar) {
+      var gruplar = {};
+      kayitlar.forEach(function (k) {
+        (gruplar[k.senkronUrl] = gruplar[k.senkronUrl] || []).push(k);
+      });
+      var zincir = Promise.resolve([]);
+      Object.keys(gruplar).forEach(function (url) {
+        var grup = gruplar[url];
+        for (var i = 0; i < grup.length; i += PAKET_BOYUTU) {
+          (function (paket) {
+            zincir = zincir.then(function (sonuclar) {
+              return paketGonder(url, paket).then(function (s) {
+                return sonuclar.concat([s]);
+              });
+            });
+          })(grup.slice(i, i + PAKET_BOYUTU));
+        }
+      });
+      return zincir;
+    });
+  }
+
+  kok.KaleSayimKuyrugu = {
+    SENKRON_ETIKETI: SENKRON_ETIKETI,
+    ekle: ekle,
+    hepsi: hepsi,
+    sayi: sayi,
+    reddedilenler: reddedilenler,
+    sil: sil,
+    gonder: gonder
+  };
+})(self);
@@ -1,7 +1,10 @@
 /* Kale İlaçlama PWA Service Worker */
-const CACHE_NAME = 'kale-ilaclama-v1';
+const CACHE_NAME = 'kale-ilaclama-v2';
 const STATIC_URL = '/static/';
 
+// Çevrimdışı istasyon sayımı kuyruğu (IndexedDB); sayfa ile ortak
+importScripts(STATIC_URL + 'istasyon_sayim_offline.js');
+
 self.addEventListener('install', (event) => {
   event.waitUntil(
     caches.open(CACHE_NAME).then((cache) => {
@@ -9,7 +12,8 @@ self.addEventListener('install', (event) => {
         '/',
         '/login/',
         STATIC_URL + 'logo.png',
-        STATIC_URL + 'manifest.json'
+        STATIC_URL + 'manifest.json',
+        STATIC_URL + 'istasyon_sayim_offline.js'
       ]).catch(() => {});
     }).then(() => self.skipWaiting())
   );
@@ -41,3 +45,20 @@ self.addEventListener('fetch', (event) => {
       .catch(() => caches.match(event.request).then((cached) => cached || caches.match('/')))
   );
 });
+
+// Sayım sayfası tesisin istasyon listesini önceden önbelleğe aldırır (bodrum / soğuk oda: bağlantı yok)
+self.addEventListener('message', (event) => {
+  const data = event.data || {};
+  if (data.tip === 'istasyon-listesi' && data.url) {
+    event.waitUntil(
+      caches.open(CACHE_NAME).then((cache) => cache.add(new Request(data.url, { credentials: 'same-origin' }))).catch(() => {})
+    );
+  }
+});
+
+// Background Sync: bağlantı gelince kuyruktaki taramaları gönder
+self.addEventListener('sync', (event) => {
+  if (event.tag === self.KaleSayimKuyrugu.SENKRON_ETIKETI) {
+    event.waitUntil(self.KaleSayimKuyrugu.gonder());
+  }
+});